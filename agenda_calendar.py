@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# agenda_calendar.py — calendário mensal do Cronograma de Passes (Plotly)
+# Agregação diária vetorizada (crosstab por status) e figura com 2 traces: um heatmap (cores dos dias
+# + hover) e um scatter de texto (número do dia, marcadores e contagens). Antes eram ~5 objetos
+# Plotly por dia (shape + annotations + scatter invisível).
+# Visão geral (vários meses/anos): cubo diário pré-agregado sites × dias × status, montado com um
+# único bincount; as visões mensal/diária são fatias/somas do cubo e viram um heatmap só.
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from lazy_imports import lazy
+
+go = lazy("plotly.graph_objects")   # só ao montar a primeira figura
+
+STATUS = ["Aprovada", "Rejeitada", "Pendente"]
+
+# códigos de cor do heatmap (z) → cor
+_COLORS = ["#ECEFF1", "#B0BEC5", "#2e7d32", "#c62828"]   # sem evento, cinza, aprovado, rejeitado
+_NO_EVENT, _GRAY, _GREEN, _RED = range(4)
+_BADGE = {"Aprovada": "#2e7d32", "Rejeitada": "#c62828", "Pendente": "#607D8B"}
+
+
+def resumo_diario(df: pd.DataFrame) -> pd.DataFrame:
+    """Por dia: aprovadas, rejeitadas, pendentes e sites (texto) — índice = datas normalizadas."""
+    if df.empty:
+        return pd.DataFrame(columns=["aprovadas", "rejeitadas", "pendentes", "sites"],
+                            index=pd.DatetimeIndex([], name="data"))
+    dias = pd.to_datetime(df["data"]).dt.normalize().rename("data")
+    cnt = (pd.crosstab(dias, df["status"]).reindex(columns=STATUS, fill_value=0)
+             .set_axis(["aprovadas", "rejeitadas", "pendentes"], axis=1))
+    sites = (pd.DataFrame({"data": dias, "site": df["site_nome"].astype(str)})
+               .drop_duplicates().sort_values("site").groupby("data")["site"].agg(", ".join))
+    return cnt.join(sites.rename("sites"))
+
+
+def montar_calendario(df_mes: pd.DataFrame, mes_ano: str,
+                      only_color_with_events: bool = True,
+                      show_badges: bool = True) -> "go.Figure":
+    primeiro = pd.Timestamp(f"{mes_ano}-01")
+    dias = pd.date_range(primeiro, primeiro + pd.offsets.MonthEnd(1), freq="D")
+    info = resumo_diario(df_mes).reindex(dias)
+    has = info["aprovadas"].notna().to_numpy()
+    apr, rej, pen = (info[c].fillna(0).to_numpy(dtype=int) for c in ("aprovadas", "rejeitadas", "pendentes"))
+
+    # posição na grade 6×7 (domingo = coluna 0; a 1ª semana começa no dia 1)
+    col = (dias.weekday.to_numpy() + 1) % 7
+    row = (dias.day.to_numpy() - 1 + col[0]) // 7
+    y = 5 - row                                                   # linha 0 no topo
+
+    code = np.select(
+        [~has, rej > 0, (pen > 0) & (apr == 0)],
+        [_NO_EVENT if only_color_with_events else _GRAY, _RED, _GRAY],
+        default=_GREEN,
+    ).astype(float)
+    z = np.full((6, 7), np.nan)
+    z[y, col] = code
+    hover = np.full((6, 7), "", dtype=object)
+    sites_txt = info["sites"].fillna("-").to_numpy()
+    hover[y, col] = [
+        (f"{d:%Y-%m-%d}<br>Aprovadas: {a} | Rejeitadas: {r} | Pendentes: {p}<br>Sites: {s}" if h
+         else f"{d:%Y-%m-%d}")
+        for d, a, r, p, s, h in zip(dias, apr, rej, pen, sites_txt, has)
+    ]
+    heat = go.Heatmap(
+        z=z, x=np.arange(7) + 0.5, y=np.arange(6) + 0.5, text=hover,
+        colorscale=[[i / 3, c] for i, c in enumerate(_COLORS)], zmin=0, zmax=3,   # z cai exatamente nas paradas
+        showscale=False, xgap=2, ygap=2, hoverongaps=False,
+        hovertemplate="%{text}<extra></extra>",
+    )
+
+    # textos: número do dia (canto superior esquerdo), contagens e marcadores (rodapé da célula)
+    tx, ty, tt, tpos, tcol, tsize = [], [], [], [], [], []
+    def _add(xs, ys, texts, pos, colors, size):
+        tx.extend(xs); ty.extend(ys); tt.extend(texts)
+        tpos.extend([pos] * len(xs)); tcol.extend(colors); tsize.extend([size] * len(xs))
+    _add(col + 0.05, y + 0.85, dias.day.astype(str).tolist(), "bottom right", ["#111827"] * len(dias), 12)
+    if show_badges and has.any():
+        _add(col[has] + 0.95, y[has] + 0.18, [f"{a}A/{r}R/{p}P" for a, r, p in zip(apr[has], rej[has], pen[has])],
+             "top left", ["#111827"] * int(has.sum()), 10)
+        # marcadores na ordem aprovada → rejeitada → pendente, só os presentes no dia
+        present = np.stack([apr > 0, rej > 0, pen > 0], axis=1) & has[:, None]
+        slot = np.cumsum(present, axis=1) - 1
+        d_idx, s_idx = np.nonzero(present)
+        _add(col[d_idx] + 0.08 + 0.12 * slot[d_idx, s_idx], y[d_idx] + 0.18, ["●"] * len(d_idx),
+             "top right", [_BADGE[STATUS[k]] for k in s_idx], 12)
+    text = go.Scatter(x=tx, y=ty, text=tt, mode="text", textposition=tpos,
+                      textfont=dict(color=tcol, size=tsize), hoverinfo="skip", showlegend=False)
+
+    fig = go.Figure([heat, text])
+    fig.update_xaxes(visible=False, range=[0, 7], fixedrange=True)
+    fig.update_yaxes(visible=False, range=[0, 6], fixedrange=True)
+    fig.update_layout(height=460, margin=dict(l=10, r=10, t=10),
+                      paper_bgcolor="white", plot_bgcolor="white")
+    return fig
+
+
+# ============================================================================
+# VISÃO GERAL — cubo diário de status
+# ============================================================================
+METRICAS = {   # rótulo → (índice no cubo | None = total, escala de cor)
+    "Total de passes": (None, "Blues"),
+    "Aprovadas": (0, "Greens"),
+    "Rejeitadas": (1, "Reds"),
+    "Pendentes": (2, "Greys"),
+}
+
+
+@dataclass
+class StatusCube:
+    """Contagens por site × dia × status (Aprovada, Rejeitada, Pendente); dias contíguos a partir de `inicio`."""
+    sites: List[str]
+    inicio: pd.Timestamp
+    counts: np.ndarray            # int32, shape (n_sites, n_dias, 3)
+
+    @property
+    def dias(self) -> pd.DatetimeIndex:
+        return pd.date_range(self.inicio, periods=self.counts.shape[1], freq="D")
+
+    def anos(self) -> List[int]:
+        return sorted(set(self.dias.year)) if self.counts.shape[1] else []
+
+    def subset(self, sites: Sequence[str]) -> "StatusCube":
+        pos = {s: i for i, s in enumerate(self.sites)}
+        keep = [pos[s] for s in sites if s in pos]
+        return StatusCube([self.sites[i] for i in keep], self.inicio, self.counts[keep])
+
+    def mensal(self):
+        """(rótulos 'YYYY-MM', contagens n_sites × n_meses × 3)."""
+        meses = self.dias.to_period("M")
+        if len(meses) == 0:
+            return [], self.counts
+        starts = np.flatnonzero(np.r_[True, meses[1:] != meses[:-1]])
+        return [str(m) for m in meses[starts]], np.add.reduceat(self.counts, starts, axis=1)
+
+    def diario(self, ano: int):
+        """(datas do ano com dados, contagens n_sites × n_dias × 3)."""
+        dias = self.dias
+        sel = dias.year == ano
+        return dias[sel], self.counts[:, sel]
+
+
+def cubo_status(df: pd.DataFrame) -> StatusCube:
+    """Agrega o estado inteiro de uma vez (status fora de STATUS conta como Pendente)."""
+    if df.empty:
+        return StatusCube([], pd.Timestamp("today").normalize(), np.zeros((0, 0, 3), dtype=np.int32))
+    dias = pd.to_datetime(df["data"], errors="coerce").dt.normalize()
+    ok = dias.notna().to_numpy()
+    dias = dias[ok]
+    site_codes, sites = pd.factorize(df["site_nome"].astype(str)[ok], sort=True)
+    st_codes = pd.Categorical(df["status"][ok], categories=STATUS).codes.astype(np.int64)
+    st_codes[st_codes < 0] = STATUS.index("Pendente")
+    inicio = dias.min()
+    d_codes = ((dias - inicio) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+    n_s, n_d = len(sites), int(d_codes.max()) + 1
+    flat = (site_codes.astype(np.int64) * n_d + d_codes) * 3 + st_codes
+    counts = np.bincount(flat, minlength=n_s * n_d * 3).astype(np.int32).reshape(n_s, n_d, 3)
+    return StatusCube(list(sites), inicio, counts)
+
+
+def montar_visao_geral(cube: StatusCube, metrica: str = "Total de passes",
+                       ano: Optional[int] = None) -> "go.Figure":
+    """Heatmap sites × meses (histórico inteiro) ou, com `ano`, sites × dias daquele ano."""
+    k, escala = METRICAS[metrica]
+    if ano is None:
+        x, c = cube.mensal()
+    else:
+        dias, c = cube.diario(ano)
+        x = dias
+    total = c.sum(axis=2)
+    z = (total if k is None else c[..., k]).astype(float)
+    z[total == 0] = np.nan                                       # sem passes → célula vazia
+    heat = go.Heatmap(
+        z=z, x=x, y=cube.sites, customdata=c, colorscale=escala, zmin=0,
+        xgap=1 if ano is None else 0, ygap=2, hoverongaps=False,
+        colorbar=dict(title=metrica, thickness=12),
+        hovertemplate=("<b>%{y}</b> · %{x" + ("" if ano is None else "|%Y-%m-%d") + "}"
+                       "<br>Aprovadas: %{customdata[0]} | Rejeitadas: %{customdata[1]} | "
+                       "Pendentes: %{customdata[2]}<extra></extra>"),
+    )
+    fig = go.Figure(heat)
+    if ano is None:
+        fig.update_xaxes(type="category", nticks=24, tickangle=-45)
+    else:
+        fig.update_xaxes(type="date", dtick="M1", tickformat="%b")
+    fig.update_xaxes(showgrid=False)
+    fig.update_yaxes(autorange="reversed", showgrid=False)
+    fig.update_layout(height=max(260, 28 * len(cube.sites) + 120), margin=dict(l=10, r=10, t=10, b=10),
+                      paper_bgcolor="white", plot_bgcolor="white")
+    return fig
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+# agenda_log.py — estado da validação do Cronograma como checkpoint + change-log
+# Cada "Salvar"/ação em lote grava só as linhas alteradas (um .jsonl pequeno, append-only) em vez do
+# workbook inteiro. O estado atual = último checkpoint (xlsx completo) + replay dos deltas posteriores.
+# A cada `checkpoint_every` deltas o estado é compactado num novo checkpoint.
+# Concorrência otimista por linha: o registro de cada edição leva a versão (seq) do estado em que a
+# sessão se baseou e o valor anterior dos campos alterados; na publicação, linhas que ninguém mais
+# mexeu entram direto e conflitos (outro validador mudou o mesmo campo) são recusados e reportados.
+
+import io
+import json
+import time
+import threading
+import datetime as dt
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from agenda_store import ConflictError, SnapshotCatalog
+
+COLS = ["site_nome", "data", "status", "observacao", "validador", "data_validacao"]
+STATUS = ["Pendente", "Aprovada", "Rejeitada"]
+KEYS = ["site_nome", "data"]
+FIELDS = ["status", "observacao", "validador", "data_validacao"]
+CHECKPOINT_EVERY = 20
+
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Tipos compactos usados pela página: data = datetime64 (dia), site/status/yyyymm categóricos,
+    textos livres como str. Ordenado por data → cada mês é um intervalo contíguo (`month_rows`)."""
+    df = df[[c for c in COLS if c in df.columns]].copy()
+    df["data"]           = pd.to_datetime(df["data"], errors="coerce").dt.normalize().astype("datetime64[ns]")
+    df["data_validacao"] = pd.to_datetime(df.get("data_validacao", pd.NaT), errors="coerce")
+    df["observacao"]     = df.get("observacao", "").fillna("").astype(str)   # célula vazia do xlsx → ""
+    df["validador"]      = df.get("validador", "").fillna("").astype(str)
+    status               = df.get("status", "Pendente").astype(str)
+    extras               = sorted(set(status.unique()) - set(STATUS))
+    df["status"]         = pd.Categorical(status, categories=STATUS + extras)
+    df["site_nome"]      = df["site_nome"].astype(str).astype("category")
+    df["yyyymm"]         = df["data"].dt.strftime("%Y-%m").astype("category")
+    return df.sort_values(["data", "site_nome"]).reset_index(drop=True)
+
+
+def month_rows(df: pd.DataFrame, yyyymm: str) -> pd.DataFrame:
+    """Linhas do mês "YYYY-MM" como fatia (busca binária na coluna data, já ordenada por `normalize`)."""
+    ini = pd.Timestamp(f"{yyyymm}-01")
+    lo, hi = np.searchsorted(df["data"].to_numpy(), [ini.to_datetime64(), (ini + pd.offsets.MonthBegin(1)).to_datetime64()])
+    return df.iloc[lo:hi]
+
+
+def snapshot_bytes(df: pd.DataFrame) -> bytes:
+    """Estado completo → xlsx (aba 'validacao'), formato dos checkpoints."""
+    out = df[COLS].copy()
+    out["data"] = pd.to_datetime(out["data"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+    dv = pd.to_datetime(out["data_validacao"], errors="coerce")
+    out["data_validacao"] = dv.dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        out.to_excel(writer, index=False, sheet_name="validacao")
+    buf.seek(0); return buf.read()
+
+
+def read_snapshot(data: bytes) -> pd.DataFrame:
+    return normalize(pd.read_excel(io.BytesIO(data)))
+
+
+def changed_rows(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Linhas de `after` cujos campos editáveis diferem de `before` (casadas por site_nome + data)."""
+    b = after.set_index(KEYS)[FIELDS]
+    a = before.set_index(KEYS)[FIELDS]
+    a = a[~a.index.duplicated(keep="last")].reindex(b.index)
+    same = (a.astype(object) == b.astype(object)) | (a.isna() & b.isna())   # vazio == vazio
+    return after.loc[~same.all(axis=1).to_numpy()]
+
+
+def _txt(v) -> str:
+    return "" if pd.isna(v) else str(v)
+
+
+def _field_txt(field: str, v) -> str:
+    """Valor de um campo editável como texto comparável (mesmo formato do delta)."""
+    if field == "data_validacao":
+        t = pd.to_datetime(v, errors="coerce")
+        return "" if pd.isna(t) else t.strftime("%Y-%m-%d %H:%M:%S")
+    return "" if v is None else _txt(v)
+
+
+def delta_bytes(rows: pd.DataFrame, author: Optional[str], now: dt.datetime,
+                antes: Optional[pd.DataFrame] = None, base: Optional[int] = None) -> bytes:
+    """Linhas alteradas → JSON Lines (uma linha por registro, com o carimbo da alteração).
+
+    Com `antes` (mesmas linhas, valores antes da edição) cada registro leva `campos` (o que mudou),
+    `antes` (valor anterior desses campos) e `base` (seq do estado da sessão) para o merge otimista;
+    linhas sem mudança ficam de fora.
+    """
+    ts = now.isoformat().replace("+00:00", "Z")
+    lines = []
+    for r in rows[COLS].itertuples():
+        rec = {
+            "site_nome": r.site_nome,
+            "data": pd.to_datetime(r.data).strftime("%Y-%m-%d"),
+            "status": _txt(r.status),
+            "observacao": _txt(r.observacao),
+            "validador": _txt(r.validador),
+            "data_validacao": _field_txt("data_validacao", r.data_validacao) or None,
+            "ts": ts,
+            "autor": author,
+        }
+        if antes is not None:
+            prev = {f: _field_txt(f, antes.at[r.Index, f]) for f in FIELDS}
+            campos = [f for f in FIELDS if prev[f] != _field_txt(f, rec[f])]
+            if not campos:
+                continue
+            rec.update(campos=campos, antes={f: prev[f] for f in campos}, base=base)
+        lines.append(json.dumps(rec, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def read_delta(data: bytes) -> pd.DataFrame:
+    recs = [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+    return pd.DataFrame(recs, columns=COLS) if recs else pd.DataFrame(columns=COLS)
+
+
+def apply_deltas(base: pd.DataFrame, deltas) -> pd.DataFrame:
+    """Replay: cada delta sobrepõe (upsert por site_nome + data) as linhas do estado anterior."""
+    frames = [base[COLS]] + [d[COLS] for d in deltas if not d.empty]
+    if len(frames) == 1:
+        return base
+    merged = pd.concat([normalize(f)[COLS] for f in frames], ignore_index=True)
+    return normalize(merged.drop_duplicates(subset=KEYS, keep="last"))
+
+
+def merge_deltas(state: pd.DataFrame, items: List[Tuple[Optional[str], Optional[str], bytes]],
+                 seq: int) -> Tuple[pd.DataFrame, List[Dict]]:
+    """Merge otimista dos registros `(id, autor, delta)` (em ordem) sobre o estado publicado `state`
+    (versão `seq`). Retorna as linhas resultantes (só as que mudaram) e os conflitos.
+
+    Registro com `base == seq` numa linha ainda não tocada neste lote entra direto. Nos demais, cada
+    campo alterado precisa ainda ter o valor `antes` (ou já o valor novo) no estado; se algum campo
+    foi mudado por outro validador, o registro inteiro é recusado — o valor publicado fica.
+    Registros sem `campos` (formato antigo) sobrescrevem a linha toda.
+    """
+    cur = state.set_index(KEYS)[FIELDS]
+    cur = cur[~cur.index.duplicated(keep="last")]
+    work: Dict[Tuple, Dict[str, str]] = {}     # linhas tocadas neste lote (campos como texto)
+    conflicts: List[Dict] = []
+    for item_id, author, data in items:
+        for line in data.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            key = (rec["site_nome"], pd.Timestamp(rec["data"]))
+            row = work.get(key)
+            if row is None and key in cur.index:
+                row = {f: _field_txt(f, cur.at[key, f]) for f in FIELDS}
+            campos = rec.get("campos") or FIELDS
+            novo = {f: _field_txt(f, rec.get(f)) for f in campos}
+            if row is not None and "antes" in rec and not (rec.get("base") == seq and key not in work):
+                clash = [f for f in campos if row[f] not in (rec["antes"].get(f, ""), novo[f])]
+                if clash:
+                    conflicts.append({"id": item_id, "autor": author, "site_nome": rec["site_nome"],
+                                      "data": rec["data"], "campos": clash,
+                                      "publicado": {f: row[f] for f in clash},
+                                      "recusado": {f: novo[f] for f in clash}})
+                    continue
+            row = dict(row or {f: "" for f in FIELDS})
+            row.update(novo)
+            work[key] = row
+    recs = []
+    for key, row in work.items():
+        if key in cur.index and all(row[f] == _field_txt(f, cur.at[key, f]) for f in FIELDS):
+            continue   # voltou ao valor publicado
+        recs.append({"site_nome": key[0], "data": key[1], **row})
+    rows = pd.DataFrame(recs, columns=COLS)
+    rows["data_validacao"] = pd.to_datetime(rows["data_validacao"].replace("", None), errors="coerce")
+    return rows, conflicts
+
+
+class ValidationLog:
+    """Estado da validação sobre um SnapshotCatalog: `load()` faz o replay, `record()` grava um delta.
+
+    O estado reconstruído fica memorizado por (checkpoint, deltas): sessões que abrem a página com o
+    mesmo índice recebem uma cópia dele, sem baixar/parsear o xlsx de novo.
+    """
+
+    def __init__(self, catalog: SnapshotCatalog, checkpoint_every: int = CHECKPOINT_EVERY):
+        self.catalog = catalog
+        self.checkpoint_every = checkpoint_every
+        self.conflicts: "deque[Dict]" = deque(maxlen=500)   # registros recusados no merge (mais recentes)
+        self._memo_key = None
+        self._memo: Optional[pd.DataFrame] = None
+        self._memo_lock = threading.Lock()
+
+    def _replay(self):
+        """(estado, deltas, seq, completo). `completo` é False se algum delta do índice ainda não existe
+        (seq reservado por outro processo, arquivo em gravação): esse estado não é memorizado."""
+        idx = self.catalog.index()
+        cp = idx.get("latest")
+        deltas = idx.get("deltas", [])
+        seq = int(idx.get("seq", 0))
+        key = (cp["path"] if cp else None, tuple(d["path"] for d in deltas))
+        with self._memo_lock:
+            if key == self._memo_key:
+                return self._memo, deltas, seq, True
+        state, complete = self._rebuild(cp, deltas)
+        if complete:
+            with self._memo_lock:
+                self._memo_key, self._memo = key, state
+        return state, deltas, seq, complete
+
+    def _rebuild(self, cp: Optional[Dict], deltas: List[Dict]) -> Tuple[pd.DataFrame, bool]:
+        data = self.catalog.load(cp) if cp else None
+        base = read_snapshot(data) if data is not None else normalize(pd.DataFrame(columns=COLS))
+        frames, complete = [], True
+        for d in deltas:
+            raw = self.catalog.load(d)
+            if raw is None:
+                complete = False
+            else:
+                frames.append(read_delta(raw))
+        return apply_deltas(base, frames), complete
+
+    def load(self) -> Optional[pd.DataFrame]:
+        return self.state()[0]
+
+    def state(self) -> Tuple[Optional[pd.DataFrame], int]:
+        """(estado, seq): a versão acompanha o estado para os registros de edição (`base`)."""
+        df, _, seq, _ = self._replay()
+        return (None if df.empty else df.copy()), seq   # a página altera o df da sessão in-place
+
+    def record(self, before: pd.DataFrame, after: pd.DataFrame, author: Optional[str] = None,
+               now: Optional[dt.datetime] = None) -> Optional[Dict]:
+        """Grava as linhas que mudaram de `before` para `after`. Retorna o latest (None se nada mudou)."""
+        rows = changed_rows(before, after)
+        if rows.empty:
+            return None
+        now = now or dt.datetime.now(dt.timezone.utc)
+        return self.append(delta_bytes(rows, author, now), rows=len(rows), author=author, now=now)
+
+    def append(self, data: bytes, rows: int, author: Optional[str] = None,
+               now: Optional[dt.datetime] = None, expect_seq: Optional[int] = None) -> Dict:
+        """Publica um delta já serializado (JSON Lines); compacta se a fila de replay encheu."""
+        meta = self.catalog.append_delta(data, author=author, rows=rows, now=now, expect_seq=expect_seq)
+        if len(self.catalog.deltas()) >= self.checkpoint_every:
+            meta = self.compact(author)
+        return meta
+
+    def publish_queued(self, recs: List[Dict]) -> Optional[Dict]:
+        """Publicador da fila local (agenda_queue): os itens pendentes viram UM delta, resultado do
+        merge otimista sobre o estado publicado mais recente. Se outro processo publicar no meio
+        (seq mudou), o merge é refeito. Conflitos vão para `self.conflicts`."""
+        recs = [r for r in recs if r.get("delta")]
+        if not recs:
+            return None
+        items = [(r.get("id"), r.get("author"), r["delta"].encode("utf-8")) for r in recs]
+        author = ", ".join(sorted({r.get("author") or "anon" for r in recs}))
+        for attempt in range(self.catalog.max_retries):
+            state, _, seq, complete = self._replay()
+            if not complete:   # delta de outro processo ainda em gravação: o merge o ignoraria
+                if attempt == self.catalog.max_retries - 1:
+                    raise ConflictError("delta publicado ainda indisponível")
+                time.sleep(0.5)
+                continue
+            rows, conflicts = merge_deltas(state, items, seq)
+            if rows.empty:
+                self.conflicts.extend(conflicts)
+                return None
+            now = dt.datetime.now(dt.timezone.utc)
+            try:
+                meta = self.append(delta_bytes(rows, author, now), rows=len(rows), author=author,
+                                   now=now, expect_seq=seq)
+            except ConflictError:
+                if attempt == self.catalog.max_retries - 1:
+                    raise
+                continue
+            self.conflicts.extend(conflicts)
+            return meta
+        return None
+
+    def compact(self, author: Optional[str] = None) -> Dict:
+        """Checkpoint: replay do que está publicado (inclui deltas de outras sessões) → xlsx completo."""
+        state, deltas, _, complete = self._replay()
+        if not complete:   # um delta ainda em gravação ficaria de fora do checkpoint: compacta depois
+            return self.catalog.latest_meta()
+        upto = deltas[-1]["path"] if deltas else None
+        return self.catalog.save_snapshot(snapshot_bytes(state), author=author, upto=upto)
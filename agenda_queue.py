@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# agenda_queue.py — fila local durável (write-ahead) para publicar as validações em segundo plano
+# O "Salvar" só grava um arquivo na fila (fsync + rename) e volta; um worker por processo junta as
+# gravações próximas (coalescência) e publica com retentativa/backoff. Itens sobrevivem a restarts:
+# o que estiver em `pending/` ao subir é publicado. Um processo por diretório de fila.
+# Depois de uma falha os itens saem um por vez (isola o culpado); o item que falha `max_attempts` vezes
+# seguidas vai para `dead/` (não trava a fila; fica visível e pode ser reenfileirado com `requeue_dead`).
+
+import os
+import json
+import time
+import uuid
+import threading
+import datetime as dt
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_COALESCE_S = 2.0
+DEFAULT_MAX_BACKOFF_S = 60.0
+DEFAULT_MAX_ATTEMPTS = 8          # ~4 min de backoff antes de desistir de um item
+
+
+def _now_z() -> str:
+    return dt.datetime.now(dt.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _fsync_dir(path: Path) -> None:
+    """Torna durável o rename/unlink no diretório (sem isso um crash pode "desfazer" o os.replace)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return   # Windows: diretório não abre para fsync
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_durable(path: Path, rec: Dict) -> None:
+    tmp = path.parent / f".{path.stem}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(rec, f, ensure_ascii=False)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path.parent)
+
+
+class PublishQueue:
+    """Fila em ``root/pending/<id>.json``. `publish(registros)` recebe os itens pendentes, em ordem,
+    e os publica de uma vez (levanta exceção em falha → retentativa com backoff exponencial)."""
+
+    def __init__(self, root: Path, publish: Callable[[List[Dict]], Optional[Dict]],
+                 coalesce_s: float = DEFAULT_COALESCE_S, max_backoff_s: float = DEFAULT_MAX_BACKOFF_S,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.dir = Path(root) / "pending"
+        self.dead_dir = Path(root) / "dead"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.dead_dir.mkdir(parents=True, exist_ok=True)
+        self._publish = publish
+        self.coalesce_s = coalesce_s
+        self.max_backoff_s = max_backoff_s
+        self.max_attempts = max_attempts
+        self._attempts: Dict[str, int] = {}          # falhas por item (em memória)
+        self.last_published: Optional[Dict] = None   # retorno do último publish (ex.: latest.json)
+        self.last_error: Optional[str] = None
+        self.failures = 0                           # falhas seguidas
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="agenda-publisher", daemon=True)
+        self._thread.start()
+        if any(self.dir.glob("*.json")):
+            self._wake.set()   # itens deixados por um processo anterior
+
+    # ---------- API ----------
+    def enqueue(self, payload: Dict) -> str:
+        """Grava o item de forma durável e acorda o worker. Retorna o id (ordenável por chegada)."""
+        item_id = f"{time.time_ns()}-{uuid.uuid4().hex[:6]}"
+        _write_durable(self.dir / f"{item_id}.json", dict(payload, id=item_id, queued_at_utc=_now_z()))
+        self._wake.set()
+        return item_id
+
+    def pending(self) -> List[Dict]:
+        out = []
+        for p in sorted(self.dir.glob("*.json")):
+            try:
+                out.append(json.loads(p.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue   # publicado (removido) entre o glob e a leitura, ou gravação incompleta
+        return out
+
+    def pending_count(self) -> int:
+        return sum(1 for _ in self.dir.glob("*.json"))
+
+    def is_pending(self, item_id: str) -> bool:
+        return (self.dir / f"{item_id}.json").exists()
+
+    def dead_letters(self) -> List[Dict]:
+        """Itens desistidos (com `error`, `attempts`, `dead_at_utc`), em ordem de chegada."""
+        out = []
+        for p in sorted(self.dead_dir.glob("*.json")):
+            try:
+                out.append(json.loads(p.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                out.append({"id": p.stem, "error": "arquivo ilegível"})
+        return out
+
+    def requeue_dead(self, item_id: Optional[str] = None) -> int:
+        """Devolve à fila um item desistido (ou todos); retorna quantos."""
+        n = 0
+        for p in sorted(self.dead_dir.glob(f"{item_id or '*'}.json")):
+            try:
+                rec = json.loads(p.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            if "raw" in rec:
+                continue   # ilegível: não há o que republicar
+            for k in ("error", "attempts", "dead_at_utc"):
+                rec.pop(k, None)
+            _write_durable(self.dir / p.name, rec)
+            p.unlink()
+            self._attempts.pop(p.stem, None)
+            n += 1
+        if n:
+            _fsync_dir(self.dead_dir)
+            self._wake.set()
+        return n
+
+    def _dead_letter(self, path: Path, rec: Optional[Dict], error: str) -> None:
+        if rec is None:   # ilegível: guarda o conteúdo bruto para inspeção
+            rec = {"id": path.stem, "raw": path.read_text(encoding="utf-8", errors="replace")}
+        rec = dict(rec, error=error, attempts=self._attempts.pop(path.stem, 0), dead_at_utc=_now_z())
+        _write_durable(self.dead_dir / path.name, rec)
+        path.unlink(missing_ok=True)
+        _fsync_dir(self.dir)
+
+    # ---------- worker ----------
+    def _run(self) -> None:
+        backoff = 1.0
+        isolate = False   # após uma falha: um item por vez, até o culpado sair (publicado ou desistido)
+        while True:
+            self._wake.wait()
+            time.sleep(self.coalesce_s)        # junta a rajada de gravações num único publish
+            self._wake.clear()
+            files, recs = [], []
+            for p in sorted(self.dir.glob("*.json")):
+                try:
+                    recs.append(json.loads(p.read_text(encoding="utf-8")))
+                    files.append(p)
+                except ValueError:
+                    self._dead_letter(p, None, "arquivo ilegível")
+                except OSError:
+                    pass
+                if isolate and files:
+                    break
+            if not files:
+                continue
+            try:
+                meta = self._publish(recs)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e) or e.__class__.__name__
+                for p in files:
+                    self._attempts[p.stem] = self._attempts.get(p.stem, 0) + 1
+                if len(files) == 1 and self._attempts[files[0].stem] >= self.max_attempts:
+                    self._dead_letter(files[0], recs[0], self.last_error)   # libera os itens seguintes
+                    backoff = 1.0
+                else:
+                    isolate = True
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff_s)
+                self._wake.set()
+                continue
+            backoff = 1.0
+            self.failures, self.last_error = 0, None
+            if meta is not None:
+                self.last_published = meta
+            for p in files:
+                self._attempts.pop(p.stem, None)
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+            _fsync_dir(self.dir)
+            if isolate:
+                isolate = False
+                self._wake.set()   # o restante da fila volta a sair em lote
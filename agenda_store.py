@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+# agenda_store.py — armazenamento dos snapshots de validação do Cronograma de Passes
+# Backends com a mesma interface (get/put/list_dir): GitHub (contents API; `api_url` aponta para um
+# stand-in HTTP nos testes) e diretório local. O SnapshotCatalog mantém um índice (`index.json`)
+# ao lado do `latest.json`: o snapshot mais recente e os snapshots de um intervalo de meses saem do
+# índice, sem varrer `data/validado` diretório por diretório.
+
+import re
+import json
+import uuid
+import base64
+import hashlib
+import datetime as dt
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from gh_client import API_URL, GitHubClient, RateLimitError, shared_client
+
+INDEX_NAME = "index.json"
+LATEST_NAME = "latest.json"
+INDEX_VERSION = 1
+CHANGES_DIR = "changes"   # deltas (change-log) em {root}/changes/YYYY/MM/delta-<stamp>-s<seq>-<id>.jsonl
+
+
+class StoreError(RuntimeError):
+    pass
+
+class ConflictError(StoreError):
+    """O arquivo mudou desde a leitura (sha diferente) — reler e reaplicar."""
+
+
+@dataclass
+class StoredFile:
+    data: bytes
+    sha: Optional[str] = None
+
+
+class GitHubStore:
+    """Repositório GitHub via contents API (`api_url` substituível por um stand-in HTTP).
+    Requisições pelo cliente compartilhado (gh_client): GETs condicionais por ETag e rate limit."""
+
+    def __init__(self, repo: str, branch: str = "main", token: str = "",
+                 api_url: str = API_URL, client: Optional[GitHubClient] = None, timeout: float = 20):
+        self.repo, self.branch = repo, branch
+        self.api_url = api_url.rstrip("/")
+        self.client = client or shared_client(token)
+        self.timeout = timeout
+
+    def _url(self, path: str) -> str:
+        return f"{self.api_url}/repos/{self.repo}/contents/{path.lstrip('/')}"
+
+    def _check(self, r) -> None:
+        if r.status_code == 403 and "rate limit" in r.text.lower():
+            raise StoreError("GitHub rate limit exceeded")
+        if r.status_code in (409, 422):
+            raise ConflictError(f"Conflito ao salvar no GitHub ({r.status_code})")
+        if not r.ok:
+            raise StoreError(f"GitHub respondeu {r.status_code}")
+
+    def get(self, path: str) -> Optional[StoredFile]:
+        try:
+            r = self.client.get(self._url(path), params={"ref": self.branch}, timeout=self.timeout)
+        except RateLimitError as e:
+            raise StoreError(str(e))
+        if r.status_code == 404:
+            return None
+        self._check(r)
+        meta = r.json()
+        if meta.get("content"):
+            data = base64.b64decode(meta["content"])
+        else:  # > 1 MB: a contents API não embute o conteúdo
+            rr = self.client.get(meta["download_url"], timeout=self.timeout)
+            self._check(rr)
+            data = rr.content
+        return StoredFile(data, meta.get("sha"))
+
+    def put(self, path: str, data: bytes, message: str, sha: Optional[str] = None) -> str:
+        payload = {"message": message, "content": base64.b64encode(data).decode("utf-8"), "branch": self.branch}
+        if sha: payload["sha"] = sha
+        r = self.client.put(self._url(path), payload)
+        self._check(r)
+        return r.json().get("content", {}).get("sha")
+
+    def list_dir(self, path: str) -> List[Dict]:
+        try:
+            r = self.client.get(self._url(path), params={"ref": self.branch}, timeout=self.timeout)
+        except RateLimitError as e:
+            raise StoreError(str(e))
+        if r.status_code == 404:
+            return []
+        self._check(r)
+        return [{"type": it["type"], "name": it["name"], "path": it["path"]} for it in r.json()]
+
+
+class LocalStore:
+    """Mesma interface sobre um diretório local (desenvolvimento/testes). sha = SHA-1 do conteúdo."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    @staticmethod
+    def _sha(data: bytes) -> str:
+        return hashlib.sha1(data).hexdigest()
+
+    def get(self, path: str) -> Optional[StoredFile]:
+        p = self.root / path
+        if not p.is_file():
+            return None
+        data = p.read_bytes()
+        return StoredFile(data, self._sha(data))
+
+    def put(self, path: str, data: bytes, message: str, sha: Optional[str] = None) -> str:
+        p = self.root / path
+        if p.is_file() and self._sha(p.read_bytes()) != sha:
+            raise ConflictError(f"{path} mudou desde a leitura")
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(f".{p.name}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(p)
+        return self._sha(data)
+
+    def list_dir(self, path: str) -> List[Dict]:
+        d = self.root / path
+        if not d.is_dir():
+            return []
+        return [{"type": "dir" if c.is_dir() else "file", "name": c.name,
+                 "path": c.relative_to(self.root).as_posix()} for c in sorted(d.iterdir())]
+
+
+class CachedStore:
+    """Camada de cache (shared_cache.SharedCache) sobre um store, compartilhada pelas sessões.
+
+    Arquivos imutáveis (snapshots .xlsx e deltas .jsonl: nunca reescritos) ficam até sair pelo LRU;
+    os mutáveis (index.json, latest.json) e as listagens expiram em `ttl` segundos. Escritas deste
+    processo atualizam o cache (write-through); conflito de sha invalida a entrada para a releitura.
+    """
+
+    MUTABLE = (INDEX_NAME, LATEST_NAME)
+
+    def __init__(self, store, cache, ttl: float = 30.0):
+        self.store, self.cache, self.ttl = store, cache, ttl
+        self._ns = id(self)
+
+    def _ttl(self, path: str) -> Optional[float]:
+        return self.ttl if path.rsplit("/", 1)[-1] in self.MUTABLE else None
+
+    def get(self, path: str) -> Optional[StoredFile]:
+        key = (self._ns, "get", path)
+        f = self.cache.get(key, lambda: self.store.get(path), self._ttl(path))
+        if f is None and self._ttl(path) is None:
+            self.cache.invalidate(key)   # ausência não é cacheada para sempre
+        return f
+
+    def put(self, path: str, data: bytes, message: str, sha: Optional[str] = None) -> str:
+        try:
+            new_sha = self.store.put(path, data, message, sha)
+        except ConflictError:
+            self.cache.invalidate((self._ns, "get", path))
+            raise
+        self.cache.set((self._ns, "get", path), StoredFile(data, new_sha), self._ttl(path))
+        parent = path.rsplit("/", 1)[0]
+        self.cache.invalidate_where(lambda k: k[:2] == (self._ns, "ls") and parent.startswith(k[2]))
+        return new_sha
+
+    def list_dir(self, path: str) -> List[Dict]:
+        return self.cache.get((self._ns, "ls", path), lambda: self.store.list_dir(path), self.ttl)
+
+    def invalidate(self) -> None:
+        self.cache.invalidate_where(lambda k: isinstance(k, tuple) and k[:1] == (self._ns,))
+
+
+def _iso_z(t: dt.datetime) -> str:
+    return t.isoformat().replace("+00:00", "Z")
+
+
+class SnapshotCatalog:
+    """Índice dos snapshots em ``{root}/index.json``::
+
+        {"version": 1, "seq": 42, "latest": {...},
+         "months": {"2024-05": [{"path", "saved_at_utc", "author"}, ...]},
+         "deltas": [{"path", "saved_at_utc", "author", "rows", "seq"}, ...]}
+
+    Entradas de cada mês em ordem cronológica. Atualizado por `save_snapshot` junto com o latest.json.
+    Leitura nunca grava: sem índice (repositório antigo) `index()` varre a árvore em memória e o índice é
+    criado na primeira escrita (ou por `rebuild`, explícito); índice corrompido faz a leitura falhar
+    (StoreError) e as escritas o reconstroem a partir dos snapshots *e* dos deltas.
+    `latest` é o checkpoint (xlsx completo) e `deltas` os change-logs gravados depois dele, em ordem.
+    `seq` é a versão do estado publicado: +1 a cada delta (checkpoints não mudam o estado, só o compactam).
+    O delta só é gravado depois de ganhar o seq no índice, e o nome do arquivo leva esse seq
+    (``delta-<stamp>-s<seq>-<id>.jsonl``): todo delta na árvore foi aceito — uma edição recusada nunca
+    chega ao disco e não volta num `rebuild`.
+    """
+
+    def __init__(self, store, root: str = "data/validado", max_retries: int = 3):
+        self.store = store
+        self.root = root.rstrip("/")
+        self.max_retries = max_retries
+
+    # ---------- índice ----------
+    def _read_index(self, strict: bool = False):
+        f = self.store.get(f"{self.root}/{INDEX_NAME}")
+        if f is None:
+            return None, None
+        try:
+            return json.loads(f.data.decode("utf-8")), f.sha
+        except ValueError:
+            if strict:
+                raise StoreError(f"{self.root}/{INDEX_NAME} corrompido (reconstrua com SnapshotCatalog.rebuild)")
+            return None, f.sha   # escrita: reconstruído por cima, com os deltas
+
+    def index(self) -> Dict:
+        """Só leitura: sem índice, varredura em memória (nada é gravado)."""
+        idx, _ = self._read_index(strict=True)
+        return idx if idx is not None else self._scan()
+
+    def _walk(self, path: str, suffix: str) -> List[str]:
+        files: List[str] = []
+        for it in self.store.list_dir(path):
+            if it["type"] == "file" and it["name"].lower().endswith(suffix):
+                files.append(it["path"])
+            elif it["type"] == "dir":
+                files.extend(self._walk(it["path"], suffix))
+        return files
+
+    @staticmethod
+    def _stamp(path: str) -> str:
+        """Carimbo UTC do nome (snapshot ou delta) normalizado para comparação: YYYYmmdd-HHMMSS-ffffff."""
+        m = re.search(r"(\d{8}-\d{6})(-\d{6})?", Path(path).stem)
+        return (m.group(1) + (m.group(2) or "-000000")) if m else ""
+
+    @staticmethod
+    def _seq_of(path: str) -> Optional[int]:
+        """seq ganho pelo delta (no nome do arquivo); None nos deltas gravados antes disso."""
+        m = re.search(r"-s(\d+)-[0-9a-f]+$", Path(path).stem)
+        return int(m.group(1)) if m else None
+
+    @classmethod
+    def _order(cls, path: str):
+        """Ordem de replay: a do seq; deltas antigos (sem seq no nome) antes, pelo carimbo."""
+        return (cls._seq_of(path) or 0, path)
+
+    @staticmethod
+    def _entry_from_path(path: str) -> Dict:
+        """validado-YYYYmmdd-HHMMSS[-ffffff].xlsx → entrada do índice (autor desconhecido em snapshots antigos)."""
+        m = re.search(r"(\d{8})-(\d{6})", Path(path).stem)
+        try:
+            t = dt.datetime.strptime("".join(m.groups()), "%Y%m%d%H%M%S").replace(tzinfo=dt.timezone.utc)
+            saved = _iso_z(t)
+        except (ValueError, AttributeError):
+            saved = None
+        return {"path": path, "saved_at_utc": saved, "author": None}
+
+    @staticmethod
+    def _month_of(entry: Dict) -> str:
+        if entry.get("saved_at_utc"):
+            return entry["saved_at_utc"][:7]
+        parts = entry["path"].split("/")
+        return f"{parts[-3]}-{parts[-2]}" if len(parts) >= 3 else "0000-00"
+
+    def _add(self, idx: Dict, entry: Dict) -> Dict:
+        months = idx.setdefault("months", {})
+        bucket = [e for e in months.get(self._month_of(entry), []) if e["path"] != entry["path"]]
+        bucket.append(entry)
+        months[self._month_of(entry)] = sorted(bucket, key=lambda e: e["path"])
+        latest = idx.get("latest")
+        if latest is None or entry["path"] >= latest["path"]:   # nome do arquivo carrega o carimbo UTC
+            idx["latest"] = entry
+            # deltas já incorporados ao checkpoint saem da fila de replay
+            upto = entry.get("upto")
+            idx["deltas"] = [d for d in idx.get("deltas", [])
+                             if upto is not None and self._order(d["path"]) > self._order(upto)]
+        return idx
+
+    def _scan(self) -> Dict:
+        """Índice a partir da árvore: snapshots + deltas posteriores ao checkpoint. O `upto` do checkpoint
+        vem do latest.json; sem ele (gravado antes disso), entram os deltas com carimbo depois do snapshot.
+        `seq` = maior seq nos nomes (ou o número de deltas, nos antigos): uma reserva cujo arquivo não
+        chegou a ser gravado (processo caiu no meio) só deixa um buraco — o seq nunca volta."""
+        idx = {"version": INDEX_VERSION, "seq": 0, "latest": None, "months": {}, "deltas": []}
+        for p in self._walk(self.root, ".xlsx"):
+            self._add(idx, self._entry_from_path(p))
+        deltas = sorted(self._walk(f"{self.root}/{CHANGES_DIR}", ".jsonl"), key=self._order)
+        idx["seq"] = max([len(deltas)] + [self._seq_of(d) or 0 for d in deltas])
+        cp = idx["latest"]
+        if cp is not None:
+            meta = self.latest_meta() or {}
+            if meta.get("path") == cp["path"] and meta.get("upto"):
+                cp["upto"] = meta["upto"]
+                deltas = [d for d in deltas if self._order(d) > self._order(cp["upto"])]
+            else:
+                deltas = [d for d in deltas if self._stamp(d) > self._stamp(cp["path"])]
+        idx["deltas"] = [dict(self._entry_from_path(d), rows=None, seq=self._seq_of(d)) for d in deltas]
+        return idx
+
+    def _write_index(self, mutate) -> Dict:
+        """Lê → aplica `mutate(idx)` → grava com o sha lido; em conflito (outro writer) repete.
+        `idx` é None se o índice ainda não existe."""
+        for attempt in range(self.max_retries):
+            idx, sha = self._read_index()
+            idx = mutate(idx)
+            data = json.dumps(idx, ensure_ascii=False, indent=2).encode("utf-8")
+            try:
+                self.store.put(f"{self.root}/{INDEX_NAME}", data, "[streamlit] update snapshot index", sha)
+                return idx
+            except ConflictError:
+                if attempt == self.max_retries - 1:
+                    raise
+        return idx
+
+    def rebuild(self) -> Dict:
+        """Reconstrói e grava o índice varrendo a árvore (snapshots e deltas). Explícito: manutenção ou
+        índice corrompido; leituras nunca chamam."""
+        return self._write_index(lambda _old: self._scan())
+
+    # ---------- consultas ----------
+    def latest(self) -> Optional[Dict]:
+        return self.index().get("latest")
+
+    def between(self, start_yyyymm: Optional[str] = None, end_yyyymm: Optional[str] = None) -> List[Dict]:
+        """Snapshots salvos nos meses [start, end] (inclusive, "YYYY-MM"), em ordem cronológica."""
+        months = self.index().get("months", {})
+        keys = sorted(k for k in months
+                      if (start_yyyymm is None or k >= start_yyyymm) and (end_yyyymm is None or k <= end_yyyymm))
+        return [e for k in keys for e in months[k]]
+
+    def seq(self) -> int:
+        return int(self.index().get("seq", 0))
+
+    def deltas(self) -> List[Dict]:
+        """Change-logs posteriores ao checkpoint (`latest`), em ordem de gravação."""
+        return list(self.index().get("deltas", []))
+
+    def load(self, entry: Dict) -> Optional[bytes]:
+        f = self.store.get(entry["path"])
+        return f.data if f is not None else None
+
+    def latest_meta(self) -> Optional[Dict]:
+        f = self.store.get(f"{self.root}/{LATEST_NAME}")
+        try:
+            return json.loads(f.data.decode("utf-8")) if f is not None else None
+        except ValueError:
+            return None
+
+    # ---------- escrita ----------
+    def _put_latest(self, saved_at_utc: str, path: str, upto: Optional[str] = None) -> Dict:
+        latest = {"saved_at_utc": saved_at_utc, "path": path}
+        if upto is not None:
+            latest["upto"] = upto   # permite reconstruir o índice sem perder deltas não compactados
+        old = self.store.get(f"{self.root}/{LATEST_NAME}")
+        self.store.put(f"{self.root}/{LATEST_NAME}", json.dumps(latest, ensure_ascii=False, indent=2).encode("utf-8"),
+                       "[streamlit] update latest timestamp", old.sha if old else None)
+        return latest
+
+    def append_delta(self, data: bytes, author: Optional[str] = None, rows: int = 0,
+                     now: Optional[dt.datetime] = None, expect_seq: Optional[int] = None) -> Dict:
+        """Reserva o próximo seq no índice (CAS) e só então grava o change-log (nunca sobrescreve).
+        Com `expect_seq`, só publica se o estado ainda está nessa versão (senão ConflictError: quem
+        chamou refaz o merge sobre o estado novo) — e nada é gravado.
+        Entre a reserva e a gravação o índice aponta para um arquivo que ainda não existe; quem lê nesse
+        intervalo (ou depois de uma queda no meio) trata o delta como ausente."""
+        def _check(idx):
+            if expect_seq is not None and int(idx.get("seq", 0)) != expect_seq:
+                raise ConflictError(f"estado publicado mudou (esperado seq {expect_seq})")
+
+        now = now or dt.datetime.now(dt.timezone.utc)
+        stamp = now.strftime("%Y%m%d-%H%M%S-%f")
+        token = uuid.uuid4().hex[:6]
+        entry = {"saved_at_utc": _iso_z(now), "author": author, "rows": rows}
+        def _mutate(idx):
+            if idx is None:   # sem índice (ou corrompido): parte da varredura da árvore
+                idx = self._scan()
+            _check(idx)
+            idx["seq"] = entry["seq"] = int(idx.get("seq", 0)) + 1
+            entry["path"] = (f"{self.root}/{CHANGES_DIR}/{now.strftime('%Y')}/{now.strftime('%m')}/"
+                             f"delta-{stamp}-s{entry['seq']}-{token}.jsonl")
+            idx["deltas"] = sorted([d for d in idx.get("deltas", []) if d["path"] != entry["path"]] + [entry],
+                                   key=lambda d: self._order(d["path"]))
+            return idx
+        checkpoint = self._write_index(_mutate).get("latest")
+        self.store.put(entry["path"], data,
+                       f"[streamlit] delta {stamp} seq {entry['seq']} ({rows} linha(s), autor={author or 'anon'})", None)
+        return self._put_latest(entry["saved_at_utc"], checkpoint["path"] if checkpoint else None,
+                                (checkpoint or {}).get("upto"))
+
+    def save_snapshot(self, xls_bytes: bytes, author: Optional[str] = None,
+                      now: Optional[dt.datetime] = None, upto: Optional[str] = None) -> Dict:
+        """Grava ``{root}/YYYY/MM/validado-<stamp>.xlsx`` (stamp com microssegundos: dois checkpoints no
+        mesmo segundo não colidem), o índice e o latest.json. Retorna o latest.
+        `upto`: último delta já incorporado neste snapshot (checkpoint); os anteriores saem do replay."""
+        now = now or dt.datetime.now(dt.timezone.utc)
+        stamp = now.strftime("%Y%m%d-%H%M%S-%f")
+        path = f"{self.root}/{now.strftime('%Y')}/{now.strftime('%m')}/validado-{stamp}.xlsx"
+        self.store.put(path, xls_bytes, f"[streamlit] snapshot {stamp} (autor={author or 'anon'})", None)
+
+        entry = {"path": path, "saved_at_utc": _iso_z(now), "author": author}
+        if upto is not None:
+            entry["upto"] = upto
+        # sem índice (repositório anterior a ele): parte de uma varredura da árvore, que já inclui este arquivo
+        self._write_index(lambda idx: self._add(idx if idx is not None else self._scan(), entry))
+        return self._put_latest(entry["saved_at_utc"], path, upto)
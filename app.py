@@ -3,17 +3,21 @@
 # Suporta REPO com subpasta (ex.: "owner/repo/subpasta") e segredos via secrets.toml OU variáveis de ambiente.
 
 import os
-import json
-import base64
+import math
 from pathlib import Path
 from typing import Dict, Any, Tuple, Optional
 
-import bcrypt
-import requests
 import streamlit as st
 from dotenv import load_dotenv
 from PIL import Image
 
+from gh_client import API_URL
+from agenda_store import GitHubStore, LocalStore, StoreError
+from user_directory import UserDirectory
+from auth_service import AuthResult, AuthService
+from session_guard import current_user, signer
+from assets import image_src, minify_css
+
 # =============================================================================
 # Segredos (compatível com secrets.toml E variáveis de ambiente)
 # =============================================================================
@@ -40,23 +44,6 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
-# =============================================================================
-# Util: data-uri para imagens locais (bandeiras e background)
-# =============================================================================
-def _img_b64(path: str) -> str:
-    p = Path(path)
-    if not p.exists():
-        return ""
-    mime = "image/svg+xml" if p.suffix.lower() == ".svg" else "image/png"
-    return f"data:{mime};base64," + base64.b64encode(p.read_bytes()).decode("ascii")
-
-def _bg_data_uri() -> Optional[str]:
-    here = Path(__file__).parent
-    for p in (here / "background.png", here / "assets" / "background.png"):
-        if p.exists():
-            return "data:image/png;base64," + base64.b64encode(p.read_bytes()).decode("ascii")
-    return None
-
 # =============================================================================
 # Idioma (PT/EN)
 # =============================================================================
@@ -86,6 +73,9 @@ TXT = {
         "forgot": "Esqueci minha senha",
         "forgot_msg": "Se você esqueceu sua senha, fale com o suporte para redefinição temporária.",
         "bad_credentials": "Usuário ou senha inválidos.",
+        "too_many": "Muitas tentativas. Tente novamente em {s} s.",
+        "busy": "Servidor ocupado verificando outros acessos. Tente novamente em instantes.",
+        "session_expired": "Sessão expirada. Entre novamente.",
         "confidential": "Acesso restrito. Conteúdo confidencial.",
         "logged_as": "Logado como",
         "modules": "Módulos",
@@ -118,6 +108,9 @@ TXT = {
         "forgot": "Forgot my password",
         "forgot_msg": "If you forgot your password, please contact support for a temporary reset.",
         "bad_credentials": "Invalid username or password.",
+        "too_many": "Too many attempts. Try again in {s} s.",
+        "busy": "Server busy verifying other sign-ins. Please try again shortly.",
+        "session_expired": "Session expired. Please sign in again.",
         "confidential": "Restricted access. Confidential content.",
         "logged_as": "Signed in as",
         "modules": "Modules",
@@ -142,10 +135,11 @@ t = TXT["pt" if is_pt else "en"]
 # =============================================================================
 # CSS global + Background (com _bg dinâmico) + glass effect
 # =============================================================================
-_bg = _bg_data_uri()
-
-st.markdown(
-    f"""
+@st.cache_resource(show_spinner=False)
+def _global_css() -> str:
+    """Montado e minificado uma vez por processo (o background vai reduzido/embutido ou por URL estática)."""
+    _bg = image_src("background.png", max_width=1600)
+    return minify_css(f"""
 <style>
 /* Oculta cabeçalhos nativos */
 header[data-testid="stHeader"]{{display:none!important;}}
@@ -227,17 +221,18 @@ input:focus {{
   width: 1px; height: 16px; background: #e5e7eb; display: inline-block;
 }}
 </style>
-""",
-    unsafe_allow_html=True,
-)
+""")
+
+st.markdown(_global_css(), unsafe_allow_html=True)
 
 # =============================================================================
 # Pílula de idioma (sem abrir nova aba)
 # =============================================================================
-BR = _img_b64("br.svg")
-GB = _img_b64("gb.svg")
-st.markdown(
-    f"""
+@st.cache_resource(show_spinner=False)
+def _lang_pill(is_pt: bool) -> str:
+    BR = image_src("br.svg")
+    GB = image_src("gb.svg")
+    return f"""
 <div class="lang-pill">
   <a href="?lang=pt" target="_self" class="{'active' if is_pt else ''}"
      style="background-image: url('{BR}');" title="Português"></a>
@@ -245,12 +240,12 @@ st.markdown(
   <a href="?lang=en" target="_self" class="{'' if is_pt else 'active'}"
      style="background-image: url('{GB}');" title="English"></a>
 </div>
-""",
-    unsafe_allow_html=True,
-)
+"""
+
+st.markdown(_lang_pill(is_pt), unsafe_allow_html=True)
 
 # =============================================================================
-# GitHub helpers – users.json (SUPORTA subpasta em REPO)
+# Diretório de usuários – users.json no GitHub (SUPORTA subpasta em REPO) ou em diretório local
 # =============================================================================
 GITHUB_TOKEN      = get_secret("github_token", "")
 REPO_USERS        = get_secret("repo_users", "")            # ex.: "owner/repo" OU "owner/repo/subpasta"
@@ -258,11 +253,8 @@ REPO_CRONOGRAMA   = get_secret("REPO_CRONOGRAMA", "")       # se usar outro repo
 GITHUB_BRANCH     = get_secret("github_branch", "main")
 GH_DATA_ROOT      = get_secret("GH_DATA_ROOT", "data/validado")
 USERS_FILE        = "new11/users.json"
-
-
-HEADERS = {"Accept": "application/vnd.github+json"}
-if GITHUB_TOKEN:
-    HEADERS["Authorization"] = f"Bearer {GITHUB_TOKEN}"
+USERS_LOCAL_ROOT  = get_secret("users_local_root", "")      # diretório local no lugar do GitHub (dev/testes)
+USERS_CACHE_TTL   = float(get_secret("users_cache_ttl", "60") or 60)
 
 def _split_repo_and_base(repo: str) -> tuple[str, str]:
     """
@@ -277,51 +269,82 @@ def _split_repo_and_base(repo: str) -> tuple[str, str]:
     base = "/".join(parts[2:])  # "" se não houver subpasta
     return owner_repo, base
 
-def _gh_open_json(repo: str, path: str) -> Tuple[Dict[str, Any], Optional[str]]:
+@st.cache_resource(show_spinner=False)
+def get_user_directory(repo: str, branch: str, local_root: str, ttl: float) -> Optional[UserDirectory]:
+    """Um diretório por processo (compartilhado entre sessões): o login não vai ao GitHub a cada clique."""
+    if local_root:
+        return UserDirectory(LocalStore(Path(local_root)), USERS_FILE, ttl=ttl)
     if not repo:
-        return {}, None
+        return None
     owner_repo, base = _split_repo_and_base(repo)
-    full_path = f"{base}/{path}" if base else path
-    url = f"https://api.github.com/repos/{owner_repo}/contents/{full_path}?ref={GITHUB_BRANCH}"
-    r = requests.get(url, headers=HEADERS, timeout=20)
-    if r.status_code == 200:
-        payload = r.json()
-        content = base64.b64decode(payload["content"]).decode("utf-8")
-        return json.loads(content), payload.get("sha")
-    # Diagnóstico não intrusivo
-    try:
-        st.warning(f"Falha ao acessar {full_path} em {owner_repo} (HTTP {r.status_code})")
-    except Exception:
-        pass
-    return {}, None
+    # GitHubStore usa o cliente compartilhado (gh_client): revalidação por ETag e rate limit
+    store = GitHubStore(owner_repo, branch, GITHUB_TOKEN, api_url=API_URL)
+    return UserDirectory(store, f"{base}/{USERS_FILE}" if base else USERS_FILE, ttl=ttl)
 
-def _gh_save_json(repo: str, path: str, content: dict, message: str, sha: Optional[str]) -> bool:
-    if not repo:
-        return False
-    owner_repo, base = _split_repo_and_base(repo)
-    full_path = f"{base}/{path}" if base else path
-    url = f"https://api.github.com/repos/{owner_repo}/contents/{full_path}"
-    payload = {
-        "message": message,
-        "content": base64.b64encode(json.dumps(content, indent=2).encode()).decode(),
-        "branch": GITHUB_BRANCH,
-    }
-    if sha:
-        payload["sha"] = sha
-    r = requests.put(url, headers=HEADERS, json=payload, timeout=30)
-    ok = r.status_code in (200, 201)
-    if not ok:
+def _users_dir() -> Optional[UserDirectory]:
+    return get_user_directory(REPO_USERS, GITHUB_BRANCH, USERS_LOCAL_ROOT, USERS_CACHE_TTL)
+
+def load_users() -> Tuple[Dict[str, Any], Optional[str]]:
+    d = _users_dir()
+    if d is None:
+        return {}, None
+    try:
+        return d.get()
+    except StoreError as e:
+        # Diagnóstico não intrusivo
         try:
-            st.error(f"Falha ao salvar {full_path} em {owner_repo} (HTTP {r.status_code})")
+            st.warning(f"Falha ao acessar {USERS_FILE} ({e})")
         except Exception:
             pass
-    return ok
+        return {}, None
 
-def load_users():
-    return _gh_open_json(REPO_USERS, USERS_FILE)
+def save_users(data, message, sha) -> bool:
+    d = _users_dir()
+    if d is None:
+        return False
+    try:
+        if d.save(data, message, sha):
+            return True
+        err = "alterado por outra sessão; tente de novo"   # conflito de sha: cópia em memória já descartada
+    except StoreError as e:
+        err = str(e)
+    try:
+        st.error(f"Falha ao salvar {USERS_FILE} ({err})")
+    except Exception:
+        pass
+    return False
 
-def save_users(data, message, sha):
-    return _gh_save_json(REPO_USERS, USERS_FILE, data, message, sha)
+# =============================================================================
+# Serviço de autenticação (bcrypt em pool limitado, throttling, token de sessão)
+# =============================================================================
+@st.cache_resource(show_spinner=False)
+def get_auth_service() -> AuthService:
+    # mesmo assinador da guarda das páginas (session_guard): o token emitido aqui vale em todas
+    return AuthService(signer())
+
+TRUSTED_PROXIES = int(get_secret("trusted_proxies", "0") or 0)   # proxies reversos nossos à frente do app
+
+def _client_ip() -> str:
+    """IP para o limite de tentativas. O X-Forwarded-For é escrito pelo cliente, exceto as entradas que os
+    nossos proxies acrescentam à direita: com `trusted_proxies` = N usa a N-ésima da direita; com 0, só o
+    IP da conexão (st.context.ip_address)."""
+    ctx = getattr(st, "context", None)
+    if ctx is None:
+        return "?"
+    if TRUSTED_PROXIES > 0:
+        hops = [h.strip() for h in ((getattr(ctx, "headers", None) or {}).get("X-Forwarded-For") or "").split(",")]
+        hops = [h for h in hops if h]
+        if len(hops) >= TRUSTED_PROXIES:
+            return hops[-TRUSTED_PROXIES]
+    return getattr(ctx, "ip_address", None) or "?"
+
+def _auth_error(res: AuthResult) -> None:
+    if res.reason == "throttled":
+        st.error(t["too_many"].format(s=math.ceil(res.retry_after)))
+    elif res.reason == "busy":
+        st.warning(t["busy"])
+    else:
+        st.error(t["bad_credentials"])
 
 # =============================================================================
 # Layout principal (hero + login)
@@ -366,9 +389,11 @@ with right:
 if login_btn:
     users_cfg, users_sha = load_users()
     user_rec = users_cfg.get("users", {}).get(username)
-    if not user_rec or not bcrypt.checkpw(password.encode(), user_rec.get("password", "").encode()):
-        st.error(t["bad_credentials"])
+    res = get_auth_service().authenticate(username, password, (user_rec or {}).get("password"), ip=_client_ip())
+    if not res.ok:
+        _auth_error(res)
     else:
+        st.session_state["auth_token"] = res.token
         st.session_state["user"] = username
         st.session_state["name"] = user_rec.get("name", username)
         st.session_state["must_change"] = bool(user_rec.get("must_change", False))
@@ -378,6 +403,11 @@ if login_btn:
         st.toast(t["login_ok"], icon="✅")
         st.rerun()
 
+# Token de sessão: validado (HMAC, sem bcrypt) a cada rerun e renovado enquanto a sessão está ativa
+if st.session_state.get("authentication_status") and current_user() is None:
+    st.session_state.clear()
+    st.warning(t["session_expired"])
+
 # =============================================================================
 # Troca obrigatória de senha (primeiro acesso)
 # =============================================================================
@@ -390,17 +420,25 @@ if st.session_state.get("user") and st.session_state.get("must_change"):
         submitted = st.form_submit_button(t["save_pwd"])
     if submitted:
         rec = st.session_state["users_cfg"]["users"][st.session_state["user"]]
-        if bcrypt.checkpw(old.encode(), rec.get("password", "").encode()) and new1 == new2 and len(new1) >= 8:
-            rec["password"] = bcrypt.hashpw(new1.encode(), bcrypt.gensalt()).decode()
-            rec["must_change"] = False
-            if save_users(
-                st.session_state["users_cfg"],
-                f"Password change for {st.session_state['user']}",
-                st.session_state["users_sha"],
-            ):
-                st.success(t["pwd_changed"])
-                st.session_state["must_change"] = False
-                st.rerun()
+        svc = get_auth_service()
+        res = svc.authenticate(st.session_state["user"], old, rec.get("password"), ip=_client_ip())
+        if res.reason in ("throttled", "busy"):
+            _auth_error(res)
+        elif res.ok and new1 == new2 and len(new1) >= 8:
+            new_hash = svc.hash_password(new1)
+            if new_hash is None:
+                st.warning(t["busy"])
+            else:
+                rec["password"] = new_hash
+                rec["must_change"] = False
+                if save_users(
+                    st.session_state["users_cfg"],
+                    f"Password change for {st.session_state['user']}",
+                    st.session_state["users_sha"],
+                ):
+                    st.success(t["pwd_changed"])
+                    st.session_state["must_change"] = False
+                    st.rerun()
         else:
             st.error(t["pwd_change_error"])
 
@@ -427,6 +465,10 @@ if st.session_state.get("authentication_status") and not st.session_state.get("m
     if RELATORIO_PAGE: st.sidebar.page_link(RELATORIO_PAGE, label="📄 Relatório OGMP 2.0")
     if ESTATS_PAGE:    st.sidebar.page_link(ESTATS_PAGE, label="📊 Estatísticas")
 
+    if str(get_secret("show_login_metrics", "")).lower() in ("1", "true", "yes"):
+        with st.sidebar.expander("Métricas de login"):
+            st.json(get_auth_service().metrics())
+
     if st.sidebar.button("Sair"):
         st.session_state.clear()
         st.rerun()
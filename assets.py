@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# assets.py — imagens e CSS das telas preparados uma vez por processo
+# Antes, cada rerun (cada tecla no login) relia e codificava em base64 o background.png (~500 KB → ~670 KB
+# de data URI), as bandeiras e o logo, e remontava o bloco de CSS. Aqui cada asset é lido, reduzido
+# (raster acima de `max_width` vira WebP) e codificado uma única vez; o CSS é minificado uma vez.
+# Com `server.enableStaticServing = true` e o arquivo em static/, a página referencia a URL
+# /app/static/<nome> (o navegador guarda em cache e revalida por ETag) em vez de embutir os bytes.
+
+import io
+import re
+import base64
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import streamlit as st
+from PIL import Image
+
+ROOT = Path(__file__).parent
+STATIC_DIR = ROOT / "static"
+SEARCH_DIRS = (ROOT, ROOT / "assets")
+
+MIME = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg",
+        ".svg": "image/svg+xml", ".webp": "image/webp"}
+
+
+def _find(name: str) -> Optional[Path]:
+    for d in SEARCH_DIRS:
+        p = d / name
+        if p.is_file():
+            return p
+    return None
+
+
+def _svg_min(data: bytes) -> bytes:
+    """Tira declaração XML, DOCTYPE, comentários e espaços entre tags."""
+    s = data.decode("utf-8")
+    s = re.sub(r"<\?xml.*?\?>|<!DOCTYPE[^>]*>|<!--.*?-->", "", s, flags=re.S)
+    return re.sub(r">\s+<", "><", s).strip().encode("utf-8")
+
+
+def _downscale(data: bytes, max_width: int) -> Optional[bytes]:
+    """WebP com no máximo `max_width` px de largura; None se não compensa (ou não abre)."""
+    try:
+        im = Image.open(io.BytesIO(data))
+        if im.width > max_width:
+            im = im.resize((max_width, round(im.height * max_width / im.width)), Image.LANCZOS)
+        buf = io.BytesIO()
+        im.convert("RGBA" if im.mode in ("RGBA", "LA", "P") else "RGB").save(buf, "WEBP", quality=80)
+    except Exception:
+        return None
+    out = buf.getvalue()
+    return out if len(out) < len(data) else None
+
+
+@lru_cache(maxsize=None)
+def data_uri(name: str, max_width: Optional[int] = None) -> str:
+    """data URI do asset (vazio se não existe). SVG é minificado; raster com `max_width` vira WebP."""
+    p = _find(name)
+    if p is None:
+        return ""
+    data, mime = p.read_bytes(), MIME.get(p.suffix.lower(), "application/octet-stream")
+    if mime == "image/svg+xml":
+        data = _svg_min(data)
+    elif max_width:
+        small = _downscale(data, max_width)
+        if small is not None:
+            data, mime = small, "image/webp"
+    return f"data:{mime};base64," + base64.b64encode(data).decode("ascii")
+
+
+def image_src(name: str, max_width: Optional[int] = None) -> str:
+    """URL /app/static/<nome> quando o static serving está ativo e o arquivo está em static/;
+    senão o data URI (memorizado)."""
+    try:
+        static = bool(st.get_option("server.enableStaticServing"))
+    except Exception:
+        static = False
+    if static and (STATIC_DIR / name).is_file():
+        return f"app/static/{name}"
+    return data_uri(name, max_width)
+
+
+def minify_css(css: str) -> str:
+    """Remove comentários e espaços supérfluos de um bloco <style> (quem chama memoriza o resultado)."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
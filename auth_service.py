@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+# auth_service.py — verificação de senha (bcrypt) fora da thread do script, com limites
+# bcrypt é caro de propósito: as verificações rodam num pool pequeno e limitado (excesso → "ocupado",
+# sem enfileirar sem fim), tentativas erradas são limitadas por usuário e por IP (janela deslizante;
+# bloqueado não chega a gastar bcrypt) e o login bem-sucedido recebe um token assinado (HMAC) de vida
+# curta — navegar entre páginas valida o token em microssegundos, sem repetir o hash.
+
+import os
+import hmac
+import time
+import base64
+import hashlib
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+import bcrypt
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 8          # verificações em andamento + na fila; acima disso → "busy"
+USER_MAX_FAILURES = 5            # por usuário na janela
+IP_MAX_FAILURES = 20             # por IP na janela
+FAILURE_WINDOW_S = 300.0
+TOKEN_TTL_S = 30 * 60
+
+
+# ============================================================================
+# Token de sessão
+# ============================================================================
+def _b64(b: bytes) -> str:
+    return base64.urlsafe_b64encode(b).decode("ascii").rstrip("=")
+
+
+def _unb64(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+class TokenSigner:
+    """Token ``<payload>.<hmac>``; payload = usuário, expiração (epoch) e nonce."""
+
+    def __init__(self, key: bytes, ttl: float = TOKEN_TTL_S):
+        self.key = key
+        self.ttl = ttl
+
+    def _sig(self, payload: str) -> str:
+        return _b64(hmac.new(self.key, payload.encode("utf-8"), hashlib.sha256).digest()[:18])
+
+    def issue(self, user: str, now: Optional[float] = None) -> str:
+        exp = int((now or time.time()) + self.ttl)
+        payload = _b64(f"{user}\n{exp}\n{os.urandom(6).hex()}".encode("utf-8"))
+        return f"{payload}.{self._sig(payload)}"
+
+    def verify(self, token: Optional[str], now: Optional[float] = None) -> Optional[Dict]:
+        """{"user", "exp"} se a assinatura confere e não expirou; senão None."""
+        if not token or "." not in token:
+            return None
+        payload, sig = token.rsplit(".", 1)
+        if not hmac.compare_digest(sig, self._sig(payload)):
+            return None
+        try:
+            user, exp, _ = _unb64(payload).decode("utf-8").split("\n")
+            exp = int(exp)
+        except ValueError:
+            return None
+        if exp <= (now or time.time()):
+            return None
+        return {"user": user, "exp": exp}
+
+    def refresh(self, token: Optional[str], now: Optional[float] = None) -> Optional[str]:
+        """Token novo se o atual é válido e já passou da metade da vida (sessão ativa não expira)."""
+        now = now or time.time()
+        info = self.verify(token, now)
+        if info is None:
+            return None
+        return self.issue(info["user"], now) if info["exp"] - now < self.ttl / 2 else token
+
+
+# ============================================================================
+# Limite de tentativas
+# ============================================================================
+class Throttle:
+    """Falhas por chave numa janela deslizante; `retry_after(key)` > 0 enquanto bloqueado."""
+
+    def __init__(self, max_failures: int, window_s: float = FAILURE_WINDOW_S):
+        self.max_failures = max_failures
+        self.window_s = window_s
+        self._fails: Dict[str, Deque[float]] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def _prune(self, key: str, now: float) -> Deque[float]:
+        q = self._fails[key]
+        while q and now - q[0] >= self.window_s:
+            q.popleft()
+        if not q:
+            self._fails.pop(key, None)
+        return q
+
+    def retry_after(self, key: str, now: Optional[float] = None) -> float:
+        now = now or time.monotonic()
+        with self._lock:
+            q = self._prune(key, now)
+            return self.window_s - (now - q[0]) if len(q) >= self.max_failures else 0.0
+
+    def fail(self, key: str, now: Optional[float] = None) -> None:
+        with self._lock:
+            self._fails[key].append(now or time.monotonic())
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._fails.pop(key, None)
+
+
+# ============================================================================
+# Serviço
+# ============================================================================
+@dataclass
+class AuthResult:
+    ok: bool
+    reason: str                       # "ok" | "invalid" | "throttled" | "busy"
+    retry_after: float = 0.0
+    token: Optional[str] = None
+
+
+def _pct(xs: List[float], p: float) -> Optional[float]:
+    if not xs:
+        return None
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(p * len(xs)))], 1)
+
+
+class AuthService:
+    """`authenticate(usuario, senha, hash_guardado, ip)` — hash None = usuário inexistente (verifica
+    contra um hash fictício, para o tempo de resposta não revelar quais usuários existem)."""
+
+    def __init__(self, signer: TokenSigner, max_workers: int = DEFAULT_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING, timeout: float = 10.0,
+                 user_max_failures: int = USER_MAX_FAILURES, ip_max_failures: int = IP_MAX_FAILURES,
+                 window_s: float = FAILURE_WINDOW_S):
+        self.signer = signer
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.users = Throttle(user_max_failures, window_s)
+        self.ips = Throttle(ip_max_failures, window_s)
+        self._dummy: Optional[bytes] = None
+        self._mlock = threading.Lock()
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._lat: Deque[tuple] = deque(maxlen=1000)   # (total_ms, fila_ms, hash_ms) dos logins com bcrypt
+
+    def _dummy_hash(self) -> bytes:
+        if self._dummy is None:
+            self._dummy = bcrypt.hashpw(b"-", bcrypt.gensalt())
+        return self._dummy
+
+    def _run(self, fn, *args):
+        """Executa `fn` no pool; None se já há `max_pending` trabalhos (ou estourou o timeout)."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        queued = time.perf_counter()
+        def _job():
+            started = time.perf_counter()
+            try:
+                return fn(*args), started - queued, time.perf_counter() - started
+            finally:
+                self._slots.release()
+        try:
+            return self._pool.submit(_job).result(timeout=self.timeout)
+        except FutureTimeout:
+            return None
+
+    def _count(self, reason: str, timing: Optional[tuple] = None) -> None:
+        with self._mlock:
+            self._counts[reason] += 1
+            if timing is not None:
+                self._lat.append(timing)
+
+    def authenticate(self, username: str, password: str, stored_hash: Optional[str],
+                     ip: Optional[str] = None) -> AuthResult:
+        t0 = time.perf_counter()
+        ukey, ikey = f"u:{username.lower()}", f"ip:{ip or '?'}"
+        wait = max(self.users.retry_after(ukey), self.ips.retry_after(ikey))
+        if wait > 0:
+            self._count("throttled")
+            return AuthResult(False, "throttled", retry_after=wait)
+
+        def _check() -> bool:
+            hashed = stored_hash.encode("utf-8") if stored_hash else self._dummy_hash()
+            try:
+                return bcrypt.checkpw(password.encode("utf-8"), hashed)
+            except ValueError:   # hash malformado no users.json
+                return False
+        out = self._run(_check)
+        if out is None:
+            self._count("busy")
+            return AuthResult(False, "busy", retry_after=1.0)
+        ok, queue_s, hash_s = out
+        ok = ok and stored_hash is not None
+        timing = ((time.perf_counter() - t0) * 1000, queue_s * 1000, hash_s * 1000)
+        if not ok:
+            self.users.fail(ukey)
+            self.ips.fail(ikey)
+            self._count("invalid", timing)
+            return AuthResult(False, "invalid")
+        # sucesso zera só o usuário: as falhas do IP continuam contando (um login válido — p.ex. a própria
+        # conta do atacante — não pode liberar mais tentativas contra as outras contas a partir do mesmo IP)
+        self.users.clear(ukey)
+        self._count("ok", timing)
+        return AuthResult(True, "ok", token=self.signer.issue(username))
+
+    def hash_password(self, password: str) -> Optional[str]:
+        """bcrypt.hashpw no mesmo pool (troca de senha). None se o pool está saturado."""
+        out = self._run(lambda: bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8"))
+        return out[0] if out is not None else None
+
+    def metrics(self) -> Dict:
+        """Contagem por resultado e latência (ms: p50/p95/máx) dos logins que chegaram ao bcrypt."""
+        with self._mlock:
+            lat = list(self._lat)
+            counts = dict(self._counts)
+        total, fila, hash_ = ([t[i] for t in lat] for i in range(3))
+        return {
+            "counts": counts,
+            "samples": len(lat),
+            "total_ms": {"p50": _pct(total, .5), "p95": _pct(total, .95), "max": _pct(total, 1)},
+            "queue_ms": {"p50": _pct(fila, .5), "p95": _pct(fila, .95), "max": _pct(fila, 1)},
+            "hash_ms": {"p50": _pct(hash_, .5), "p95": _pct(hash_, .95), "max": _pct(hash_, 1)},
+        }
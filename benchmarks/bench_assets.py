@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_assets.py — custo por rerun do CSS/imagens da tela de login e das páginas
+# "antes" = o que app.py e as páginas faziam a cada rerun: ler e codificar em base64 background.png,
+# br.svg, gb.svg e logomavipe.jpeg e montar o CSS. "depois" = assets.data_uri/minify_css memorizados
+# (primeira chamada = custo de inicialização, uma vez por processo). Mostra também o tamanho do que
+# vai para o navegador em cada rerun.
+#
+# Uso:  python benchmarks/bench_assets.py [reruns]
+
+import sys
+import time
+import base64
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from assets import data_uri, minify_css  # noqa: E402
+
+CSS = """
+<style>
+/* bloco com o tamanho e a forma do CSS global do app.py */
+[data-testid="stAppViewContainer"]::before {
+  content:""; position:fixed; inset:0; z-index:0; pointer-events:none;
+  background: #f5f5f5 url(%s) no-repeat center top;
+  background-size: clamp(900px, 85vw, 1600px) auto; opacity:.50;
+}
+""" + "\n".join(f".c{i} {{ padding: 6px 10px; border-radius: 10px; }}" for i in range(60)) + "\n</style>"
+
+
+def _b64(name: str, mime: str) -> str:
+    return f"data:{mime};base64," + base64.b64encode((ROOT / name).read_bytes()).decode("ascii")
+
+
+def antes() -> int:
+    bg = _b64("background.png", "image/png")
+    css = CSS % bg
+    br, gb = _b64("br.svg", "image/svg+xml"), _b64("gb.svg", "image/svg+xml")
+    logo = _b64("logomavipe.jpeg", "image/jpeg")
+    return len(css) + len(br) + len(gb) + len(logo)
+
+
+_css_memo = {}
+
+
+def depois() -> int:
+    if "css" not in _css_memo:
+        _css_memo["css"] = minify_css(CSS % data_uri("background.png", 1600))
+    css = _css_memo["css"]
+    br, gb = data_uri("br.svg"), data_uri("gb.svg")
+    logo = data_uri("logomavipe.jpeg", 360)
+    return len(css) + len(br) + len(gb) + len(logo)
+
+
+def run(label, fn, reruns) -> float:
+    t0 = time.perf_counter()
+    size = fn()
+    first = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(reruns):
+        fn()
+    per = (time.perf_counter() - t0) / reruns
+    print(f"{label:>7}: 1º rerun {first * 1000:7.1f} ms | demais {per * 1000:8.3f} ms | {size / 1024:7.0f} KB/rerun")
+    return per
+
+
+def main(argv) -> None:
+    reruns = int(argv[1]) if len(argv) > 1 else 50
+    old = run("antes", antes, reruns)
+    new = run("depois", depois, reruns)
+    print(f"speedup por rerun: {old / max(new, 1e-9):.0f}×")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_calendario.py — calendário mensal do Cronograma: renderizador antigo × vetorizado
+# O antigo (cópia abaixo) cria shape + annotations + scatter por dia e agrega com lambdas no groupby;
+# o novo (agenda_calendar.montar_calendario) usa uma agregação vetorizada e 2 traces.
+# Mede montar a figura e serializá-la (to_json, o que o st.plotly_chart faz a cada rerun).
+#
+# Uso:  python benchmarks/bench_calendario.py [passagens_por_dia] [repetições]
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from agenda_calendar import montar_calendario  # noqa: E402
+
+
+# ---- referência: implementação anterior (pages/4_Agendamento_de_Imagens.py) ----
+def legacy_montar_calendario(df_mes: pd.DataFrame, mes_ano: str,
+                      only_color_with_events: bool = True,
+                      show_badges: bool = True) -> go.Figure:
+    primeiro = pd.to_datetime(f"{mes_ano}-01")
+    ultimo = (primeiro + pd.offsets.MonthEnd(1))
+    dias = pd.date_range(primeiro, ultimo, freq="D")
+
+    if df_mes.empty:
+        agg = pd.DataFrame(columns=["data","aprovadas","rejeitadas","pendentes","sites"])
+    else:
+        agg = (df_mes.assign(data=pd.to_datetime(df_mes["data"]).dt.date)
+                     .groupby("data")
+                     .agg(aprovadas=("status", lambda s: (s == "Aprovada").sum()),
+                          rejeitadas=("status", lambda s: (s == "Rejeitada").sum()),
+                          pendentes=("status", lambda s: (s == "Pendente").sum()),
+                          sites=("site_nome", lambda s: sorted(set(s))))
+                     .reset_index())
+    info_map = {row["data"]: row for _, row in agg.iterrows()}
+
+    def cor_do_dia(d: pd.Timestamp) -> str:
+        inf = info_map.get(d.date())
+        if inf is None:
+            return "#ECEFF1" if only_color_with_events else "#B0BEC5"
+        if inf["rejeitadas"] > 0: return "#c62828"
+        if inf["pendentes"] > 0 and inf["aprovadas"] == 0: return "#B0BEC5"
+        return "#2e7d32"
+
+    def weekday_dom(d: pd.Timestamp) -> int:
+        return (d.weekday() + 1) % 7  # domingo = 0
+
+    grid = np.full((6, 7), None, dtype=object)
+    week = 0
+    for d in dias:
+        col = weekday_dom(d)
+        if col == 0 and d.day != 1:
+            week += 1
+        grid[week, col] = d
+
+    fig = go.Figure()
+    for r in range(6):
+        for c in range(7):
+            d = grid[r, c]
+            if d is None: 
+                continue
+            fill = cor_do_dia(d)
+            fig.add_shape(type="rect", x0=c, x1=c+1, y0=5-r, y1=6-r,
+                          line=dict(width=1, color="#90A4AE"), fillcolor=fill)
+            fig.add_annotation(x=c+0.05, y=5-r+0.85, text=str(d.day),
+                               showarrow=False, xanchor="left", yanchor="top", font=dict(size=12))
+            inf = info_map.get(d.date())
+            if show_badges and (inf is not None):
+                y0 = 5-r+0.18; badges = []
+                if inf["aprovadas"] > 0: badges.append(("●", "#2e7d32"))
+                if inf["rejeitadas"] > 0: badges.append(("●", "#c62828"))
+                if inf["pendentes"] > 0: badges.append(("●", "#607D8B"))
+                x0 = c+0.08
+                for ch, colr in badges:
+                    fig.add_annotation(x=x0, y=y0, text=f"<span style='color:{colr}'>{ch}</span>",
+                                       showarrow=False, xanchor="left", yanchor="bottom", font=dict(size=12))
+                    x0 += 0.12
+                txt_cnt = f"{inf['aprovadas']}A/{inf['rejeitadas']}R/{inf['pendentes']}P"
+                fig.add_annotation(x=c+0.95, y=5-r+0.18, text=txt_cnt,
+                                   showarrow=False, xanchor="right", yanchor="bottom", font=dict(size=10))
+            if inf is not None:
+                sites_txt = ", ".join(inf["sites"]) if inf["sites"] else "-"
+                hover = (f"{d.strftime('%Y-%m-%d')}<br>"
+                         f"Aprovadas: {inf['aprovadas']} | Rejeitadas: {inf['rejeitadas']} | Pendentes: {inf['pendentes']}<br>"
+                         f"Sites: {sites_txt}")
+                fig.add_trace(go.Scatter(x=[c+0.5], y=[5-r+0.5], mode="markers",
+                                         marker=dict(size=1, color="rgba(0,0,0,0)"),
+                                         hovertemplate=hover, showlegend=False))
+    fig.update_xaxes(visible=False); fig.update_yaxes(visible=False)
+    fig.update_layout(height=460, margin=dict(l=10, r=10, t=10),
+                      paper_bgcolor="white", plot_bgcolor="white")
+    return fig
+
+
+def make_month(mes_ano: str, per_day: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    dias = pd.date_range(f"{mes_ano}-01", periods=pd.Timestamp(f"{mes_ano}-01").days_in_month, freq="D")
+    n = len(dias) * per_day
+    return pd.DataFrame({
+        "site_nome": rng.choice([f"Site {i:02d}" for i in range(40)], n),
+        "data": np.repeat(dias.date, per_day),
+        "status": rng.choice(["Aprovada", "Rejeitada", "Pendente"], n, p=[.5, .1, .4]),
+    })
+
+
+def run(name: str, fn, df: pd.DataFrame, mes_ano: str, reps: int) -> float:
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fig = fn(df, mes_ano, only_color_with_events=True, show_badges=True)
+        fig.to_json()
+        times.append(time.perf_counter() - t0)
+    med = float(np.median(times))
+    print(f"{name:<12} {med*1000:8.1f} ms   (traces={len(fig.data)}, shapes={len(fig.layout.shapes)}, "
+          f"annotations={len(fig.layout.annotations)})")
+    return med
+
+
+def main(argv) -> None:
+    per_day = int(argv[1]) if len(argv) > 1 else 5
+    reps = int(argv[2]) if len(argv) > 2 else 5
+    mes_ano = "2024-05"
+    df = make_month(mes_ano, per_day)
+    print(f"{len(df)} passagens em {mes_ano}, {reps} repetições")
+    old = run("antigo", legacy_montar_calendario, df, mes_ano, reps)
+    new = run("vetorizado", montar_calendario, df, mes_ano, reps)
+    print(f"speedup: {old / new:.1f}×")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
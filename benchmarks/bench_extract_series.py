@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_extract_series.py — micro-benchmark da extração de séries do Geoportal
+# Compara o laço antigo (extract_series: pd.to_numeric célula a célula, 1 chamada por parâmetro)
+# com extract_series_batch (uma coerção vetorizada para todos os parâmetros) numa aba sintética larga.
+#
+# Uso:  python benchmarks/bench_extract_series.py [n_colunas] [repetições]
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from geo_cube import extract_series_batch  # noqa: E402
+
+PARAMS = {"metano": "Taxa Metano", "incerteza": "Incerteza", "vento": "Velocidade do Vento", "satelite": "Satelite"}
+
+
+def legacy_extract_series(dfi: pd.DataFrame, date_cols_sorted, dates_ts_sorted, row_name="Taxa Metano"):
+    """Cópia da implementação anterior (referência)."""
+    idx_map = {str(i).lower().strip(): i for i in dfi.index}
+    key = idx_map.get(row_name.lower().strip())
+    rows = []
+    if key is not None:
+        for i, col in enumerate(date_cols_sorted):
+            val = dfi.loc[key, col] if col in dfi.columns else None
+            try:
+                num = float(pd.to_numeric(val))
+            except Exception:
+                num = None
+            ts = dates_ts_sorted[i]
+            if pd.notna(num) and pd.notna(ts):
+                rows.append({"date": ts, "value": float(num)})
+    s = pd.DataFrame(rows)
+    if not s.empty:
+        s = s.sort_values("date").reset_index(drop=True)
+    return s
+
+
+def synthetic_sheet(n_cols: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    cols = [f"c{i}" for i in range(n_cols)]
+    stamps = list(pd.date_range("1990-01-01", periods=n_cols, freq="D"))
+    rate = rng.uniform(50, 500, n_cols).round(1).astype(object)
+    rate[rng.random(n_cols) < 0.05] = "n/d"          # células não numéricas
+    dfi = pd.DataFrame(
+        [
+            rate,
+            rng.uniform(5, 30, n_cols).round(0),
+            rng.uniform(1, 9, n_cols).round(1),
+            np.where(rng.random(n_cols) < 0.5, "GHGSat", "Sentinel-5P"),
+            [f"images/{i}.png" for i in range(n_cols)],
+        ],
+        index=pd.Index(["Taxa Metano", "Incerteza", "Velocidade do Vento", "Satelite", "Imagem"], name="Parametro"),
+        columns=cols,
+        dtype=object,
+    )
+    return dfi, cols, stamps
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(n_cols: int = 10_000, repeat: int = 3) -> None:
+    dfi, cols, stamps = synthetic_sheet(n_cols)
+    numeric = [k for k in PARAMS if k != "satelite"]
+
+    def run_legacy():
+        return {k: legacy_extract_series(dfi, cols, stamps, row_name=PARAMS[k]) for k in numeric}
+
+    def run_batch():
+        return extract_series_batch(dfi, cols, stamps, PARAMS, text_params=("satelite",))
+
+    # confere que os resultados batem antes de medir
+    old, new = run_legacy(), run_batch()
+    for k in numeric:
+        got = new[["date", k]].dropna().reset_index(drop=True)
+        assert np.allclose(got[k].to_numpy(), old[k]["value"].to_numpy()), k
+        assert (got["date"].to_numpy() == old[k]["date"].to_numpy()).all(), k
+
+    t_old = _best(run_legacy, repeat)
+    t_new = _best(run_batch, repeat)
+    print(f"aba sintética: {n_cols} colunas × {len(PARAMS)} parâmetros (melhor de {repeat})")
+    print(f"  extract_series (laço, {len(numeric)} chamadas): {t_old*1000:9.1f} ms")
+    print(f"  extract_series_batch (1 chamada):        {t_new*1000:9.1f} ms")
+    print(f"  speedup: {t_old / t_new:.0f}×")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
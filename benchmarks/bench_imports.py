@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_imports.py — tempo de import de cada página, frio × quente, com e sem lazy_imports
+# Cada medição roda num processo novo (= primeira renderização depois de reiniciar o container): importa o
+# streamlit (o servidor já o tem carregado; não entra na conta) e cronometra os imports de topo da página,
+# lidos do próprio arquivo via ast. "frio" = 1º processo (pyc/cache do SO possivelmente frios), "quente" =
+# mediana dos seguintes. "pesados" = módulos pesados que a página trouxe além do que o streamlit já carrega
+# (ele mesmo importa o plotly). "eager" força o carregamento de todos os proxies (como era antes do lazy_imports);
+# a diferença é o que só é pago quando o mapa/PDF/gráfico é usado pela primeira vez.
+#
+# Uso:  python benchmarks/bench_imports.py [processos_quentes]
+
+import ast
+import sys
+import json
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+PAGES = ["app.py"] + sorted(str(p.relative_to(ROOT)) for p in (ROOT / "pages").glob("*.py"))
+HEAVY = ("plotly.graph_objects", "matplotlib.pyplot", "reportlab.pdfgen.canvas", "folium", "openpyxl")
+
+_CHILD = r"""
+import sys, time, json
+sys.path.insert(0, {root!r})
+import streamlit
+base = set(sys.modules)
+stmts, eager = {stmts!r}, {eager!r}
+t0 = time.perf_counter()
+for s in stmts:
+    try:
+        exec(s, {{}})
+    except Exception:
+        pass
+if eager:
+    from lazy_imports import LazyModule
+    for mod in list(sys.modules.values()):
+        for v in list(getattr(mod, "__dict__", {{}}).values()):
+            if isinstance(v, LazyModule):
+                try:
+                    v.load()
+                except Exception:
+                    pass
+dt = time.perf_counter() - t0
+print(json.dumps({{"s": dt, "heavy": [m for m in {heavy!r} if m in sys.modules and m not in base]}}))
+"""
+
+
+def page_imports(path: Path) -> list:
+    """Instruções import/from de topo (inclusive dentro de try/if de topo), na ordem do arquivo."""
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    out = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)) and getattr(node, "col_offset", 0) <= 4:
+            if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+                continue
+            out.append(ast.unparse(node))
+    return out
+
+
+def measure(stmts: list, eager: bool) -> dict:
+    code = _CHILD.format(root=str(ROOT), stmts=stmts, eager=eager, heavy=HEAVY)
+    res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT)
+    return json.loads(res.stdout.strip().splitlines()[-1])
+
+
+def main(argv) -> None:
+    warm_n = int(argv[1]) if len(argv) > 1 else 5
+    print(f"{'página':<36} {'modo':<6} {'frio':>8} {'quente':>8}  pesados carregados")
+    for page in PAGES:
+        stmts = page_imports(ROOT / page)
+        for eager in (True, False):
+            cold = measure(stmts, eager)
+            warm = [measure(stmts, eager)["s"] for _ in range(warm_n)]
+            print(f"{page:<36} {'eager' if eager else 'lazy':<6} {cold['s'] * 1000:7.0f}ms "
+                  f"{statistics.median(warm) * 1000:7.0f}ms  {', '.join(cold['heavy']) or '—'}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_pdf_chart.py — custo do gráfico (Figura 2) no PDF OGMP L5, por renderizador
+# Compara o gráfico vetorial no canvas do ReportLab ("vetor") com os caminhos em PNG:
+# Matplotlib e Plotly+kaleido (este só se o kaleido estiver instalado; a 1ª chamada inclui o start frio).
+# Cada medição = desenhar o gráfico numa página A4 e serializar o PDF.
+#
+# Uso:  python benchmarks/bench_pdf_chart.py [n_pontos] [repetições]
+
+import io
+import sys
+import importlib.util
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from geo_report import CHART_BOX, _export_fig_to_png_bytes, _render_ctx_png, draw_chart_vector  # noqa: E402
+
+
+def make_ctx(n: int) -> dict:
+    rng = np.random.default_rng(0)
+    y = 400 + np.cumsum(rng.normal(0, 15, n))
+    return {
+        "x": list(pd.date_range("2020-01-31", periods=n, freq="30D")),
+        "y": y.tolist(),
+        "yerr": (np.abs(y) * 0.15).tolist(),
+        "show_unc_bars": True,
+        "show_trend": True,
+    }
+
+
+def plotly_fig(ctx: dict):
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Scatter(x=ctx["x"], y=ctx["y"], mode="lines+markers",
+                               error_y=dict(type="data", array=ctx["yerr"], visible=True)))
+    fig.update_layout(template="plotly_white")
+    return fig
+
+
+def _page(draw) -> int:
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    draw(c)
+    c.showPage(); c.save()
+    return len(buf.getvalue())
+
+
+def _draw_png(png: bytes):
+    def draw(c):
+        img = ImageReader(io.BytesIO(png)); iw, ih = img.getSize()
+        s = min(CHART_BOX[0] / iw, CHART_BOX[1] / ih)
+        c.drawImage(img, 40, 400, width=iw * s, height=ih * s)
+    return draw
+
+
+def run(name: str, once, reps: int) -> None:
+    times, size = [], 0
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        size = once()
+        times.append(time.perf_counter() - t0)
+    print(f"{name:<12} 1ª: {times[0]*1000:8.1f} ms   mediana: {np.median(times)*1000:8.1f} ms   PDF: {size/1024:6.1f} KiB")
+
+
+def main(argv) -> None:
+    n = int(argv[1]) if len(argv) > 1 else 48
+    reps = int(argv[2]) if len(argv) > 2 else 10
+    ctx = make_ctx(n)
+    print(f"{n} pontos, {reps} repetições")
+    run("vetor", lambda: _page(lambda c: draw_chart_vector(c, 40, 400, *CHART_BOX, ctx)), reps)
+    run("matplotlib", lambda: _page(_draw_png(_render_ctx_png(ctx))), reps)
+    if importlib.util.find_spec("kaleido") is None:
+        print("plotly       (kaleido não instalado — ignorado)")
+        return
+    fig = plotly_fig(ctx)
+    run("plotly", lambda: _page(_draw_png(_export_fig_to_png_bytes(fig, ctx))), reps)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_visao_geral.py — histórico inteiro do Cronograma: mês a mês × cubo diário
+# "mês a mês" = o que a página permitia: filtrar por yyyymm e montar o calendário de cada mês.
+# "cubo" = agenda_calendar.cubo_status (um bincount sobre o estado) + um heatmap sites × meses.
+# Mede montar e serializar (to_json) as figuras.
+#
+# Uso:  python benchmarks/bench_visao_geral.py [anos] [sites] [passagens_por_site_dia]
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from agenda_calendar import STATUS, cubo_status, montar_calendario, montar_visao_geral  # noqa: E402
+
+
+def make_history(anos: int, n_sites: int, per_site_day: float) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    dias = pd.date_range("2020-01-01", periods=365 * anos, freq="D")
+    n = int(len(dias) * n_sites * per_site_day)
+    data = dias[rng.integers(0, len(dias), n)]
+    df = pd.DataFrame({
+        "site_nome": rng.choice([f"Site {i:02d}" for i in range(n_sites)], n),
+        "data": data.date,
+        "status": rng.choice(STATUS, n, p=[0.6, 0.1, 0.3]),
+    })
+    df["yyyymm"] = data.strftime("%Y-%m")
+    return df
+
+
+def por_mes(df: pd.DataFrame) -> None:
+    for m in sorted(df["yyyymm"].unique()):
+        montar_calendario(df[df["yyyymm"] == m], m).to_json()
+
+
+def cubo(df: pd.DataFrame) -> None:
+    montar_visao_geral(cubo_status(df), "Aprovadas").to_json()
+
+
+def run(label, fn, df, reps) -> float:
+    best = float("inf")
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - t0)
+    print(f"{label:>10}: {best * 1000:8.1f} ms")
+    return best
+
+
+def main(argv) -> None:
+    anos = int(argv[1]) if len(argv) > 1 else 5
+    n_sites = int(argv[2]) if len(argv) > 2 else 30
+    per = float(argv[3]) if len(argv) > 3 else 0.3
+    df = make_history(anos, n_sites, per)
+    print(f"{len(df)} passagens, {n_sites} sites, {df['yyyymm'].nunique()} meses")
+    old = run("mês a mês", por_mes, df, 1)
+    new = run("cubo", cubo, df, 3)
+    print(f"speedup: {old / new:.1f}×")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
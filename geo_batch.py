@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# geo_batch.py — geração em lote dos PDFs OGMP L5 (todos os sites de um workbook)
+# Os relatórios são distribuídos num pool de processos. Os workers compartilham o workbook já
+# parseado (cubos no cache em disco, abertos via mmap — cada worker carrega os seus) e as imagens (cache
+# em disco do ImageService); cada PDF é gravado no ZIP, em arquivo temporário, assim que fica pronto.
+
+import io
+import os
+import csv
+import time
+import uuid
+import zipfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from geo_diskcache import CubeDiskCache
+from geo_images import DEFAULT_BASE_URL, ImageService
+from geo_report import LOGO_REL_PATH, build_report_pdf, report_kwargs
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+ZIP_MAX_AGE_S = 3600   # ZIPs de lotes anteriores mais velhos que isso são apagados ao criar um novo
+
+_worker: Dict = {}  # estado de cada processo do pool (caches abertos 1x por worker)
+
+
+def report_filename(site: str, label: str) -> str:
+    return f"relatorio_geoportal_OGMP_L5_{site}_{label}.pdf".replace(" ", "_")
+
+
+def plan_batch(wb_key: str, site_labels: Dict[str, List[str]], opts: Dict,
+               label: Optional[str] = None) -> List[Dict]:
+    """Uma tarefa por (site, data); `site_labels` = rótulos das datas por site (CubeDiskCache.labels).
+    `label` filtra um mês (ex.: "Março de 2024"); None = todas as datas."""
+    tasks = []
+    for site, labels in site_labels.items():
+        for d, lab in enumerate(labels):
+            if label is None or lab == label:
+                tasks.append({"wb_key": wb_key, "site": site, "date_pos": d, "label": lab, "opts": opts})
+    return tasks
+
+
+def _init_worker(cube_root: str, cube_max: int, img_dir: str, img_max: int) -> None:
+    _worker["disk"] = CubeDiskCache(Path(cube_root), cube_max)
+    _worker["images"] = ImageService(Path(img_dir), img_max)
+    _worker["cubes"] = {}
+
+
+def render_one(task: Dict) -> Dict:
+    """Executa no worker: carrega o cubo do site (disco) e gera o PDF de uma data."""
+    t0 = time.perf_counter()
+    out = {"site": task["site"], "data": task["label"], "arquivo": report_filename(task["site"], task["label"]),
+           "pdf": None, "segundos": 0.0, "erro": None}
+    try:
+        key = (task["wb_key"], task["site"])
+        cube = _worker["cubes"].get(key)
+        if cube is None:
+            cube = _worker["disk"].load_cube(*key)
+            if cube is None:
+                raise RuntimeError("cubo do site ausente no cache em disco")
+            _worker["cubes"][key] = cube
+        kwargs = report_kwargs(cube, cube.site_pos(task["site"]), task["date_pos"], task["opts"])
+        out["pdf"] = build_report_pdf(images=_worker["images"], **kwargs)
+    except Exception as e:
+        out["erro"] = str(e)
+    out["segundos"] = round(time.perf_counter() - t0, 2)
+    return out
+
+
+def new_zip_path(directory: Path, max_age_s: float = ZIP_MAX_AGE_S) -> Path:
+    """Caminho para o ZIP de um lote novo em `directory`; apaga os de lotes antigos."""
+    directory.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    for old in directory.glob("lote-*.zip"):
+        try:
+            if now - old.stat().st_mtime > max_age_s:
+                old.unlink()
+        except OSError:
+            pass
+    return directory / f"lote-{uuid.uuid4().hex}.zip"
+
+
+def _failed(task: Dict, error: str) -> Dict:
+    """Resultado de uma tarefa que não voltou do worker (processo caiu, erro ao devolver o resultado)."""
+    return {"site": task["site"], "data": task["label"], "arquivo": report_filename(task["site"], task["label"]),
+            "pdf": None, "segundos": 0.0, "erro": error}
+
+
+def _manifest(results: List[Dict]) -> str:
+    """manifesto.csv do ZIP: um relatório por linha, com o erro dos que falharam."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(["site", "data", "arquivo", "segundos", "erro"])
+    for r in results:
+        w.writerow([r["site"], r["data"], r["arquivo"] if not r["erro"] else "", r["segundos"], r["erro"] or ""])
+    return buf.getvalue()
+
+
+def run_batch(tasks: List[Dict], disk: CubeDiskCache, images: ImageService, zip_path: Path,
+              max_workers: int = DEFAULT_WORKERS,
+              on_result: Optional[Callable[[int, int, Dict], None]] = None) -> Path:
+    """Gera os PDFs em paralelo direto no ZIP `zip_path` (nunca o lote inteiro em memória) e o devolve.
+    `on_result(feitos, total, resultado_sem_pdf)` a cada relatório.
+
+    Os cubos de todos os sites das tarefas precisam estar no cache em disco (`disk`); cada worker os carrega.
+    Falha parcial não derruba o lote: o erro de cada relatório vai para o resultado e para o
+    `manifesto.csv` do ZIP. Se um worker morrer (BrokenProcessPool), as tarefas perdidas rodam de novo,
+    isoladas (1 worker), até separar a culpada. Erro fatal (ex.: disco cheio, callback da página
+    interrompido) apaga o ZIP incompleto antes de propagar.
+    """
+    # logo comum a todos os relatórios: baixa 1x antes de abrir o pool
+    images.tier(f"{DEFAULT_BASE_URL.rstrip('/')}/{LOGO_REL_PATH.lstrip('/')}", "thumb", flat=True)
+
+    names = set()
+    results: List[Dict] = []
+    # spawn: o servidor do Streamlit tem threads; fork herdaria locks em estado indefinido
+    ctx = mp.get_context("spawn")
+
+    def _record(zf: zipfile.ZipFile, res: Dict) -> None:
+        pdf = res.pop("pdf")
+        if pdf is not None:
+            name, n = res["arquivo"], 1
+            while name in names:           # mesma data repetida na aba
+                n += 1; name = res["arquivo"].replace(".pdf", f"_{n}.pdf")
+            names.add(name); res["arquivo"] = name
+            zf.writestr(name, pdf)
+        results.append(res)
+        if on_result is not None:
+            on_result(len(results), len(tasks), res)
+
+    def _round(zf: zipfile.ZipFile, pending: List[Dict], workers: int) -> List[Dict]:
+        """Roda `pending` num pool novo; devolve as tarefas perdidas se um worker morrer (na ordem)."""
+        lost = []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(str(disk.root), disk.max_bytes,
+                                           str(images.cache_dir), images.max_bytes)) as pool:
+            futures = {pool.submit(render_one, t): i for i, t in enumerate(pending)}
+            for fut in as_completed(futures):
+                task = pending[futures[fut]]
+                try:
+                    res = fut.result()
+                except BrokenProcessPool:
+                    lost.append(futures[fut]); continue
+                except Exception as e:   # ex.: tarefa ou resultado que não passa pelo pickle
+                    res = _failed(task, str(e) or e.__class__.__name__)
+                _record(zf, res)
+        return [pending[i] for i in sorted(lost)]
+
+    try:
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            pending = _round(zf, list(tasks), max(1, min(max_workers, len(tasks) or 1)))
+            # um worker morreu: o resto roda com 1 worker, em ordem — a cada nova queda a tarefa em
+            # execução (a 1ª perdida) é a culpada: vai para os erros e as seguintes rodam de novo
+            if pending:
+                pending = _round(zf, pending, 1)
+            while pending:
+                _record(zf, _failed(pending[0], "processo do relatório encerrado (falha grave no worker)"))
+                pending = _round(zf, pending[1:], 1) if len(pending) > 1 else []
+            zf.writestr("manifesto.csv", _manifest(results))
+    except BaseException:
+        try:
+            zip_path.unlink()
+        except OSError:
+            pass
+        raise
+    return zip_path
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# geo_cube.py — "cubo" de sites do Geoportal (sites × parâmetros × datas)
+# A planilha é lida e normalizada UMA vez por hash do upload; depois disso, trocar site/data
+# na UI é só lookup em arrays NumPy (sem copiar/reindexar a aba inteira a cada rerun).
+
+import re
+import hashlib
+import unicodedata
+from typing import Dict, Iterable, List, Tuple, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# ================= Helpers de planilha =================
+def workbook_digest(file_bytes: bytes) -> str:
+    """SHA-256 do conteúdo do upload (chave de cache do cubo)."""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
+    cols = list(df.columns)
+    if cols:
+        cols[0] = "Parametro"
+    normed = []
+    for c in cols:
+        s = str(c).strip()
+        if s.lower() in ("lat","latitude"):
+            normed.append("Lat")
+        elif s.lower() in ("long","lon","longitude"):
+            normed.append("Long")
+        else:
+            normed.append(s)
+    df.columns = normed
+    return df
+
+def norm_param(s) -> str:
+    """Normaliza nome de parâmetro (case/acento/espaços-insensitive)."""
+    if s is None or (isinstance(s, float) and pd.isna(s)): return ""
+    s = unicodedata.normalize("NFKD", str(s))
+    s = "".join(ch for ch in s if not unicodedata.category(ch).startswith("M"))
+    return re.sub(r"\s+", " ", s).strip().lower()
+
+def _fmt_pt_month(dt: pd.Timestamp) -> str:
+    meses = [
+        "janeiro","fevereiro","março","abril","maio","junho",
+        "julho","agosto","setembro","outubro","novembro","dezembro"
+    ]
+    return f"{meses[dt.month-1].capitalize()} de {dt.year}"
+
+def extract_dates_from_first_row(df: pd.DataFrame) -> Tuple[List[str], Dict[str, str], List[pd.Timestamp]]:
+    cols = list(df.columns)
+    try:
+        data_idx = cols.index("Data")
+    except ValueError:
+        data_idx = 3 if len(cols) > 3 else 0
+    date_cols = cols[data_idx:]
+    labels, stamps = {}, []
+    for c in date_cols:
+        v = df.loc[0, c] if 0 in df.index else None
+        ts = pd.NaT
+        if pd.notna(v) and str(v).strip() != "":
+            for dayfirst in (True, False):
+                try:
+                    parsed = pd.to_datetime(v, dayfirst=dayfirst, errors="raise")
+                    ts = pd.Timestamp(year=parsed.year, month=parsed.month, day=1)
+                    break
+                except Exception:
+                    continue
+        if pd.isna(ts):
+            try:
+                parsed = pd.to_datetime(str(c), errors="raise", dayfirst=True)
+                ts = pd.Timestamp(year=parsed.year, month=parsed.month, day=1)
+            except Exception:
+                ts = pd.NaT
+        labels[c] = _fmt_pt_month(ts) if pd.notna(ts) else str(c)
+        stamps.append(ts)
+    return date_cols, labels, stamps
+
+def coerce_numeric(values) -> np.ndarray:
+    """Coerção numérica vetorizada: UMA chamada a pd.to_numeric para o bloco inteiro (NaN onde não é número)."""
+    arr = np.asarray(values, dtype=object)
+    flat = pd.to_numeric(pd.Series(arr.ravel(), dtype=object), errors="coerce")
+    return flat.to_numpy(dtype=np.float64, na_value=np.nan).reshape(arr.shape)
+
+def extract_series_batch(dfi: pd.DataFrame, date_cols_sorted, dates_ts_sorted,
+                         params: Dict[str, str], text_params: Iterable[str] = ()) -> pd.DataFrame:
+    """Extrai vários parâmetros de uma vez de uma aba indexada por 'Parametro'.
+
+    `params` = {coluna de saída: nome da linha}. Retorna um frame alinhado por data
+    (``date`` + uma coluna por parâmetro; NaN onde não há valor), ordenado por data.
+    Colunas em `text_params` mantêm o valor original (ex.: satélite) em vez de numérico.
+    """
+    text_params = set(text_params)
+    idx_map: Dict[str, int] = {}
+    for pos, ix in enumerate(dfi.index):
+        idx_map.setdefault(norm_param(ix), pos)
+    col_pos = dfi.columns.get_indexer(list(date_cols_sorted))
+    dates = pd.DatetimeIndex(list(dates_ts_sorted))
+    keep = (col_pos >= 0) & ~dates.isna()
+
+    out = pd.DataFrame({"date": dates[keep]})
+    found = {out_col: idx_map.get(norm_param(row)) for out_col, row in params.items()}
+    row_pos = [r for r in found.values() if r is not None]
+    block = dfi.iloc[row_pos, col_pos[keep]].to_numpy(dtype=object) if row_pos else np.empty((0, int(keep.sum())), dtype=object)
+    nums = coerce_numeric(block)
+    i = 0
+    for out_col, r in found.items():
+        if r is None:
+            out[out_col] = np.nan
+            continue
+        if out_col in text_params:
+            out[out_col] = pd.Series(block[i], dtype=object).where(pd.notna(block[i]), None)
+        else:
+            out[out_col] = nums[i]
+        i += 1
+    return out.sort_values("date", kind="stable").reset_index(drop=True)
+
+def _first_coord(df: pd.DataFrame, col: str) -> float:
+    if col not in df.columns:
+        return np.nan
+    vals = pd.to_numeric(df[col].dropna(), errors="coerce")
+    return float(vals.iloc[0]) if len(vals) else np.nan
+
+
+# ================= Cubo =================
+class SiteCube:
+    """Sites × parâmetros × datas em arrays NumPy.
+
+    - ``numeric[s, p, d]``: float64 (NaN onde a célula não é numérica / não existe)
+    - ``raw[s, p, d]``: valor original da célula (texto, data, número) ou None
+    - ``stamps[s, d]``: datetime64 (mês da coluna; NaT no preenchimento)
+    - ``param_index``: nome normalizado → p (compartilhado entre todos os sites)
+    As datas de cada site já vêm ordenadas; ``n_dates(s)`` diz quantas colunas são válidas.
+    """
+
+    def __init__(self, sites, param_keys, rows, date_cols, labels, stamps, numeric, raw, lat, lon):
+        self.sites: List[str] = sites
+        self.param_keys: List[str] = param_keys
+        self.param_index: Dict[str, int] = {k: i for i, k in enumerate(param_keys)}
+        self.rows: List[List[Tuple[str, int]]] = rows        # por site: (rótulo original, p) na ordem da aba
+        self.date_cols: List[List[str]] = date_cols
+        self.labels: List[List[str]] = labels
+        self.stamps: np.ndarray = stamps
+        self.numeric: np.ndarray = numeric
+        self.raw: np.ndarray = raw
+        self.lat: np.ndarray = lat
+        self.lon: np.ndarray = lon
+        self._site_pos = {name: i for i, name in enumerate(sites)}
+
+    def site_pos(self, site: str) -> int:
+        return self._site_pos[site]
+
+    def n_dates(self, s: int) -> int:
+        return len(self.date_cols[s])
+
+    def find_param(self, name: str, *aliases, prefix: bool = True) -> Optional[int]:
+        """Índice do parâmetro por nome/aliases; opcionalmente aceita prefixo (como o antigo get_from_dfi)."""
+        keys = [norm_param(name)] + [norm_param(a) for a in aliases]
+        for k in keys:
+            if k and k in self.param_index:
+                return self.param_index[k]
+        if prefix:
+            for p, nk in enumerate(self.param_keys):
+                if any(nk.startswith(k) for k in keys if k):
+                    return p
+        return None
+
+    def value(self, s: int, d: int, name: str, *aliases):
+        """Valor original da célula do parâmetro (mesma busca do antigo get_from_dfi)."""
+        p = self.find_param(name, *aliases)
+        return None if p is None else self.raw[s, p, d]
+
+    def record(self, s: int, d: int) -> Dict[str, Optional[str]]:
+        """Equivalente ao antigo build_record_for_month: {parâmetro: valor, _lat, _long}."""
+        rec = {label: self.raw[s, p, d] for label, p in self.rows[s]}
+        rec["_lat"] = None if np.isnan(self.lat[s]) else float(self.lat[s])
+        rec["_long"] = None if np.isnan(self.lon[s]) else float(self.lon[s])
+        return rec
+
+    def table(self, s: int, d: int) -> pd.DataFrame:
+        """Tabela parâmetro → valor (coluna 'Valor') na ordem original da aba."""
+        labels = [label for label, _ in self.rows[s]]
+        vals = [self.raw[s, p, d] for _, p in self.rows[s]]
+        return pd.DataFrame({"Valor": vals}, index=pd.Index(labels, name="Parametro"))
+
+    def series_frame(self, s: int, params: Dict[str, str], text_params: Iterable[str] = ()) -> pd.DataFrame:
+        """Vários parâmetros do site de uma vez, alinhados por data (mesmo formato de extract_series_batch)."""
+        text_params = set(text_params)
+        n = self.n_dates(s)
+        dates = self.stamps[s, :n]
+        ok = ~np.isnat(dates)
+        out = pd.DataFrame({"date": pd.to_datetime(dates[ok])})
+        for out_col, row in params.items():
+            p = self.find_param(row, prefix=False)
+            if p is None:
+                out[out_col] = np.nan
+            elif out_col in text_params:
+                out[out_col] = self.raw[s, p, :n][ok]
+            else:
+                out[out_col] = self.numeric[s, p, :n][ok]
+        return out.sort_values("date", kind="stable").reset_index(drop=True)
+
+
+def build_site_cube(book: Dict[str, pd.DataFrame]) -> SiteCube:
+    """Monta o cubo a partir das abas já lidas (uma aba = um site)."""
+    sites = sorted(book.keys())
+    param_keys: List[str] = []
+    param_index: Dict[str, int] = {}
+    per_site = []
+
+    for name in sites:
+        df = normalize_cols(book[name].copy()).reset_index(drop=True)
+        date_cols, labels, stamps = extract_dates_from_first_row(df)
+        order = sorted(range(len(date_cols)), key=lambda i: (pd.Timestamp.min if pd.isna(stamps[i]) else stamps[i]))
+        cols_sorted = [date_cols[i] for i in order]
+
+        params = df["Parametro"].astype(str).str.strip().tolist() if len(df.columns) else []
+        block = df[cols_sorted] if cols_sorted else pd.DataFrame(index=df.index)
+        numeric = coerce_numeric(block.to_numpy(dtype=object))
+        raw = block.astype(object).where(block.notna(), None).to_numpy(dtype=object)
+
+        rows, seen = [], set()
+        for r, label in enumerate(params):
+            key = norm_param(label)
+            if key in seen:            # parâmetro duplicado na aba: vale a 1ª ocorrência
+                continue
+            seen.add(key)
+            if key not in param_index:
+                param_index[key] = len(param_keys)
+                param_keys.append(key)
+            rows.append((label, param_index[key], r))
+
+        per_site.append({
+            "rows": rows,
+            "date_cols": cols_sorted,
+            "labels": [labels[c] for c in cols_sorted],
+            "stamps": [stamps[i] for i in order],
+            "numeric": numeric,
+            "raw": raw,
+            "lat": _first_coord(df, "Lat"),
+            "lon": _first_coord(df, "Long"),
+        })
+
+    S, P = len(sites), len(param_keys)
+    D = max((len(x["date_cols"]) for x in per_site), default=0)
+    numeric = np.full((S, P, D), np.nan, dtype=np.float64)
+    raw = np.full((S, P, D), None, dtype=object)
+    stamps = np.full((S, D), np.datetime64("NaT"), dtype="datetime64[ns]")
+    for s, x in enumerate(per_site):
+        n = len(x["date_cols"])
+        src = [r for _, _, r in x["rows"]]
+        dst = [p for _, p, _ in x["rows"]]
+        if n and src:
+            numeric[s, dst, :n] = x["numeric"][src]
+            raw[s, dst, :n] = x["raw"][src]
+        stamps[s, :n] = pd.DatetimeIndex(x["stamps"]).to_numpy(dtype="datetime64[ns]")
+
+    return SiteCube(
+        sites=sites,
+        param_keys=param_keys,
+        rows=[[(label, p) for label, p, _ in x["rows"]] for x in per_site],
+        date_cols=[x["date_cols"] for x in per_site],
+        labels=[x["labels"] for x in per_site],
+        stamps=stamps,
+        numeric=numeric,
+        raw=raw,
+        lat=np.array([x["lat"] for x in per_site], dtype=np.float64),
+        lon=np.array([x["lon"] for x in per_site], dtype=np.float64),
+    )
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# geo_diskcache.py — cache em disco (content-addressed) dos cubos de site do Geoportal
+# Chave = SHA-256 do upload. Cada site vira um diretório com arrays .npy (abertos via mmap)
+# + meta.json; reuploads e restarts do servidor não passam mais pelo openpyxl.
+# Despejo LRU por tamanho total (acesso = mtime do diretório do workbook); o total corre em memória e
+# a árvore só é varrida quando ele passa do limite.
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import datetime as dt
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from geo_cube import SiteCube
+
+DEFAULT_MAX_MB = 512
+
+
+_TIME_TYPES = (("timestamp", pd.Timestamp, pd.Timestamp.fromisoformat),   # subclasse de datetime: antes
+               ("datetime", dt.datetime, dt.datetime.fromisoformat),
+               ("date", dt.date, dt.date.fromisoformat),
+               ("time", dt.time, dt.time.fromisoformat))
+
+
+def _jsonable(v):
+    """Célula crua → JSON. Números e textos ficam como estão; datas/horas viram ``{"$t": tipo, "v": iso}``
+    (restauradas por `_from_json` com o mesmo tipo do cubo recém-montado)."""
+    if v is None:
+        return None
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, (bool, int, float, str)):
+        return v
+    for tag, cls, _ in _TIME_TYPES:
+        if isinstance(v, cls):
+            return {"$t": tag, "v": v.isoformat()}
+    return str(v)
+
+
+def _from_json(v):
+    if isinstance(v, dict) and "$t" in v:
+        for tag, _, parse in _TIME_TYPES:
+            if v["$t"] == tag:
+                return parse(v["v"])
+    return v
+
+
+def _dir_size(p: Path) -> int:
+    total = 0
+    for f in p.rglob("*"):
+        try:
+            if f.is_file():
+                total += f.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+class CubeDiskCache:
+    """Diretório raiz → ``<sha256>/sheets.json`` + ``<sha256>/site-<id>/{numeric,stamps}.npy, meta.json``."""
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._bytes: Optional[int] = None   # total em disco (medido uma vez; depois somado a cada gravação)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CubeDiskCache":
+        root = os.getenv("GEO_CACHE_DIR") or str(Path(tempfile.gettempdir()) / "geoportal_cache")
+        max_mb = float(os.getenv("GEO_CACHE_MAX_MB", DEFAULT_MAX_MB))
+        return cls(Path(root), int(max_mb * 1024 * 1024))
+
+    # ---------- caminhos ----------
+    def _wb_dir(self, wb_key: str) -> Path:
+        return self.root / wb_key
+
+    def _site_dir(self, wb_key: str, site: str) -> Path:
+        sid = hashlib.sha1(site.encode("utf-8")).hexdigest()[:16]
+        return self._wb_dir(wb_key) / f"site-{sid}"
+
+    def _touch(self, wb_key: str) -> None:
+        try:
+            os.utime(self._wb_dir(wb_key), None)
+        except OSError:
+            pass
+
+    # ---------- nomes das abas ----------
+    def sheet_names(self, wb_key: str) -> Optional[List[str]]:
+        p = self._wb_dir(wb_key) / "sheets.json"
+        try:
+            names = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        self._touch(wb_key)
+        return names
+
+    def save_sheet_names(self, wb_key: str, names: List[str]) -> None:
+        d = self._wb_dir(wb_key)
+        d.mkdir(parents=True, exist_ok=True)
+        tmp = d / f".sheets.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(list(names), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, d / "sheets.json")
+
+    # ---------- cubos ----------
+    def has_cube(self, wb_key: str, site: str) -> bool:
+        return (self._site_dir(wb_key, site) / "meta.json").exists()
+
+    def labels(self, wb_key: str, site: str) -> Optional[List[str]]:
+        """Rótulos das datas do site (só o meta.json; sem abrir os arrays) — para planejar o lote."""
+        try:
+            return json.loads((self._site_dir(wb_key, site) / "meta.json").read_text(encoding="utf-8"))["labels"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def load_cube(self, wb_key: str, site: str) -> Optional[SiteCube]:
+        d = self._site_dir(wb_key, site)
+        try:
+            meta = json.loads((d / "meta.json").read_text(encoding="utf-8"))
+            numeric = np.load(d / "numeric.npy", mmap_mode="r")
+            stamps = np.load(d / "stamps.npy", mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        raw = np.empty(numeric.shape, dtype=object)
+        raw[...] = None
+        for p, row in meta["raw"].items():
+            raw[0, int(p), :len(row)] = [_from_json(v) for v in row]
+        self._touch(wb_key)
+        return SiteCube(
+            sites=[meta["site"]],
+            param_keys=meta["param_keys"],
+            rows=[[(label, p) for label, p in meta["rows"]]],
+            date_cols=[meta["date_cols"]],
+            labels=[meta["labels"]],
+            stamps=stamps,
+            numeric=numeric,
+            raw=raw,
+            lat=np.array([np.nan if meta["lat"] is None else meta["lat"]], dtype=np.float64),
+            lon=np.array([np.nan if meta["lon"] is None else meta["lon"]], dtype=np.float64),
+        )
+
+    def save_cube(self, wb_key: str, site: str, cube: SiteCube) -> None:
+        """Grava o cubo de UM site (``cube.sites == [site]``) de forma atômica e aplica o LRU."""
+        s = cube.site_pos(site)
+        n = cube.n_dates(s)
+        used = sorted({p for _, p in cube.rows[s]})
+        meta = {
+            "site": site,
+            "param_keys": cube.param_keys,
+            "rows": [[label, p] for label, p in cube.rows[s]],
+            "date_cols": [str(c) for c in cube.date_cols[s]],
+            "labels": cube.labels[s],
+            "raw": {str(p): [_jsonable(v) for v in cube.raw[s, p, :n]] for p in used},
+            "lat": None if np.isnan(cube.lat[s]) else float(cube.lat[s]),
+            "lon": None if np.isnan(cube.lon[s]) else float(cube.lon[s]),
+            "saved_at": time.time(),
+        }
+        final = self._site_dir(wb_key, site)
+        if (final / "meta.json").exists():
+            return
+        final.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=".site-", dir=final.parent))
+        try:
+            np.save(tmp / "numeric.npy", np.ascontiguousarray(cube.numeric[s:s+1, :, :n]))
+            np.save(tmp / "stamps.npy", np.ascontiguousarray(cube.stamps[s:s+1, :n]))
+            (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, final)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # outro processo gravou primeiro (ou disco cheio)
+            return
+        self._touch(wb_key)
+        self._account(_dir_size(final), keep=wb_key)
+
+    def _account(self, added: int, keep: Optional[str] = None) -> None:
+        """Soma `added` ao total corrente; só varre a árvore (evict) quando o total passa do limite.
+        Antes, cada aba gravada varria o cache inteiro (N abas × tamanho do cache na thread de parse)."""
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self.stats()["bytes"]   # inclui o que acabou de ser gravado
+            else:
+                self._bytes += added
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict(keep=keep)
+
+    # ---------- LRU ----------
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Remove workbooks menos recentemente usados até caber em `max_bytes` (exceto `keep`).
+        Retorna bytes liberados."""
+        entries = []
+        for d in self.root.iterdir():
+            if d.is_dir() and not d.name.startswith("."):
+                try:
+                    entries.append((d.stat().st_mtime, _dir_size(d), d))
+                except OSError:
+                    pass
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, d in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if d.name == keep:
+                continue
+            shutil.rmtree(d, ignore_errors=True)
+            total -= size; freed += size
+        with self._lock:
+            self._bytes = total   # reancora o total corrente (inclui gravações de outros processos)
+        return freed
+
+    def stats(self) -> dict:
+        dirs = [d for d in self.root.iterdir() if d.is_dir() and not d.name.startswith(".")]
+        return {"workbooks": len(dirs), "bytes": sum(_dir_size(d) for d in dirs), "max_bytes": self.max_bytes}
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# geo_excel.py — leitura em streaming (openpyxl read-only) dos workbooks do Geoportal
+# Só a aba do site selecionado é lida na hora; as demais são carregadas em segundo plano.
+# Cada aba registra o tempo de parse (exibido na sidebar do Geoportal).
+
+import io
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from lazy_imports import lazy
+
+openpyxl = lazy("openpyxl")   # só quando uma planilha é aberta
+
+
+def _sheet_rows_to_frame(rows: List[tuple]) -> pd.DataFrame:
+    """Converte linhas cruas (values_only) em DataFrame com a mesma convenção do pd.read_excel:
+    1ª linha = cabeçalho, cabeçalho vazio → 'Unnamed: i', nomes repetidos → 'X.1', 'X.2'..."""
+    # descarta linhas/colunas vazias no final (read-only pode reportar dimensão maior)
+    def _last_filled(row) -> int:
+        for i in range(len(row) - 1, -1, -1):
+            if row[i] is not None and not (isinstance(row[i], str) and row[i] == ""):
+                return i + 1
+        return 0
+
+    widths = [_last_filled(r) for r in rows]
+    while widths and widths[-1] == 0:
+        widths.pop(); rows = rows[:-1]
+    if not rows:
+        return pd.DataFrame()
+    width = max(widths)
+    rows = [tuple(r[:width]) + (None,) * (width - len(r[:width])) for r in rows]
+
+    header, seen = [], {}
+    for i, h in enumerate(rows[0]):
+        name = f"Unnamed: {i}" if h is None or (isinstance(h, str) and not h.strip()) else h
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        header.append(name)
+    return pd.DataFrame(rows[1:], columns=header)
+
+
+class StreamingWorkbook:
+    """Workbook aberto em modo read-only; abas parseadas sob demanda e cacheadas.
+
+    `sheet(name)` devolve a aba (parse imediato se ainda não lida). `start_background()` dispara uma
+    thread que lê as abas restantes. O openpyxl read-only não é thread-safe, então o parse é
+    serializado por um lock — a aba pedida pela UI espera no máximo a aba que já está em leitura.
+    `on_sheet(nome, df)` (opcional) é chamado após o parse de cada aba (ex.: persistir no cache em disco).
+    """
+
+    def __init__(self, file_bytes: bytes, on_sheet: Optional[Callable[[str, pd.DataFrame], None]] = None):
+        self._wb = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+        self.sheet_names: List[str] = list(self._wb.sheetnames)
+        self.timings: Dict[str, float] = {}          # aba → segundos de parse
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._on_sheet = on_sheet
+
+    def _parse(self, name: str) -> pd.DataFrame:
+        with self._lock:
+            if name in self._frames:
+                return self._frames[name]
+            t0 = time.perf_counter()
+            ws = self._wb[name]
+            df = _sheet_rows_to_frame(list(ws.iter_rows(values_only=True)))
+            self.timings[name] = time.perf_counter() - t0
+            self._frames[name] = df
+            if len(self._frames) == len(self.sheet_names):
+                self._wb.close()
+        if self._on_sheet is not None:
+            try:
+                self._on_sheet(name, df)
+            except Exception:
+                pass  # falha no callback não invalida a aba já lida
+        return df
+
+    def sheet(self, name: str) -> pd.DataFrame:
+        if name not in self.sheet_names:
+            raise KeyError(name)
+        df = self._frames.get(name)
+        return df if df is not None else self._parse(name)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._frames
+
+    def start_background(self) -> None:
+        if self._thread is not None:
+            return
+        def _run():
+            for name in self.sheet_names:
+                try:
+                    self._parse(name)
+                except Exception as e:   # não derruba a UI; a aba é relida (e falha visivelmente) sob demanda
+                    self._errors[name] = str(e)
+        self._thread = threading.Thread(target=_run, name="geo-excel-bg", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera a leitura em segundo plano terminar (usado por quem precisa de todas as abas)."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return all(n in self._frames for n in self.sheet_names)
+
+    def book(self) -> Dict[str, pd.DataFrame]:
+        """Todas as abas (lê as que faltarem)."""
+        return {name: self.sheet(name) for name in self.sheet_names}
+
+    def timings_frame(self) -> pd.DataFrame:
+        rows = []
+        for name in self.sheet_names:
+            secs = self.timings.get(name)
+            status = "erro" if name in self._errors else ("lida" if secs is not None else "pendente")
+            rows.append({"aba": name, "status": status, "parse (ms)": None if secs is None else round(secs * 1000, 1)})
+        return pd.DataFrame(rows)
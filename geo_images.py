@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+# geo_images.py — serviço único de imagens do Geoportal (plumas e logo do PDF)
+# Sessão HTTP com pool de conexões, revalidação por ETag/Last-Modified (304 = sem re-download)
+# e cache em dois níveis: disco (originais + derivados, LRU por tamanho) + memória (derivados prontos).
+# Derivados reduzidos (thumb/screen/print, JPEG progressivo ou WebP se houver transparência):
+# a UI e o PDF pedem o menor nível adequado em vez do bitmap original.
+# URLs absolutas + sessão injetável: dá para testar contra um servidor HTTP local.
+
+import io
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from PIL import Image
+
+DEFAULT_BASE_URL = "https://raw.githubusercontent.com/dapsat100-star/geoportal/main"
+DEFAULT_MAX_MB = 256
+DEFAULT_MAX_AGE = 300  # segundos sem revalidar
+
+# Níveis de derivados: maior lado em pixels (nunca amplia a original)
+TIERS = {"thumb": 320, "screen": 1280, "print": 1600}
+
+
+def pick_tier(required_px: float) -> str:
+    """Menor nível cujo maior lado cobre `required_px` (ou o maior nível disponível)."""
+    for name, edge in sorted(TIERS.items(), key=lambda kv: kv[1]):
+        if edge >= required_px:
+            return name
+    return max(TIERS, key=TIERS.get)
+
+
+def _variant(tier: str, flat: bool) -> str:
+    """Nome do derivado em cache: `flat` (destino PDF) é uma variante à parte, exceto no print (sempre achatado)."""
+    return f"{tier}-flat" if flat and tier != "print" else tier
+
+
+def make_derivative(img: Image.Image, tier: str, flat: bool = False) -> bytes:
+    """Reduz `img` ao nível `tier`. Opaca → JPEG progressivo; com alfa → WebP. Com `flat` (imagem que vai
+    para o PDF) ou no print, o alfa é achatado em branco e sai JPEG, que o ReportLab embute sem recodificar."""
+    im = img.copy()
+    im.thumbnail((TIERS[tier], TIERS[tier]), Image.LANCZOS)
+    has_alpha = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+    buf = io.BytesIO()
+    if has_alpha and not flat and tier != "print":
+        im.convert("RGBA").save(buf, format="WEBP", quality=82, method=4)
+    else:
+        if has_alpha:
+            rgba = im.convert("RGBA")
+            flat = Image.new("RGB", rgba.size, (255, 255, 255))
+            flat.paste(rgba, mask=rgba.split()[-1])
+            im = flat
+        im.convert("RGB").save(buf, format="JPEG", quality=85 if tier == "print" else 80,
+                               progressive=True, optimize=True)
+    return buf.getvalue()
+
+
+def resolve_image_target(path_str: str) -> Optional[str]:
+    if path_str is None or (isinstance(path_str, float) and pd.isna(path_str)): return None
+    s = str(path_str).strip()
+    if not s: return None
+    s = s.replace("\\","/"); s = s[2:] if s.startswith("./") else s
+    if s.lower().startswith(("http://","https://")): return s
+    return f"{DEFAULT_BASE_URL.rstrip('/')}/{s.lstrip('/')}"
+
+
+def make_session(pool_size: int = 8) -> requests.Session:
+    sess = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    sess.mount("http://", adapter)
+    sess.mount("https://", adapter)
+    return sess
+
+
+class ImageService:
+    """`fetch(url)` → bytes da original; `tier(url, nível)` → bytes do derivado (cacheado em memória).
+
+    Entradas com menos de `max_age` s são servidas sem rede; depois disso é feito um GET
+    condicional (If-None-Match / If-Modified-Since). Se a rede falhar, serve a cópia antiga.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 mem_items: int = 64, max_age: float = DEFAULT_MAX_AGE,
+                 session: Optional[requests.Session] = None, timeout: float = 10):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self.mem_items = mem_items
+        self.max_age = max_age
+        self.timeout = timeout
+        self.session = session or make_session()
+        self._tiers: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._checked = {}   # url → última validação (espelho em memória do meta em disco)
+        self._lock = threading.Lock()
+        self.stats = {"mem_hits": 0, "disk_hits": 0, "revalidated": 0, "downloads": 0, "errors": 0, "derived": 0}
+
+    @classmethod
+    def from_env(cls) -> "ImageService":
+        root = os.getenv("GEO_IMG_CACHE_DIR") or str(Path(tempfile.gettempdir()) / "geoportal_images")
+        max_mb = float(os.getenv("GEO_IMG_CACHE_MAX_MB", DEFAULT_MAX_MB))
+        max_age = float(os.getenv("GEO_IMG_MAX_AGE", DEFAULT_MAX_AGE))
+        return cls(Path(root), int(max_mb * 1024 * 1024), max_age=max_age)
+
+    # ---------- disco ----------
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        h = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{h}.bin", self.cache_dir / f"{h}.json"
+
+    def _read_disk(self, url: str) -> Tuple[Optional[bytes], dict]:
+        body_p, meta_p = self._paths(url)
+        try:
+            meta = json.loads(meta_p.read_text(encoding="utf-8"))
+            return body_p.read_bytes(), meta
+        except (OSError, ValueError):
+            return None, {}
+
+    def _write_disk(self, url: str, body: Optional[bytes], meta: dict) -> None:
+        body_p, meta_p = self._paths(url)
+        try:
+            if body is not None:
+                tmp = body_p.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(body); os.replace(tmp, body_p)
+            tmp = meta_p.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(meta), encoding="utf-8"); os.replace(tmp, meta_p)
+        except OSError:
+            return
+        if body is not None:
+            self._evict()
+
+    def _tier_path(self, url: str, tier: str) -> Path:
+        return self._paths(url)[0].with_suffix(f".{tier}.img")
+
+    def _drop_tiers(self, url: str) -> None:
+        names = {_variant(t, flat) for t in TIERS for flat in (False, True)}
+        for name in names:
+            try: self._tier_path(url, name).unlink()
+            except OSError: pass
+        with self._lock:
+            for name in names:
+                self._tiers.pop((url, name), None)
+
+    def _evict(self) -> None:
+        # agrupa original + meta + derivados pelo hash da URL; LRU pelo acesso mais recente do grupo
+        groups: Dict[str, list] = {}
+        for p in self.cache_dir.iterdir():
+            if p.name.endswith(".tmp"):
+                continue
+            try:
+                st_ = p.stat()
+            except OSError:
+                continue
+            g = groups.setdefault(p.name.split(".", 1)[0], [0.0, 0, []])
+            g[0] = max(g[0], st_.st_mtime); g[1] += st_.st_size; g[2].append(p)
+        total = sum(g[1] for g in groups.values())
+        for mtime, size, paths in sorted(groups.values(), key=lambda g: g[0]):
+            if total <= self.max_bytes:
+                break
+            for q in paths:
+                try: q.unlink()
+                except OSError: pass
+            total -= size
+
+    def _count(self, name: str) -> None:
+        with self._lock:   # chamado das threads do prefetch: `+=` em dict não é atômico
+            self.stats[name] += 1
+
+    # ---------- API ----------
+    def fetch(self, url: str) -> Optional[bytes]:
+        """Bytes da imagem (cache em disco + revalidação condicional). None se indisponível."""
+        if not url:
+            return None
+        body, meta = self._read_disk(url)
+        now = time.time()
+        if body is not None and now - meta.get("checked_at", 0) < self.max_age:
+            self._count("disk_hits")
+            self._checked[url] = meta.get("checked_at", 0)
+            try: os.utime(self._paths(url)[0], None)   # marca uso (LRU)
+            except OSError: pass
+            return body
+
+        headers = {}
+        if body is not None:
+            if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            r = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException:
+            self._count("errors")
+            return body  # sem rede: serve a cópia antiga (se houver)
+
+        if r.status_code == 304 and body is not None:
+            self._count("revalidated")
+            meta["checked_at"] = now
+            self._checked[url] = now
+            self._write_disk(url, None, meta)
+            try: os.utime(self._paths(url)[0], None)
+            except OSError: pass
+            return body
+        if r.status_code != 200:
+            self._count("errors")
+            return body
+        self._count("downloads")
+        new_meta = {
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "checked_at": now,
+        }
+        self._drop_tiers(url)          # conteúdo mudou: derivados antigos não valem mais
+        self._write_disk(url, r.content, new_meta)
+        self._checked[url] = now
+        return r.content
+
+    def tier(self, url: str, tier: str, flat: bool = False) -> Optional[bytes]:
+        """Bytes do derivado `tier` (thumb/screen/print) — memória → disco → gerado a partir da original.
+        `flat=True` para o PDF: imagem com alfa sai JPEG achatado em branco (nunca WebP)."""
+        if not url:
+            return None
+        name = _variant(tier, flat)
+        key = (url, name)
+        with self._lock:
+            data = self._tiers.get(key)
+            if data is not None and time.time() - self._checked.get(url, 0) < self.max_age:
+                self._tiers.move_to_end(key)
+                self.stats["mem_hits"] += 1
+                return data
+        src = self.fetch(url)          # garante original fresca (e derruba derivados se mudou)
+        if src is None:
+            return None
+        path = self._tier_path(url, name)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            try:
+                img = Image.open(io.BytesIO(src)); img.load()
+                data = make_derivative(img, tier, flat)
+            except Exception:
+                self._count("errors")
+                return None
+            self._count("derived")
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                tmp.write_bytes(data); os.replace(tmp, path)
+            except OSError:
+                pass
+        with self._lock:
+            self._tiers[key] = data
+            self._tiers.move_to_end(key)
+            while len(self._tiers) > self.mem_items * len(TIERS):
+                self._tiers.popitem(last=False)
+        return data
+
+    def is_tier_warm(self, url: str, tier: str) -> bool:
+        with self._lock:
+            return (url, tier) in self._tiers and time.time() - self._checked.get(url, 0) < self.max_age
+
+
+class ImagePrefetcher:
+    """Aquece o cache do ImageService em segundo plano (pool de threads com limite de concorrência).
+
+    Cada `owner` (ex.: uma sessão do Streamlit) tem um `scope` (ex.: o site selecionado); quando o
+    scope muda (ou em `cancel(owner)`), o owner solta seus prefetches. URLs já em voo não são
+    enfileiradas de novo: o owner passa a referenciar o future existente, e um future ainda não
+    iniciado só é cancelado quando nenhum owner o referencia mais. Owners sem prefetch pendente saem
+    do registro (sessões que somem não acumulam entradas).
+    """
+
+    def __init__(self, service: ImageService, max_workers: int = 4, tier: str = "screen"):
+        self.service = service
+        self.tier = tier           # nível aquecido (o que a UI exibe)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="geo-prefetch")
+        self._lock = threading.RLock()   # RLock: cancel() dispara o callback na mesma thread
+        self._owners: Dict[Hashable, Tuple[Hashable, Set[str]]] = {}   # owner → (scope, urls pendentes)
+        self._inflight: Dict[str, Future] = {}
+        self._refs: Dict[str, Set[Hashable]] = {}                       # url → owners que a esperam
+
+    def _done(self, url: str, fut: Future) -> None:
+        with self._lock:
+            if self._inflight.get(url) is not fut:
+                return
+            del self._inflight[url]
+            for owner in self._refs.pop(url, ()):
+                entry = self._owners.get(owner)
+                if entry is not None:
+                    entry[1].discard(url)
+                    if not entry[1]:
+                        del self._owners[owner]
+
+    def _release(self, owner: Hashable) -> None:
+        """Solta os prefetches do owner; cancela os não iniciados que ninguém mais espera."""
+        _, urls = self._owners.pop(owner, (None, set()))
+        for url in list(urls):
+            refs = self._refs.get(url)
+            if refs is None:
+                continue
+            refs.discard(owner)
+            fut = self._inflight.get(url)
+            if not refs and fut is not None:
+                fut.cancel()   # já em execução: cancel() não faz nada e o download termina (aquece o cache)
+
+    def prefetch(self, owner: Hashable, scope: Hashable, urls: Iterable[Optional[str]]) -> int:
+        """Enfileira `urls` (na ordem de prioridade). Retorna quantas foram de fato enfileiradas."""
+        submitted = 0
+        with self._lock:
+            if owner in self._owners and self._owners[owner][0] != scope:
+                self._release(owner)
+            mine = self._owners.get(owner, (scope, set()))[1]
+            for url in urls:
+                if not url:
+                    continue
+                if url in self._inflight:
+                    self._refs[url].add(owner); mine.add(url)
+                    self._owners[owner] = (scope, mine)
+                    continue
+                if self.service.is_tier_warm(url, self.tier):
+                    continue
+                f = self._pool.submit(self.service.tier, url, self.tier)
+                self._inflight[url] = f
+                self._refs[url] = {owner}
+                mine.add(url); submitted += 1
+                # registrado antes do callback: um future que já nasce pronto chama _done aqui mesmo
+                # (e _done pode ter tirado a entrada vazia numa volta anterior do laço)
+                self._owners[owner] = (scope, mine)
+                f.add_done_callback(lambda fut, u=url: self._done(u, fut))
+            if not mine:
+                self._owners.pop(owner, None)
+        return submitted
+
+    def cancel(self, owner: Hashable) -> None:
+        with self._lock:
+            self._release(owner)
+
+    def pending(self, owner: Hashable) -> int:
+        with self._lock:
+            return len(self._owners.get(owner, (None, ()))[1])
@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+# geo_report.py — relatório PDF OGMP L5 do Geoportal
+# Fora do script da página para ser usado tanto pelo botão "Gerar PDF" quanto pelo lote
+# (geo_batch.py, em processos separados). Nada aqui depende do Streamlit.
+
+import io
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from geo_cube import SiteCube
+from geo_images import DEFAULT_BASE_URL, ImageService, pick_tier, resolve_image_target
+from geo_series import resample_base, smooth_series
+from lazy_imports import lazy, matplotlib_agg
+
+# ReportLab e o fallback de gráfico (Matplotlib) só carregam quando um PDF é gerado
+canvas = lazy("reportlab.pdfgen.canvas")
+pagesizes = lazy("reportlab.lib.pagesizes")
+rl_utils = lazy("reportlab.lib.utils")
+plt = lazy("matplotlib.pyplot", setup=matplotlib_agg)
+
+LOGO_REL_PATH = "images/logomavipe.jpeg"  # usado no PDF
+PDF_IMAGE_DPI = 200  # resolução efetiva das imagens embutidas no PDF (escolhe o nível do derivado)
+
+# Renderizador do gráfico do PDF: "vetor" desenha direto no canvas do ReportLab (sem kaleido/PNG);
+# "plotly" = caminho antigo (kaleido → Matplotlib); "matplotlib" = PNG via Matplotlib
+CHART_RENDERERS = ("vetor", "plotly", "matplotlib")
+PDF_CHART_RENDERER = os.getenv("GEO_PDF_CHART", "vetor")
+if PDF_CHART_RENDERER not in CHART_RENDERERS:
+    PDF_CHART_RENDERER = "vetor"
+CHART_BOX = (455, 260)  # caixa do gráfico no PDF (pt), mesma proporção do PNG 1400×800
+
+FREQ_CODES = {"Diário": "D", "Semanal": "W", "Mensal": "M", "Trimestral": "Q"}
+
+# Aliases de parâmetros (busca case/acento-insensitive no cubo)
+TAXA_ALIASES  = ("Taxa Metano", "Taxa de Metano", "Fluxo Metano", "Fluxo CH4")
+INC_ALIASES   = ("Incerteza", "Incerteza (%)", "Erro", "Uncertainty")
+VENTO_ALIASES = ("Velocidade do Vento", "Vento", "Wind Speed")
+SAT_ALIASES   = ("Satelite", "Satélite", "Satellite", "Sat")
+SERIES_PARAMS = {"metano": "Taxa Metano", "incerteza": "Incerteza", "vento": "Velocidade do Vento"}
+
+# ===================== Dados do relatório =====================
+
+def plot_frame(series_val: pd.DataFrame, series_unc: pd.DataFrame) -> pd.DataFrame:
+    """Alinha valores e incertezas (já reamostrados) por data."""
+    return pd.merge(
+        series_val.rename(columns={"value": "metano"}),
+        series_unc.rename(columns={"value": "incerteza"}),
+        on="date", how="left"
+    ).sort_values("date")
+
+def plot_context(df_plot: pd.DataFrame, show_unc_bars: bool, show_trend: bool) -> Optional[dict]:
+    """Contexto do gráfico usado pelos renderizadores do PDF (independe do Plotly)."""
+    if df_plot.empty:
+        return None
+    return {
+        "x": df_plot["date"].tolist(),
+        "y": df_plot["metano"].tolist(),
+        "yerr": df_plot["incerteza"].fillna(0).tolist(),
+        "show_unc_bars": bool(show_unc_bars),
+        "show_trend": bool(show_trend),
+    }
+
+def results_table(series_raw: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """Pequena tabela de resultados por data (até 12 pontos mais recentes com taxa)."""
+    s_all = series_raw.dropna(subset=["metano"]).tail(12)
+    if s_all.empty:
+        return None
+    return pd.DataFrame({
+        "data": s_all["date"].dt.strftime("%d/%m/%Y"),
+        "kg_h": s_all["metano"].round(0),
+        "incerteza": s_all["incerteza"].round(0),
+        "vento": s_all["vento"].round(1)
+    })
+
+def report_kwargs(cube: SiteCube, s: int, d: int, opts: Dict) -> Dict:
+    """Argumentos de build_report_pdf para (site, data) do cubo, sem passar pela UI (usado no lote).
+    `opts`: freq, agg, smooth, window, show_unc_bars, show_trend, printed_by, chart (mesmas opções da sidebar)."""
+    series_raw = cube.series_frame(s, SERIES_PARAMS)
+    raw_val = series_raw[["date", "metano"]].dropna().rename(columns={"metano": "value"})
+    raw_unc = series_raw[["date", "incerteza"]].dropna().rename(columns={"incerteza": "value"})
+    freq_code = FREQ_CODES[opts["freq"]]
+    series_val = smooth_series(resample_base(raw_val, freq_code, opts["agg"]), opts["smooth"], opts["window"])
+    series_unc = smooth_series(resample_base(raw_unc, freq_code, opts["agg"]), opts["smooth"], opts["window"])
+    rec = cube.record(s, d)
+    return {
+        "site": cube.sites[s],
+        "date": cube.labels[s][d],
+        "taxa": cube.value(s, d, *TAXA_ALIASES),
+        "inc": cube.value(s, d, *INC_ALIASES),
+        "vento": cube.value(s, d, *VENTO_ALIASES),
+        "satellite": cube.value(s, d, *SAT_ALIASES),
+        "img_url": resolve_image_target(rec.get("Imagem")),
+        "series_table": results_table(series_raw),
+        "lat": rec.get("_lat"),
+        "lon": rec.get("_long"),
+        "printed_by": opts.get("printed_by"),
+        "plot_ctx": plot_context(plot_frame(series_val, series_unc), opts["show_unc_bars"], opts["show_trend"]),
+        "fig1": None,
+        "chart_renderer": opts.get("chart", PDF_CHART_RENDERER),
+    }
+
+# ===================== PDF helpers =====================
+def _image_reader_from_url(images: ImageService, url: str, box_w: float, box_h: float):
+    """ImageReader do menor derivado que cobre a caixa (em pt) a PDF_IMAGE_DPI; sempre JPEG (alfa achatado),
+    embutido sem recodificar."""
+    data = images.tier(url, pick_tier(max(box_w, box_h) / 72 * PDF_IMAGE_DPI), flat=True)
+    if data is None:
+        return None, 0, 0
+    img = rl_utils.ImageReader(io.BytesIO(data)); w, h = img.getSize()
+    return img, w, h
+
+def _draw_logo_scaled(c, x_right, y_top, logo_img, lw, lh, max_w=90, max_h=42):
+    if not logo_img: return 0, 0
+    scale = min(max_w / lw, max_h / lh)
+    w, h = lw * scale, lh * scale
+    c.drawImage(logo_img, x_right - w, y_top - h, width=w, height=h, mask='auto')
+    return w, h
+
+def _export_fig_to_png_bytes(fig, plot_ctx: Optional[dict] = None) -> Optional[bytes]:
+    """Exporta figura Plotly para PNG.
+    1) plotly.io + kaleido; 2) kaleido PlotlyScope; 3) Matplotlib (fallback, a partir de `plot_ctx`).
+    Sem figura (ex.: lote), vai direto ao Matplotlib."""
+    if fig is None:
+        return _render_ctx_png(plot_ctx)
+    # 1) Plotly + kaleido
+    try:
+        import plotly.io as pio
+        return pio.to_image(fig, format="png", width=1400, height=800, scale=2, engine="kaleido")
+    except Exception:
+        pass
+    # 2) PlotlyScope
+    try:
+        from kaleido.scopes.plotly import PlotlyScope
+        scope = PlotlyScope(plotlyjs=None, mathjax=False)
+        return scope.transform(fig.to_plotly_json(), format="png", width=1400, height=800, scale=2)
+    except Exception:
+        pass
+    # 3) Matplotlib fallback usando o contexto salvo
+    return _render_ctx_png(plot_ctx)
+
+def _render_ctx_png(ctx: Optional[dict]) -> Optional[bytes]:
+    """PNG do gráfico via Matplotlib a partir do contexto (x, y, yerr, show_unc_bars, show_trend)."""
+    try:
+        if not ctx:
+            return None
+        x = pd.to_datetime(pd.Series(ctx.get("x", [])))
+        y = pd.to_numeric(pd.Series(ctx.get("y", [])), errors="coerce")
+        yerr = pd.to_numeric(pd.Series(ctx.get("yerr", [])), errors="coerce").fillna(0)
+        show_unc = bool(ctx.get("show_unc_bars", True))
+        show_tr = bool(ctx.get("show_trend", False))
+        if x.empty or y.empty:
+            return None
+        fig_m, ax = plt.subplots(figsize=(14, 8), dpi=100)
+        ax.plot(x, y, marker="o", linewidth=2)
+        if show_unc:
+            ax.errorbar(x, y, yerr=yerr, fmt='none', linewidth=1)
+        if show_tr and len(x) >= 2:
+            xd = (x - x.min()).dt.days.astype(float).to_numpy()
+            coeffs = np.polyfit(xd, y.to_numpy(dtype=float), 1)
+            yhat = np.poly1d(coeffs)(xd)
+            ax.plot(x, yhat, linestyle='--')
+        ax.set_xlabel("Data"); ax.set_ylabel("Taxa de Metano (kgCH4/hr)")
+        fig_m.autofmt_xdate()
+        buf = io.BytesIO()
+        fig_m.savefig(buf, format="png", bbox_inches="tight")
+        plt.close(fig_m)
+        buf.seek(0)
+        return buf.getvalue()
+    except Exception:
+        return None
+
+# ============== Gráfico vetorial (direto no canvas) ==============
+
+def _nice_ticks(lo: float, hi: float, n: int = 5) -> np.ndarray:
+    """Marcas "redondas" (1/2/2,5/5 × 10^k) cobrindo [lo, hi]."""
+    if hi <= lo:
+        lo, hi = lo - 1, hi + 1
+    raw = (hi - lo) / n
+    mag = 10 ** np.floor(np.log10(raw))
+    step = next(m * mag for m in (1, 2, 2.5, 5, 10) if m * mag >= raw)
+    return np.arange(np.ceil(lo / step) * step, hi + step * 1e-9, step)
+
+def _fmt_tick(v: float) -> str:
+    return f"{v:,.0f}".replace(",", ".") if abs(v) >= 100 else f"{v:g}".replace(".", ",")
+
+def draw_chart_vector(c, x0: float, y0: float, w: float, h: float, ctx: dict) -> bool:
+    """Série de metano + barras de incerteza + tendência como operações vetoriais no canvas.
+    (x0, y0) = canto inferior esquerdo da caixa. Retorna False se não houver pontos."""
+    x = pd.to_datetime(pd.Series(ctx.get("x", []))).to_numpy(dtype="datetime64[ns]")
+    y = pd.to_numeric(pd.Series(ctx.get("y", [])), errors="coerce").to_numpy(dtype=float)
+    e = pd.to_numeric(pd.Series(ctx.get("yerr", [])), errors="coerce").fillna(0).to_numpy(dtype=float)
+    ok = ~np.isnat(x) & np.isfinite(y)
+    x, y, e = x[ok], y[ok], e[ok] if len(e) == len(ok) else np.zeros(ok.sum())
+    if not len(x):
+        return False
+    show_unc = bool(ctx.get("show_unc_bars", True))
+    xd = (x - x.min()) / np.timedelta64(1, "D")
+
+    # domínio
+    lo = np.nanmin(y - e) if show_unc else y.min()
+    hi = np.nanmax(y + e) if show_unc else y.max()
+    pad = (hi - lo) * 0.05 or max(abs(hi) * 0.05, 1.0)
+    yt = _nice_ticks(lo - pad, hi + pad)
+    ylo, yhi = min(yt[0], lo - pad), max(yt[-1], hi + pad)
+    xspan = xd.max() or 1.0
+
+    # área de plotagem (margens para rótulos)
+    pl, pb, pr, pt = x0 + 48, y0 + 30, x0 + w - 8, y0 + h - 18
+    px = pl + (xd / xspan if xd.max() else np.full(len(xd), 0.5)) * (pr - pl)
+    py = pb + (y - ylo) / (yhi - ylo) * (pt - pb)
+    sy = (pt - pb) / (yhi - ylo)
+
+    c.saveState()
+    # grade + marcas do eixo Y
+    c.setFont("Helvetica", 7); c.setLineWidth(0.4)
+    for v in yt:
+        yy = pb + (v - ylo) * sy
+        c.setStrokeColorRGB(0.88, 0.9, 0.92); c.line(pl, yy, pr, yy)
+        c.setFillColorRGB(0.3, 0.3, 0.3); c.drawRightString(pl - 4, yy - 2.5, _fmt_tick(v))
+    # marcas do eixo X (datas)
+    n_xt = min(6, len(x))
+    fmt = "%d/%m/%y" if xspan < 120 else "%m/%Y"
+    for t in np.linspace(0, xspan, n_xt) if n_xt > 1 else [0.0]:
+        xx = pl + (t / xspan if xd.max() else 0.5) * (pr - pl)
+        lab = pd.Timestamp(x.min() + np.timedelta64(int(t * 86400), "s")).strftime(fmt)
+        c.setStrokeColorRGB(0.3, 0.3, 0.3); c.line(xx, pb, xx, pb - 3)
+        c.drawCentredString(xx, pb - 12, lab)
+    # eixos
+    c.setStrokeColorRGB(0.3, 0.3, 0.3); c.setLineWidth(0.8)
+    c.line(pl, pb, pr, pb); c.line(pl, pb, pl, pt)
+    c.setFont("Helvetica", 8)
+    c.drawCentredString((pl + pr) / 2, y0 + 4, "Data")
+    c.saveState(); c.translate(x0 + 8, (pb + pt) / 2); c.rotate(90)
+    c.drawCentredString(0, 0, "Taxa de Metano (kgCH4/hr)"); c.restoreState()
+
+    # barras de incerteza (um único path)
+    if show_unc and (e > 0).any():
+        p = c.beginPath()
+        for xi, yi, ei in zip(px, py, e * sy):
+            if ei > 0:
+                p.moveTo(xi, yi - ei); p.lineTo(xi, yi + ei)
+                p.moveTo(xi - 2, yi - ei); p.lineTo(xi + 2, yi - ei)
+                p.moveTo(xi - 2, yi + ei); p.lineTo(xi + 2, yi + ei)
+        c.setStrokeColorRGB(0.45, 0.5, 0.55); c.setLineWidth(0.7)
+        c.drawPath(p, stroke=1, fill=0)
+    # série + marcadores
+    c.setStrokeColorRGB(0.12, 0.47, 0.71); c.setFillColorRGB(0.12, 0.47, 0.71); c.setLineWidth(1.4)
+    if len(px) > 1:
+        p = c.beginPath(); p.moveTo(px[0], py[0])
+        for xi, yi in zip(px[1:], py[1:]):
+            p.lineTo(xi, yi)
+        c.drawPath(p, stroke=1, fill=0)
+    for xi, yi in zip(px, py):
+        c.circle(xi, yi, 1.8, stroke=0, fill=1)
+    # tendência linear
+    if ctx.get("show_trend") and len(x) >= 2 and xd.max():
+        a, b = np.polyfit(xd, y, 1)
+        c.setStrokeColorRGB(1.0, 0.5, 0.05); c.setDash(4, 3)
+        c.line(pl, pb + (b - ylo) * sy, pr, pb + (a * xspan + b - ylo) * sy)
+    c.restoreState()
+    return True
+
+# ============== NOVO: utilitários para OGMP L5 no PDF ==============
+
+def _compliance_box_lines():
+    """Linhas da caixa de conformidade OGMP L5 (usada na capa)."""
+    return [
+        "OGMP 2.0 — Conformidade (Nível de Unidade — L5)",
+        "• Detecção e quantificação site-level (top-down)",
+        "• Taxa de emissão por unidade (kg CH4/h)",
+        "• Incerteza de medição reportada",
+        "• Resolução espacial ≤ 25 × 25 m",
+        "• Limite de quantificação ≤ 100 kg CH4/h",
+        "• Estrutura compatível com OGMP L5 (sem inventário L4)"
+    ]
+
+def _draw_compliance_box(c: "canvas.Canvas", x: float, y: float, w: float, h: float):
+    """Desenha a caixa de conformidade OGMP L5."""
+    BAND = (0x15/255, 0x5E/255, 0x75/255)
+    ACC  = (0xF5/255, 0x9E/255, 0x0B/255)
+    c.setLineWidth(1.2)
+    c.setStrokeColorRGB(*ACC)
+    c.roundRect(x, y - h, w, h, 8, stroke=1, fill=0)
+    c.setFont("Helvetica-Bold", 11)
+    c.setFillColorRGB(*BAND)
+    c.drawString(x + 8, y - 18, _compliance_box_lines()[0])
+    c.setFillColorRGB(0,0,0)
+    c.setFont("Helvetica", 10)
+    y2 = y - 34
+    for line in _compliance_box_lines()[1:]:
+        c.drawString(x + 12, y2, line)
+        y2 -= 14
+
+# ===================== Build PDF =====================
+
+def build_report_pdf(
+    site,
+    date,
+    taxa,
+    inc,
+    vento,
+    img_url,
+    fig1,
+    images: ImageService,
+    logo_rel_path: str = LOGO_REL_PATH,
+    satellite: Optional[str] = None,
+    series_table: Optional[pd.DataFrame] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    printed_by: Optional[str] = None,
+    plot_ctx: Optional[dict] = None,
+    chart_renderer: str = PDF_CHART_RENDERER,
+) -> bytes:
+    BAND   = (0x15/255, 0x5E/255, 0x75/255)
+    ACCENT = (0xF5/255, 0x9E/255, 0x0B/255)
+    GRAY   = (0x6B/255, 0x72/255, 0x80/255)
+
+    buf = io.BytesIO()
+    c   = canvas.Canvas(buf, pagesize=pagesizes.A4)
+    W, H = pagesizes.A4
+    margin = 40
+    band_h = 80
+
+    logo_url = f"{DEFAULT_BASE_URL.rstrip('/')}/{logo_rel_path.lstrip('/')}"
+    logo_img, logo_w, logo_h = _image_reader_from_url(images, logo_url, 90, 42)
+
+    page_no = 0
+    def start_page():
+        nonlocal page_no
+        page_no += 1
+        c.setFillColorRGB(*BAND)
+        c.rect(0, H - band_h, W, band_h, fill=1, stroke=0)
+        _draw_logo_scaled(c, x_right=W - margin, y_top=H - (band_h/2 - 14),
+                          logo_img=logo_img, lw=logo_w, lh=logo_h, max_w=90, max_h=42)
+        ts_utc = datetime.now(timezone.utc).strftime('%d/%m/%Y %H:%M UTC')
+        c.setFillColorRGB(1,1,1); c.setFont("Helvetica-Bold", 16)
+        c.drawString(margin, H - band_h + 28, "Relatório Satelital Preliminar — OGMP 2.0 L5")
+        c.setFont("Helvetica", 10)
+        # Linha única para evitar corte: acrescenta "Impresso por" no mesmo baseline
+        line_txt = f"Site: {site}   |   Data: {date}   |   Gerado em: {ts_utc}"
+        if printed_by:
+            line_txt += f"   |   Impresso por: {printed_by}"
+        c.drawString(margin, H - band_h + 12, line_txt)
+        c.setFillColorRGB(0,0,0)
+        c.setStrokeColorRGB(*ACCENT); c.setLineWidth(1)
+        c.line(margin, H - band_h - 6, W - margin, H - band_h - 6)
+        c.setStrokeColorRGB(0,0,0)
+        return H - band_h - 20
+
+    y = start_page()
+
+    # ===== CAPA: Caixa de conformidade OGMP L5 =====
+    _draw_compliance_box(c, x=margin, y=y, w=W - 2*margin, h=110)
+    y -= (110 + 16)
+
+    # ===== 1. Identificação da Instalação =====
+    c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "1) Identificação da Instalação")
+    y -= 16; c.setFont("Helvetica", 10)
+    loc_txt = f"Lat {lat} / Lon {lon}" if (lat is not None and lon is not None) else "—"
+    for line in (
+        f"• Nome: {site}",
+        f"• Tipo: Unidade (site-level)",
+        f"• Localização: {loc_txt}",
+        f"• Período da campanha: {date}",
+        f"• Responsável: MAVIPE Space Systems",
+        f"• Satélite: {satellite or '—'}",
+    ):
+        c.drawString(margin, y, line); y -= 14
+
+    y -= 6; c.setStrokeColorRGB(*ACCENT); c.setLineWidth(0.7)
+    c.line(margin, y, W - margin, y); y -= 14; c.setStrokeColorRGB(0,0,0)
+
+    # ===== 2. Métricas (com unidades) =====
+    c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "2) Métricas")
+    y -= 16; c.setFont("Helvetica", 10)
+
+    def _is_na(v) -> bool:
+        from math import isnan
+        if v is None: return True
+        try:
+            return pd.isna(v)
+        except Exception:
+            try:
+                return isinstance(v, float) and isnan(v)
+            except Exception:
+                return False
+
+    def _fmt_num(v, unit: str) -> str:
+        if _is_na(v): return "—"
+        return f"{v} {unit}"
+
+    def _fmt_pct(v) -> str:
+        if _is_na(v): return "—"
+        s = str(v).strip()
+        if s.endswith("%"): s = s[:-1].strip()
+        return f"{s} %"
+
+    def _fmt_txt(v) -> str:
+        return "—" if _is_na(v) or str(v).strip() == "" else str(v)
+
+    for line in (
+        f"• Taxa Metano (seleção atual): {_fmt_num(taxa, 'kgCH4/hr')}",
+        f"• Incerteza: {_fmt_pct(inc)}",
+        f"• Vento: {_fmt_num(vento, 'm/s')}",
+    ):
+        c.drawString(margin, y, line); y -= 14
+
+    y -= 6; c.setStrokeColorRGB(*ACCENT); c.setLineWidth(0.7)
+    c.line(margin, y, W - margin, y); y -= 14; c.setStrokeColorRGB(0,0,0)
+
+    # ===== 3. Resumo da Campanha =====
+    c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "3) Resumo da Campanha")
+    y -= 16; c.setFont("Helvetica", 10)
+    # estatísticas simples da série (se houver)
+    passes = int(series_table.shape[0]) if (series_table is not None) else 0
+    mean_val = series_table['kg_h'].mean() if (series_table is not None and 'kg_h' in series_table.columns) else None
+    lines = [
+        f"• Nº de passagens/dias com dados: {passes}",
+        f"• Cobertura: Site e entorno imediato (raio ~5 km)",
+        f"• Condições atmosféricas: vento médio reportado por passagem (ver tabela)",
+    ]
+    for ln in lines:
+        c.drawString(margin, y, ln); y -= 14
+    if mean_val is not None:
+        c.drawString(margin, y, f"• Emissão média (kgCH4/h) nas passagens: {mean_val:.0f}"); y -= 14
+
+    y -= 6; c.setStrokeColorRGB(*ACCENT); c.setLineWidth(0.7)
+    c.line(margin, y, W - margin, y); y -= 14; c.setStrokeColorRGB(0,0,0)
+
+    # ===== 4. Resultados por data (tabela) =====
+    if series_table is not None and not series_table.empty:
+        c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "4) Resultados Quantitativos (por data)")
+        y -= 18; c.setFont("Helvetica", 9)
+        # cabeçalho
+        headers = ["Data", "Emissão (kgCH4/h)", "Incerteza (%)", "Vento (m/s)"]
+        col_w = [(W - 2*margin) * w for w in (0.22, 0.26, 0.22, 0.22)]
+        x0 = margin
+        # desenha header
+        c.setFillColorRGB(0.95,0.95,0.95)
+        c.rect(x0, y - 14, sum(col_w), 16, fill=1, stroke=0)
+        c.setFillColorRGB(0,0,0)
+        for i,h in enumerate(headers):
+            c.drawString(x0 + sum(col_w[:i]) + 4, y - 2, h)
+        y -= 20
+        # linhas
+        for _, row in series_table.iterrows():
+            if y < 80:  # quebra de página
+                c.showPage(); y = start_page()
+            vals = [
+                str(row.get('data','')),
+                f"{row.get('kg_h','')}",
+                f"{row.get('incerteza','')}",
+                f"{row.get('vento','')}",
+            ]
+            for i,v in enumerate(vals):
+                c.drawString(x0 + sum(col_w[:i]) + 4, y, str(v))
+            y -= 14
+        y -= 8
+        c.setStrokeColorRGB(*ACCENT); c.setLineWidth(0.7)
+        c.line(margin, y, W - margin, y); y -= 14; c.setStrokeColorRGB(0,0,0)
+
+    # ===== 5. Visualizações =====
+    # Força a Seção 5 a iniciar em nova página (segunda página)
+    c.showPage(); y = start_page()
+    c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "5) Visualizações")
+    y -= 16
+
+    # Figura 1 — Imagem principal (se houver)
+    if img_url:
+        max_w, max_h = W - 2*margin, 190
+        main_img, iw, ih = _image_reader_from_url(images, img_url, max_w, max_h)
+        if main_img:
+            s = min(max_w/iw, max_h/ih); w, h = iw*s, ih*s
+            if y - h < margin + 30:
+                c.showPage(); y = start_page()
+            c.drawImage(main_img, margin, y - h, width=w, height=h, mask='auto')
+            c.setFont("Helvetica-Oblique", 9)
+            c.drawString(margin, y - h - 12, "Figura 1 - Concentração/Pluma de Metano (imagem de referência)")
+            y -= h + 26
+
+    # Figura 2 — Gráfico (série temporal)
+    if chart_renderer == "vetor" and plot_ctx:
+        w, h = CHART_BOX
+        if y - h < margin + 30:
+            c.showPage(); y = start_page()
+        if draw_chart_vector(c, margin, y - h, w, h, plot_ctx):
+            c.setFont("Helvetica-Oblique", 9)
+            c.drawString(margin, y - h - 12, "Figura 2 - Série Histórica de Taxa de Metano (kgCH4/h) com incerteza")
+            y -= h + 26
+    elif fig1 is not None or plot_ctx:
+        try:
+            png1 = (_render_ctx_png(plot_ctx) if chart_renderer == "matplotlib"
+                    else _export_fig_to_png_bytes(fig1, plot_ctx))
+            if png1 is None:
+                raise RuntimeError("Exportação PNG indisponível no ambiente")
+            img1 = rl_utils.ImageReader(io.BytesIO(png1))
+            iw, ih = img1.getSize()
+            max_w, max_h = W - 2*margin, CHART_BOX[1]
+            s = min(max_w/iw, max_h/ih); w, h = iw*s, ih*s
+            if y - h < margin + 30:
+                c.showPage(); y = start_page()
+            c.drawImage(img1, margin, y - h, width=w, height=h, mask='auto')
+            c.setFont("Helvetica-Oblique", 9)
+            c.drawString(margin, y - h - 12, "Figura 2 - Série Histórica de Taxa de Metano (kgCH4/h) com incerteza")
+            y -= h + 26
+        except Exception as e:
+            c.setFont("Helvetica", 9)
+            c.drawString(margin, y, f"[Falha ao exportar gráfico: {e}]"); y -= 14
+
+    # ===== 6. Classificação OGMP Preliminar =====
+    if y < 150:
+        c.showPage(); y = start_page()
+
+    # adiciona espaçamento extra antes do título
+    y -= 20
+    c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "6) Classificação OGMP Preliminar")
+    y -= 16; c.setFont("Helvetica", 10)
+    txt = (
+        "As medições apresentadas correspondem ao Nível 5 (site-level, top-down) do framework OGMP 2.0. "
+            )
+    c.drawString(margin, y, txt); y -= 28
+
+    
+    # Rodapé
+    c.setFont("Helvetica", 8); c.setFillColorRGB(0.42,0.45,0.50)
+    c.drawRightString(W - margin, 12, f"pág {page_no}")
+    c.setFillColorRGB(0,0,0)
+
+    c.showPage(); c.save(); buf.seek(0)
+    return buf.getvalue()
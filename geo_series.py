@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# geo_series.py — reamostragem/suavização das séries do Geoportal com memoização
+# A base reamostrada é guardada por (série, frequência, agregação); a suavização (média móvel / EMA)
+# é só o estágio final, barato — arrastar o slider da janela não refaz a reamostragem.
+# Sem asfreq("D"): a série mensal é agregada direto, sem densificar o histórico em dias.
+
+import threading
+from collections import OrderedDict
+from typing import Hashable, Tuple
+
+import pandas as pd
+
+AGG_FUNCS = {"média": "mean", "mediana": "median", "máx": "max", "mín": "min"}
+
+# "M"/"Q" viraram "ME"/"QE" no pandas 2.2 (e os antigos deixaram de existir no 3.0)
+_RULE_CANDIDATES = {"M": ("ME", "M"), "Q": ("QE", "Q")}
+_rule_cache = {}
+
+
+def _resample_rule(freq_code: str) -> str:
+    rule = _rule_cache.get(freq_code)
+    if rule is None:
+        rule = freq_code
+        for cand in _RULE_CANDIDATES.get(freq_code, (freq_code,)):
+            try:
+                pd.tseries.frequencies.to_offset(cand)
+                rule = cand
+                break
+            except ValueError:
+                continue
+        _rule_cache[freq_code] = rule
+    return rule
+
+
+def resample_base(s: pd.DataFrame, freq_code: str, agg: str) -> pd.DataFrame:
+    """Agrega `s` (date, value) na frequência pedida; períodos sem dado são descartados."""
+    if s.empty: return s
+    ser = s.set_index("date")["value"].sort_index()
+    out = getattr(ser.resample(_resample_rule(freq_code)), AGG_FUNCS[agg])().dropna()
+    return out.rename("value").reset_index()
+
+
+def smooth_series(base: pd.DataFrame, smooth: str, window: int) -> pd.DataFrame:
+    if base.empty or smooth == "Nenhuma": return base
+    out = base.copy()
+    if smooth == "Média móvel":
+        out["value"] = out["value"].rolling(window=window, min_periods=1).mean()
+    elif smooth == "Exponencial (EMA)":
+        out["value"] = out["value"].ewm(span=window, adjust=False).mean()
+    return out
+
+
+class SeriesEngine:
+    """Memo LRU de bases reamostradas, compartilhado entre reruns/sessões (thread-safe).
+
+    `key` identifica o conteúdo da série (ex.: (hash do workbook, site, parâmetro)); o chamador
+    garante que a mesma chave sempre corresponde à mesma série.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._memo: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def base(self, key: Hashable, s: pd.DataFrame, freq_code: str, agg: str) -> pd.DataFrame:
+        mk = (key, freq_code, agg)
+        with self._lock:
+            hit = self._memo.get(mk)
+            if hit is not None:
+                self._memo.move_to_end(mk)
+                self.hits += 1
+                return hit
+        out = resample_base(s, freq_code, agg)
+        with self._lock:
+            self.misses += 1
+            self._memo[mk] = out
+            self._memo.move_to_end(mk)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return out
+
+    def get(self, key: Hashable, s: pd.DataFrame, freq_code: str, agg: str, smooth: str, window: int) -> pd.DataFrame:
+        """Equivalente ao antigo resample_and_smooth, com a reamostragem memoizada."""
+        return smooth_series(self.base(key, s, freq_code, agg), smooth, window)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# gh_client.py — cliente HTTP único para a API do GitHub (app.py e páginas)
+# Sessão persistente com pool de conexões; GETs condicionais (If-None-Match com o ETag guardado:
+# 304 não consome o rate limit e devolve a resposta anterior); acompanhamento dos cabeçalhos
+# X-RateLimit-*. Com a cota esgotada, GETs já vistos são servidos do cache até o reset.
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_URL = "https://api.github.com"
+
+
+class RateLimitError(RuntimeError):
+    pass
+
+
+class GitHubClient:
+    """Sessão + ETags (LRU por número de entradas e bytes de corpo) + estado do rate limit."""
+
+    def __init__(self, token: str = "", pool_size: int = 8, max_etags: int = 1024,
+                 max_bytes: int = 32 * 1024 * 1024):
+        self.token = token
+        self.session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.max_etags = max_etags
+        self.max_bytes = max_bytes
+        self._bytes = 0
+        self._etags: "OrderedDict[Tuple, requests.Response]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rate: Dict[str, Optional[int]] = {"limit": None, "remaining": None, "reset": None, "used": None}
+        self.stats = {"requests": 0, "not_modified": 0, "served_stale": 0}
+
+    def headers(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        h = {"Accept": "application/vnd.github+json"}
+        if self.token: h["Authorization"] = f"Bearer {self.token}"
+        if extra: h.update(extra)
+        return h
+
+    # ---------- rate limit ----------
+    def _track(self, r: requests.Response) -> None:
+        vals = {}
+        for k in ("limit", "remaining", "reset", "used"):
+            v = r.headers.get(f"X-RateLimit-{k.capitalize()}")
+            if v is not None and v.isdigit():
+                vals[k] = int(v)
+        if vals:
+            with self._lock:
+                self.rate.update(vals)
+
+    def exhausted(self) -> bool:
+        rem, reset = self.rate.get("remaining"), self.rate.get("reset")
+        return rem is not None and rem <= 0 and reset is not None and time.time() < reset
+
+    # ---------- HTTP ----------
+    def get(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict[str, str]] = None,
+            timeout: float = 20) -> requests.Response:
+        """GET condicional: com ETag guardado envia If-None-Match; 304 → resposta 200 anterior."""
+        key = (url, tuple(sorted((params or {}).items())), (headers or {}).get("Accept"))
+        with self._lock:
+            cached = self._etags.get(key)
+            if cached is not None:
+                self._etags.move_to_end(key)
+        if self.exhausted():
+            if cached is not None:
+                self.stats["served_stale"] += 1
+                return cached
+            raise RateLimitError("GitHub rate limit exceeded")
+        h = self.headers(headers)
+        if cached is not None:
+            h["If-None-Match"] = cached.headers["ETag"]
+        r = self.session.get(url, params=params, headers=h, timeout=timeout)
+        self.stats["requests"] += 1
+        self._track(r)
+        if r.status_code == 304 and cached is not None:
+            self.stats["not_modified"] += 1
+            return cached
+        if r.status_code == 200 and r.headers.get("ETag") and len(r.content) <= self.max_bytes:
+            with self._lock:
+                self._drop(key)
+                self._etags[key] = r
+                self._bytes += len(r.content)
+                while len(self._etags) > self.max_etags or self._bytes > self.max_bytes:
+                    self._drop(next(iter(self._etags)))
+        elif r.status_code == 404:
+            with self._lock:
+                self._drop(key)
+        return r
+
+    def _drop(self, key: Tuple) -> None:
+        old = self._etags.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.content)
+
+    def put(self, url: str, json_body: Dict, timeout: float = 30) -> requests.Response:
+        r = self.session.put(url, headers=self.headers(), json=json_body, timeout=timeout)
+        self.stats["requests"] += 1
+        self._track(r)
+        if r.ok:
+            with self._lock:   # o conteúdo mudou: ETags guardados da URL não valem mais
+                for k in [k for k in self._etags if k[0] == url]:
+                    self._drop(k)
+        return r
+
+
+_clients: Dict[str, GitHubClient] = {}
+_clients_lock = threading.Lock()
+
+
+def shared_client(token: str = "") -> GitHubClient:
+    """Um cliente por token no processo (compartilhado entre sessões e páginas)."""
+    with _clients_lock:
+        c = _clients.get(token)
+        if c is None:
+            c = _clients[token] = GitHubClient(token)
+        return c
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# lazy_imports.py — módulos pesados (Matplotlib, ReportLab, Plotly, folium, openpyxl) carregados no primeiro uso
+# `plt = lazy("matplotlib.pyplot", setup=matplotlib_agg)` devolve um proxy: o import real acontece no
+# primeiro acesso a um atributo (plt.subplots, ...), uma vez por processo. Assim a primeira renderização de
+# uma página depois de reiniciar o container não paga PDF, mapa e fallback de gráfico que o usuário talvez
+# nem use. `available()` testa se um pacote opcional existe sem importá-lo; `load_times()` diz quanto
+# cada proxy custou ao carregar (benchmarks/bench_imports.py).
+
+import time
+import threading
+import importlib
+import importlib.util
+from typing import Callable, Dict, Optional
+
+_lock = threading.RLock()
+_load_times: Dict[str, float] = {}
+
+
+class LazyModule:
+    """Proxy de `name`; `setup` roda antes do import (ex.: escolher o backend do Matplotlib)."""
+
+    __slots__ = ("_name", "_setup", "_mod")
+
+    def __init__(self, name: str, setup: Optional[Callable[[], None]] = None):
+        self._name = name
+        self._setup = setup
+        self._mod = None
+
+    def load(self):
+        if self._mod is None:
+            with _lock:
+                if self._mod is None:
+                    t0 = time.perf_counter()
+                    if self._setup is not None:
+                        self._setup()
+                    mod = importlib.import_module(self._name)
+                    _load_times[self._name] = time.perf_counter() - t0
+                    self._mod = mod
+        return self._mod
+
+    @property
+    def loaded(self) -> bool:
+        return self._mod is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self._name} ({'carregado' if self._mod is not None else 'pendente'})>"
+
+
+def lazy(name: str, setup: Optional[Callable[[], None]] = None) -> LazyModule:
+    return LazyModule(name, setup)
+
+
+def available(*names: str) -> bool:
+    """True se todos os pacotes (nomes de topo) estão instalados — sem importá-los."""
+    try:
+        return all(importlib.util.find_spec(n) is not None for n in names)
+    except (ImportError, ValueError):
+        return False
+
+
+def matplotlib_agg() -> None:
+    """Backend sem interface gráfica antes do primeiro `import matplotlib.pyplot` (servidor/lote)."""
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def load_times() -> Dict[str, float]:
+    """Segundos gastos no primeiro acesso de cada proxy já carregado neste processo."""
+    with _lock:
+        return dict(_load_times)
@@ -23,33 +23,13 @@ iframe { width: 100% !important; }
 from ui_helpers import hide_streamlit_chrome
 hide_streamlit_chrome(hide_header=True, hide_toolbar=True, hide_sidebar_nav=False)
 
-# --- Guarda + Logout (cole no topo de cada página protegida) ---
-import yaml
-from yaml.loader import SafeLoader
-import streamlit_authenticator as stauth
+# --- Guarda + Logout (session_guard: token de sessão, sem reler o auth_config.yaml) ---
+from session_guard import logout, require_login
 
-with open("auth_config.yaml") as _f:
-    _cfg = yaml.load(_f, Loader=SafeLoader)
-
-_auth = stauth.Authenticate(
-    _cfg["credentials"],
-    _cfg["cookie"]["name"],
-    _cfg["cookie"]["key"],
-    _cfg["cookie"]["expiry_days"],
-)
-
-# Botão de sair na sidebar quando autenticado
-if st.session_state.get("authentication_status"):
-    try:
-        _auth.logout(location="sidebar")  # versões novas
-    except Exception:
-        _auth.logout("Sair", "sidebar")   # fallback versões antigas
-else:
-    st.warning("Sessão expirada. Faça login novamente.")
-    try:
-        st.switch_page("app.py")
-    except Exception:
-        st.stop()
+require_login()
+with st.sidebar:
+    if st.button("Sair", use_container_width=True):
+        logout()
 
 # --- Conteúdo da página ---
 st.title("📊 Estatísticas Gerais")
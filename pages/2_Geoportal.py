@@ -3,40 +3,42 @@
 # Geoportal — gráfico único (linha+spline opcional) + barras de incerteza + PDF OGMP L5 (com caixa de conformidade,
 # identificação da instalação, resumo da campanha, resultados por data com incerteza, visualização, classificação OGMP, recomendações)
 
-import io
-import base64
+import os
+import uuid
+import tempfile
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Optional
 
 import numpy as np
 import pandas as pd
 import streamlit as st
-import plotly.graph_objects as go
+
+from lazy_imports import available, lazy
+from session_guard import logout, require_login
+from assets import image_src
+from geo_cube import SiteCube, build_site_cube, workbook_digest
+from geo_excel import StreamingWorkbook
+from geo_batch import new_zip_path, plan_batch, run_batch
+from geo_diskcache import CubeDiskCache
+from geo_series import SeriesEngine
+from geo_images import ImagePrefetcher, ImageService, resolve_image_target
+from geo_report import (
+    CHART_RENDERERS, FREQ_CODES, INC_ALIASES, LOGO_REL_PATH, PDF_CHART_RENDERER, SAT_ALIASES, SERIES_PARAMS,
+    TAXA_ALIASES, VENTO_ALIASES,
+    build_report_pdf, plot_context, plot_frame, results_table as build_results_table,
+)
 
 # ===================== CONFIG =====================
-DEFAULT_BASE_URL = "https://raw.githubusercontent.com/dapsat100-star/geoportal/main"
-LOGO_REL_PATH    = "images/logomavipe.jpeg"  # usado no PDF
+PREFETCH_RADIUS  = 2   # datas anteriores/seguintes cujas imagens são pré-carregadas
+PREFETCH_WORKERS = 4   # limite de downloads simultâneos do prefetch (processo inteiro)
+BATCH_DIR = Path(os.getenv("GEO_BATCH_DIR") or Path(tempfile.gettempdir()) / "geo_batch")   # ZIPs do lote
 # ==================================================
 
-# Mapa (opcional)
-try:
-    import folium
-    from streamlit_folium import st_folium
-    HAVE_MAP = True
-except Exception:
-    HAVE_MAP = False
-
-# PDF deps
-from datetime import datetime, timezone
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.utils import ImageReader
-from urllib.request import urlopen
-
-# Fallback de renderização do gráfico para o PDF (Matplotlib)
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+# Plotly, mapa (opcional) e, via geo_report, ReportLab/Matplotlib só carregam no primeiro uso (lazy_imports)
+go = lazy("plotly.graph_objects")
+folium = lazy("folium")
+streamlit_folium = lazy("streamlit_folium")
+HAVE_MAP = available("folium", "streamlit_folium")
 
 # ----------------- Página -----------------
 st.set_page_config(
@@ -91,32 +93,25 @@ main.block-container { padding-top: 0.0rem !important; }
     unsafe_allow_html=True,
 )
 
-# === Logo no canto superior direito (se existir ao lado deste arquivo) ===
-logo_ui_path = Path(__file__).parent / "logomavipe.jpeg"
-if logo_ui_path.exists():
-    b64_logo = base64.b64encode(logo_ui_path.read_bytes()).decode("ascii")
+# === Logo no canto superior direito (se existir) ===
+# o da pasta pages/ (não o da raiz, usado pelo Agendamento: são imagens diferentes)
+_logo = image_src("pages/logomavipe.jpeg", max_width=360)   # codificado uma vez por processo (assets)
+if _logo:
     st.markdown(
-        f"<div id='top-right-logo'><img src='data:image/jpeg;base64,{b64_logo}' width='120'/></div>",
+        f"<div id='top-right-logo'><img src='{_logo}' width='120'/></div>",
         unsafe_allow_html=True,
     )
 
 st.title("📷 Geoportal — OGMP L5 (Site-Level)")
 
 # ---- Guard de sessão ----
-is_auth = bool(st.session_state.get("user")) or bool(st.session_state.get("authentication_status"))
-user_name = st.session_state.get("name") or st.session_state.get("username") or st.session_state.get("user")
-
-if not is_auth:
-    st.warning("Sessão expirada ou não autenticada.")
-    st.page_link("app.py", label="🔐 Voltar à página de login")
-    st.stop()
+user_name = require_login()["name"]
 
 # ================= Sidebar =================
 with st.sidebar:
     st.success(f"Logado como: {user_name or 'usuário'}")
     if st.button("Sair", use_container_width=True):
-        st.session_state.clear()
-        st.switch_page("app.py")
+        logout()
     st.markdown("---")
 
     # --- Atalho único de módulo ---
@@ -171,241 +166,192 @@ with st.sidebar:
         line_spline = st.checkbox("Linha como spline", value=True)
         show_unc_bars = st.checkbox("Mostrar barras de incerteza", value=True)
         show_trend = st.checkbox("Mostrar tendência linear", value=False)
+        chart_renderer = st.selectbox(
+            "Gráfico no PDF", list(CHART_RENDERERS), index=CHART_RENDERERS.index(PDF_CHART_RENDERER),
+            help="vetor: desenhado direto no PDF (rápido, sem kaleido); plotly: PNG via kaleido; matplotlib: PNG."
+        )
 
 # ================= Helpers =================
-@st.cache_data
-def read_excel_from_bytes(file_bytes) -> Dict[str, pd.DataFrame]:
-    xls = pd.ExcelFile(file_bytes, engine="openpyxl")
-    return {sn: pd.read_excel(xls, sheet_name=sn, engine="openpyxl") for sn in xls.sheet_names}
-
-def normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
-    cols = list(df.columns)
-    if cols:
-        cols[0] = "Parametro"
-    normed = []
-    for c in cols:
-        s = str(c).strip()
-        if s.lower() in ("lat","latitude"):
-            normed.append("Lat")
-        elif s.lower() in ("long","lon","longitude"):
-            normed.append("Long")
-        else:
-            normed.append(s)
-    df.columns = normed
-    return df
-
-def _fmt_pt_month(dt: pd.Timestamp) -> str:
-    meses = [
-        "janeiro","fevereiro","março","abril","maio","junho",
-        "julho","agosto","setembro","outubro","novembro","dezembro"
-    ]
-    return f"{meses[dt.month-1].capitalize()} de {dt.year}"
-
-def extract_dates_from_first_row(df: pd.DataFrame) -> Tuple[List[str], Dict[str, str], List[pd.Timestamp]]:
-    cols = list(df.columns)
+def _expander_on_demand(label: str, key: str):
+    """(expander, aberto?). Com o estado do expander (Streamlit ≥ 1.5x: key/on_change) o conteúdo só
+    roda com ele aberto; em versões antigas o corpo roda sempre, como antes."""
     try:
-        data_idx = cols.index("Data")
-    except ValueError:
-        data_idx = 3 if len(cols) > 3 else 0
-    date_cols = cols[data_idx:]
-    labels, stamps = {}, []
-    for c in date_cols:
-        v = df.loc[0, c] if 0 in df.index else None
-        ts = pd.NaT
-        if pd.notna(v) and str(v).strip() != "":
-            for dayfirst in (True, False):
-                try:
-                    parsed = pd.to_datetime(v, dayfirst=dayfirst, errors="raise")
-                    ts = pd.Timestamp(year=parsed.year, month=parsed.month, day=1)
-                    break
-                except Exception:
-                    continue
-        if pd.isna(ts):
-            try:
-                parsed = pd.to_datetime(str(c), errors="raise", dayfirst=True)
-                ts = pd.Timestamp(year=parsed.year, month=parsed.month, day=1)
-            except Exception:
-                ts = pd.NaT
-        labels[c] = _fmt_pt_month(ts) if pd.notna(ts) else str(c)
-        stamps.append(ts)
-    return date_cols, labels, stamps
-
-def build_record_for_month(df: pd.DataFrame, date_col: str) -> Dict[str, Optional[str]]:
-    dfi = df.copy()
-    if dfi.columns[0] != "Parametro":
-        dfi.columns = ["Parametro"] + list(dfi.columns[1:])
-    dfi["Parametro"] = dfi["Parametro"].astype(str).str.strip()
-    dfi = dfi.set_index("Parametro", drop=True)
-    rec = {param: dfi.loc[param, date_col] for param in dfi.index}
-    rec["_lat"] = df["Lat"].dropna().iloc[0] if "Lat" in df.columns and df["Lat"].notna().any() else None
-    rec["_long"] = df["Long"].dropna().iloc[0] if "Long" in df.columns and df["Long"].notna().any() else None
-    return rec
-
-def resolve_image_target(path_str: str) -> Optional[str]:
-    if path_str is None or (isinstance(path_str, float) and pd.isna(path_str)): return None
-    s = str(path_str).strip()
-    if not s: return None
-    s = s.replace("\\","/"); s = s[2:] if s.startswith("./") else s
-    if s.lower().startswith(("http://","https://")): return s
-    return f"{DEFAULT_BASE_URL.rstrip('/')}/{s.lstrip('/')}"
-
-def extract_series(dfi: pd.DataFrame, date_cols_sorted, dates_ts_sorted, row_name="Taxa Metano"):
-    """Extrai série temporal do parâmetro `row_name`."""
-    idx_map = {str(i).lower().strip(): i for i in dfi.index}
-    key = idx_map.get(row_name.lower().strip())
-    rows = []
-    if key is not None:
-        for i, col in enumerate(date_cols_sorted):
-            val = dfi.loc[key, col] if col in dfi.columns else None
-            try:
-                num = float(pd.to_numeric(val))
-            except Exception:
-                num = None
-            ts = dates_ts_sorted[i]
-            if pd.notna(num) and pd.notna(ts):
-                rows.append({"date": ts, "value": float(num)})
-    s = pd.DataFrame(rows)
-    if not s.empty:
-        s = s.sort_values("date").reset_index(drop=True)
-    return s
-
-def resample_and_smooth(s: pd.DataFrame, freq_code: str, agg: str, smooth: str, window: int):
-    if s.empty: return s
-    s2 = s.set_index("date").asfreq("D")
-    agg_fn = {"média":"mean","mediana":"median","máx":"max","mín":"min"}[agg]
-    out = getattr(s2.resample(freq_code), agg_fn)().dropna().reset_index()
-    if smooth == "Média móvel":
-        out["value"] = out["value"].rolling(window=window, min_periods=1).mean()
-    elif smooth == "Exponencial (EMA)":
-        out["value"] = out["value"].ewm(span=window, adjust=False).mean()
-    return out
-
-def get_from_dfi(dfi: pd.DataFrame, selected_col: str, name: str, *aliases):
-    """Busca valor por nome do parâmetro (case/acento-insensitive)."""
-    import unicodedata, re
-    def _norm_txt(s)->str:
-        if s is None or (isinstance(s,float) and pd.isna(s)): return ""
-        s=unicodedata.normalize("NFKD",str(s))
-        s="".join(ch for ch in s if not unicodedata.category(ch).startswith("M"))
-        return re.sub(r"\s+"," ",s).strip().lower()
-    idx_norm={_norm_txt(ix): ix for ix in dfi.index}
-    keys=[_norm_txt(name)] + [_norm_txt(a) for a in aliases]
-    for k in keys:
-        if k and k in idx_norm:
-            return dfi.loc[idx_norm[k], selected_col]
-    for nk,orig in idx_norm.items():
-        if any(nk.startswith(k) for k in keys if k):
-            return dfi.loc[orig, selected_col]
-    return None
+        exp = st.expander(label, expanded=False, key=key, on_change="rerun")
+        return exp, bool(exp.open)
+    except TypeError:
+        return st.expander(label, expanded=False), True
+
+@st.cache_resource(show_spinner=False)
+def get_disk_cache() -> CubeDiskCache:
+    """Cache em disco dos cubos (GEO_CACHE_DIR / GEO_CACHE_MAX_MB), sobrevive a restarts."""
+    return CubeDiskCache.from_env()
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def open_workbook(wb_key: str, _file_bytes: bytes) -> StreamingWorkbook:
+    """Workbook em modo streaming, aberto 1x por hash do upload (abas lidas sob demanda).
+    Cada aba lida (inclusive em segundo plano) já vai para o cache em disco."""
+    disk = get_disk_cache()
+    def _persist(site: str, df: pd.DataFrame):
+        if not disk.has_cube(wb_key, site):
+            disk.save_cube(wb_key, site, build_site_cube({site: df}))
+    wb = StreamingWorkbook(_file_bytes, on_sheet=_persist)
+    disk.save_sheet_names(wb_key, wb.sheet_names)
+    return wb
+
+@st.cache_resource(max_entries=128, show_spinner=False)
+def load_site_cube(wb_key: str, site: str, _file_bytes: bytes) -> SiteCube:
+    """Cubo do site, 1x por (hash do upload, site): memória → disco → parse da aba."""
+    cube = get_disk_cache().load_cube(wb_key, site)
+    if cube is None:
+        cube = build_site_cube({site: open_workbook(wb_key, _file_bytes).sheet(site)})
+    return cube
+
+@st.cache_resource(show_spinner=False)
+def get_image_service() -> ImageService:
+    """Imagens (plumas/logo) com sessão HTTP em pool e cache disco+memória, 1 por processo."""
+    return ImageService.from_env()
+
+@st.cache_resource(show_spinner=False)
+def get_prefetcher() -> ImagePrefetcher:
+    """Pool de prefetch compartilhado (concorrência limitada a PREFETCH_WORKERS)."""
+    return ImagePrefetcher(get_image_service(), max_workers=PREFETCH_WORKERS, tier="screen")
+
+@st.cache_resource(show_spinner=False)
+def get_series_engine() -> SeriesEngine:
+    """Memo de séries reamostradas compartilhado entre reruns e sessões."""
+    return SeriesEngine()
 
 # =============== Fluxo principal ===============
 if uploaded is None:
     st.info("Faça o upload do seu Excel (`.xlsx`) no painel lateral.")
     st.stop()
 
+file_bytes = uploaded.getvalue()
+wb_key = workbook_digest(file_bytes)
+disk = get_disk_cache()
+workbook: Optional[StreamingWorkbook] = None
+site_names = disk.sheet_names(wb_key)
+if site_names is None:
+    try:
+        workbook = open_workbook(wb_key, file_bytes)
+    except Exception as e:
+        st.error(f"Falha ao ler o Excel enviado. Detalhe: {e}")
+        st.stop()
+    site_names = workbook.sheet_names
+site_names = sorted(site_names)
+
+# Escolha do site e data: só a aba do site é lida agora; o cubo do site evita reprocessar a aba
+site = st.selectbox("Selecione o Site", site_names)
 try:
-    book = read_excel_from_bytes(uploaded)
+    cube = load_site_cube(wb_key, site, file_bytes)
 except Exception as e:
-    st.error(f"Falha ao ler o Excel enviado. Detalhe: {e}")
+    st.error(f"Falha ao ler a aba '{site}' do Excel. Detalhe: {e}")
     st.stop()
+site_pos = cube.site_pos(site)
 
-# Normaliza cada aba (site)
-book = {name: normalize_cols(df.copy()) for name, df in book.items()}
-site_names = sorted(book.keys())
-
-# Escolha do site e data
-site = st.selectbox("Selecione o Site", site_names)
-df_site = book[site]
-
-# Garante índice numérico para a linha 0 usada pelos rótulos de Data
-if df_site.index.name is not None:
-    df_site = df_site.reset_index(drop=True)
+# Abas ainda fora do cache em disco: lidas em segundo plano (depois da primeira, para não competir com ela)
+if any(not disk.has_cube(wb_key, name) for name in site_names):
+    workbook = open_workbook(wb_key, file_bytes)
+    workbook.start_background()
+with st.sidebar:
+    with st.expander("⏱️ Leitura da planilha (por aba)"):
+        if workbook is not None:
+            st.dataframe(workbook.timings_frame(), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Todas as abas carregadas do cache em disco.")
 
-date_cols, labels, stamps = extract_dates_from_first_row(df_site)
-order = sorted(range(len(date_cols)), key=lambda i: (pd.Timestamp.min if pd.isna(stamps[i]) else stamps[i]))
-date_cols_sorted = [date_cols[i] for i in order]
-labels_sorted = [labels[date_cols[i]] for i in order]
-stamps_sorted = [stamps[i] for i in order]
+date_cols_sorted = cube.date_cols[site_pos]
+labels_sorted = cube.labels[site_pos]
 
 selected_label = st.selectbox("Selecione a data", labels_sorted)
-selected_col = date_cols_sorted[labels_sorted.index(selected_label)]
+date_pos = labels_sorted.index(selected_label)
+selected_col = date_cols_sorted[date_pos]
+
+# Prefetch das imagens das datas vizinhas (mais próximas primeiro); trocar de site cancela o que ficou na fila
+_neighbors = [d for k in range(1, PREFETCH_RADIUS + 1) for d in (date_pos + k, date_pos - k)
+              if 0 <= d < len(date_cols_sorted)]
+get_prefetcher().prefetch(
+    owner=st.session_state.setdefault("_prefetch_owner", uuid.uuid4().hex),
+    scope=(wb_key, site),
+    urls=[resolve_image_target(cube.value(site_pos, d, "Imagem")) for d in _neighbors],
+)
 
 # Layout superior: imagem/mapa + tabela/métricas
 left, right = st.columns([2,1])
 
 with left:
-    rec = build_record_for_month(df_site, selected_col)
+    rec = cube.record(site_pos, date_pos)
     img = resolve_image_target(rec.get("Imagem"))
     st.subheader(f"Imagem — {site} — {selected_label}")
-    if img:
-        st.image(img, use_container_width=True)
+    # nível "screen" servido pelo cache do servidor (o navegador não busca a original no GitHub a cada troca)
+    img_bytes = get_image_service().tier(img, "screen") if img else None
+    if img_bytes:
+        st.image(img_bytes, use_container_width=True)
+    elif img:
+        st.error("Falha ao baixar a imagem dessa data.")
     else:
         st.error("Imagem não encontrada para essa data.")
 
     if HAVE_MAP and (rec.get("_lat") is not None and rec.get("_long") is not None):
-        with st.expander("🗺️ Mostrar mapa (opcional)", expanded=False):
-            try:
-                base_choice = st.selectbox(
-                    "Camada base do mapa",
-                    ["Satélite (Esri)", "OpenStreetMap"],
-                    index=0,
-                    help="Escolha a base: imagem de satélite real (Esri) ou mapa OSM."
-                )
-                # Mapa sem base inicial
-                m = folium.Map(
-                    location=[float(rec["_lat"]), float(rec["_long"])],
-                    zoom_start=13,
-                    tiles=None
-                )
-                # Camadas base
-                ESRI_SAT_URL = "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"
-                ESRI_ATTR    = "Tiles © Esri — Source: Esri, Maxar, Earthstar Geographics, and the GIS User Community"
-                folium.TileLayer(
-                    tiles=ESRI_SAT_URL,
-                    attr=ESRI_ATTR,
-                    name="Satélite (Esri World Imagery)",
-                    overlay=False,
-                    control=True,
-                    show=(base_choice.startswith("Satélite"))
-                ).add_to(m)
-                folium.TileLayer(
-                    "OpenStreetMap",
-                    name="OpenStreetMap",
-                    overlay=False,
-                    control=True,
-                    show=(base_choice.startswith("OpenStreetMap"))
-                ).add_to(m)
-
-                # Marcador
-                folium.CircleMarker(
-                    [float(rec["_lat"]), float(rec["_long"])],
-                    radius=8,
-                    color="#FFFFFF",       # borda branca
-                    weight=2,
-                    fill=True,
-                    fill_color="#E74C3C",  # vermelho
-                    fill_opacity=0.9,
-                    tooltip=site
-                ).add_to(m)
-
-                folium.LayerControl(collapsed=False).add_to(m)
-                st_folium(m, height=420, use_container_width=True)
-            except Exception as e:
-                st.caption(f"[Mapa indisponível: {e}]")
+        map_exp, map_open = _expander_on_demand("🗺️ Mostrar mapa (opcional)", "geo_map_expander")
+        with map_exp:
+            if map_open:   # fechado, nem carrega o folium
+                try:
+                    base_choice = st.selectbox(
+                        "Camada base do mapa",
+                        ["Satélite (Esri)", "OpenStreetMap"],
+                        index=0,
+                        help="Escolha a base: imagem de satélite real (Esri) ou mapa OSM."
+                    )
+                    # Mapa sem base inicial
+                    m = folium.Map(
+                        location=[float(rec["_lat"]), float(rec["_long"])],
+                        zoom_start=13,
+                        tiles=None
+                    )
+                    # Camadas base
+                    ESRI_SAT_URL = "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"
+                    ESRI_ATTR    = "Tiles © Esri — Source: Esri, Maxar, Earthstar Geographics, and the GIS User Community"
+                    folium.TileLayer(
+                        tiles=ESRI_SAT_URL,
+                        attr=ESRI_ATTR,
+                        name="Satélite (Esri World Imagery)",
+                        overlay=False,
+                        control=True,
+                        show=(base_choice.startswith("Satélite"))
+                    ).add_to(m)
+                    folium.TileLayer(
+                        "OpenStreetMap",
+                        name="OpenStreetMap",
+                        overlay=False,
+                        control=True,
+                        show=(base_choice.startswith("OpenStreetMap"))
+                    ).add_to(m)
+
+                    # Marcador
+                    folium.CircleMarker(
+                        [float(rec["_lat"]), float(rec["_long"])],
+                        radius=8,
+                        color="#FFFFFF",       # borda branca
+                        weight=2,
+                        fill=True,
+                        fill_color="#E74C3C",  # vermelho
+                        fill_opacity=0.9,
+                        tooltip=site
+                    ).add_to(m)
+
+                    folium.LayerControl(collapsed=False).add_to(m)
+                    streamlit_folium.st_folium(m, height=420, use_container_width=True)
+                except Exception as e:
+                    st.caption(f"[Mapa indisponível: {e}]")
 
 with right:
     st.subheader("Detalhes do Registro")
-    dfi = df_site.copy()
-    if dfi.columns[0] != "Parametro":
-        dfi.columns = ["Parametro"] + list(dfi.columns[1:])
-    dfi["Parametro"] = dfi["Parametro"].astype(str).str.strip()
-    dfi = dfi.set_index("Parametro", drop=True)
-
     # Métricas rápidas (tenta achar por aliases)
     k1, k2, k3 = st.columns(3)
-    v_taxa  = get_from_dfi(dfi, selected_col, "Taxa Metano", "Taxa de Metano", "Fluxo Metano", "Fluxo CH4")
-    v_inc   = get_from_dfi(dfi, selected_col, "Incerteza", "Incerteza (%)", "Erro", "Uncertainty")
-    v_vento = get_from_dfi(dfi, selected_col, "Velocidade do Vento", "Vento", "Wind Speed")
+    v_taxa  = cube.value(site_pos, date_pos, *TAXA_ALIASES)
+    v_inc   = cube.value(site_pos, date_pos, *INC_ALIASES)
+    v_vento = cube.value(site_pos, date_pos, *VENTO_ALIASES)
 
     k1.metric("Taxa Metano (kgCH4/hr)", f"{v_taxa}" if pd.notna(v_taxa) else "—")
     k2.metric("Incerteza (%)", f"{v_inc}" if pd.notna(v_inc) else "—")
@@ -415,8 +361,7 @@ with right:
     st.caption("Tabela completa (parâmetro → valor):")
 
     # ---------- TABELA (sem 'Parametro' e sem 'Imagem') ----------
-    table_df = dfi[[selected_col]].copy()
-    table_df.columns = ["Valor"]
+    table_df = cube.table(site_pos, date_pos)
 
     # Remove linhas indesejadas (case-insensitive)
     drop_keys = {"parametro", "imagem"}
@@ -449,34 +394,27 @@ with right:
 st.markdown("### Série temporal — Taxa de Metano com Incerteza")
 
 # séries cruas por data
-series_raw_val = extract_series(dfi, date_cols_sorted, stamps_sorted, row_name="Taxa Metano")
-series_raw_unc = extract_series(dfi, date_cols_sorted, stamps_sorted, row_name="Incerteza")
+series_raw = cube.series_frame(site_pos, SERIES_PARAMS)
+series_raw_val = series_raw[["date", "metano"]].dropna().rename(columns={"metano": "value"})
+series_raw_unc = series_raw[["date", "incerteza"]].dropna().rename(columns={"incerteza": "value"})
 
 # frequencia e agregação iguais às opções escolhidas
-freq_code = {"Diário": "D", "Semanal": "W", "Mensal": "M", "Trimestral": "Q"}[freq]
-series_val = resample_and_smooth(series_raw_val, freq_code, agg, smooth, window)
-series_unc = resample_and_smooth(series_raw_unc, freq_code, agg, smooth, window)
+freq_code = FREQ_CODES[freq]
+# base reamostrada memoizada por (workbook, site, parâmetro, freq, agg); suavização é só o estágio final
+series_engine = get_series_engine()
+series_val = series_engine.get((wb_key, site, "metano"), series_raw_val, freq_code, agg, smooth, window)
+series_unc = series_engine.get((wb_key, site, "incerteza"), series_raw_unc, freq_code, agg, smooth, window)
 
 # alinhar valores e incertezas por data
-df_plot = pd.merge(
-    series_val.rename(columns={"value": "metano"}),
-    series_unc.rename(columns={"value": "incerteza"}),
-    on="date", how="left"
-).sort_values("date")
+df_plot = plot_frame(series_val, series_unc)
+# contexto para os renderizadores do PDF (fallback Matplotlib)
+plot_ctx = plot_context(df_plot, show_unc_bars, show_trend)
 
 if df_plot.empty:
     st.info("Sem dados numéricos suficientes para plotar.")
     fig_line = None  # para PDF
 else:
     err_array = df_plot["incerteza"].fillna(0)
-    # Salva contexto para fallback no PDF
-    st.session_state["_plot_ctx"] = {
-        "x": df_plot["date"].tolist(),
-        "y": df_plot["metano"].tolist(),
-        "yerr": err_array.tolist(),
-        "show_unc_bars": bool(show_unc_bars),
-        "show_trend": bool(show_trend),
-    }
     line_kwargs = {"shape": "spline"} if line_spline else {}
 
     fig_line = go.Figure()
@@ -507,361 +445,15 @@ else:
     )
     st.plotly_chart(fig_line, use_container_width=True)
 
-# ===================== PDF helpers =====================
-
-def _image_reader_from_url(url: str):
-    try:
-        with urlopen(url, timeout=10) as resp:
-            img = ImageReader(resp); w, h = img.getSize()
-            return img, w, h
-    except Exception:
-        return None, 0, 0
-
-def _draw_logo_scaled(c, x_right, y_top, logo_img, lw, lh, max_w=90, max_h=42):
-    if not logo_img: return 0, 0
-    scale = min(max_w / lw, max_h / lh)
-    w, h = lw * scale, lh * scale
-    c.drawImage(logo_img, x_right - w, y_top - h, width=w, height=h, mask='auto')
-    return w, h
-
-def _export_fig_to_png_bytes(fig) -> Optional[bytes]:
-    """Exporta figura Plotly para PNG.
-    1) plotly.io + kaleido; 2) kaleido PlotlyScope; 3) Matplotlib (fallback)."""
-    # 1) Plotly + kaleido
-    try:
-        import plotly.io as pio
-        return pio.to_image(fig, format="png", width=1400, height=800, scale=2, engine="kaleido")
-    except Exception:
-        pass
-    # 2) PlotlyScope
-    try:
-        from kaleido.scopes.plotly import PlotlyScope
-        scope = PlotlyScope(plotlyjs=None, mathjax=False)
-        return scope.transform(fig.to_plotly_json(), format="png", width=1400, height=800, scale=2)
-    except Exception:
-        pass
-    # 3) Matplotlib fallback usando o contexto salvo
-    try:
-        ctx = st.session_state.get("_plot_ctx")
-        if not ctx:
-            return None
-        x = pd.to_datetime(pd.Series(ctx.get("x", [])))
-        y = pd.to_numeric(pd.Series(ctx.get("y", [])), errors="coerce")
-        yerr = pd.to_numeric(pd.Series(ctx.get("yerr", [])), errors="coerce").fillna(0)
-        show_unc = bool(ctx.get("show_unc_bars", True))
-        show_tr = bool(ctx.get("show_trend", False))
-        if x.empty or y.empty:
-            return None
-        fig_m, ax = plt.subplots(figsize=(14, 8), dpi=100)
-        ax.plot(x, y, marker="o", linewidth=2)
-        if show_unc:
-            ax.errorbar(x, y, yerr=yerr, fmt='none', linewidth=1)
-        if show_tr and len(x) >= 2:
-            xd = (x - x.min()).dt.days.astype(float).to_numpy()
-            coeffs = np.polyfit(xd, y.to_numpy(dtype=float), 1)
-            yhat = np.poly1d(coeffs)(xd)
-            ax.plot(x, yhat, linestyle='--')
-        ax.set_xlabel("Data"); ax.set_ylabel("Taxa de Metano (kgCH4/hr)")
-        fig_m.autofmt_xdate()
-        buf = io.BytesIO()
-        fig_m.savefig(buf, format="png", bbox_inches="tight")
-        plt.close(fig_m)
-        buf.seek(0)
-        return buf.getvalue()
-    except Exception:
-        return None
-
-# ============== NOVO: utilitários para OGMP L5 no PDF ==============
-
-def _compliance_box_lines():
-    """Linhas da caixa de conformidade OGMP L5 (usada na capa)."""
-    return [
-        "OGMP 2.0 — Conformidade (Nível de Unidade — L5)",
-        "• Detecção e quantificação site-level (top-down)",
-        "• Taxa de emissão por unidade (kg CH4/h)",
-        "• Incerteza de medição reportada",
-        "• Resolução espacial ≤ 25 × 25 m",
-        "• Limite de quantificação ≤ 100 kg CH4/h",
-        "• Estrutura compatível com OGMP L5 (sem inventário L4)"
-    ]
-
-def _draw_compliance_box(c: canvas.Canvas, x: float, y: float, w: float, h: float):
-    """Desenha a caixa de conformidade OGMP L5."""
-    BAND = (0x15/255, 0x5E/255, 0x75/255)
-    ACC  = (0xF5/255, 0x9E/255, 0x0B/255)
-    c.setLineWidth(1.2)
-    c.setStrokeColorRGB(*ACC)
-    c.roundRect(x, y - h, w, h, 8, stroke=1, fill=0)
-    c.setFont("Helvetica-Bold", 11)
-    c.setFillColorRGB(*BAND)
-    c.drawString(x + 8, y - 18, _compliance_box_lines()[0])
-    c.setFillColorRGB(0,0,0)
-    c.setFont("Helvetica", 10)
-    y2 = y - 34
-    for line in _compliance_box_lines()[1:]:
-        c.drawString(x + 12, y2, line)
-        y2 -= 14
-
-# ===================== Build PDF =====================
-
-def build_report_pdf(
-    site,
-    date,
-    taxa,
-    inc,
-    vento,
-    img_url,
-    fig1,
-    logo_rel_path: str = LOGO_REL_PATH,
-    satellite: Optional[str] = None,
-    series_table: Optional[pd.DataFrame] = None,
-    lat: Optional[float] = None,
-    lon: Optional[float] = None,
-    printed_by: Optional[str] = None,
-) -> bytes:
-    BAND   = (0x15/255, 0x5E/255, 0x75/255)
-    ACCENT = (0xF5/255, 0x9E/255, 0x0B/255)
-    GRAY   = (0x6B/255, 0x72/255, 0x80/255)
-
-    buf = io.BytesIO()
-    c   = canvas.Canvas(buf, pagesize=A4)
-    W, H = A4
-    margin = 40
-    band_h = 80
-
-    logo_url = f"{DEFAULT_BASE_URL.rstrip('/')}/{logo_rel_path.lstrip('/')}"
-    logo_img, logo_w, logo_h = _image_reader_from_url(logo_url)
-
-    page_no = 0
-    def start_page():
-        nonlocal page_no
-        page_no += 1
-        c.setFillColorRGB(*BAND)
-        c.rect(0, H - band_h, W, band_h, fill=1, stroke=0)
-        _draw_logo_scaled(c, x_right=W - margin, y_top=H - (band_h/2 - 14),
-                          logo_img=logo_img, lw=logo_w, lh=logo_h, max_w=90, max_h=42)
-        ts_utc = datetime.now(timezone.utc).strftime('%d/%m/%Y %H:%M UTC')
-        c.setFillColorRGB(1,1,1); c.setFont("Helvetica-Bold", 16)
-        c.drawString(margin, H - band_h + 28, "Relatório Satelital Preliminar — OGMP 2.0 L5")
-        c.setFont("Helvetica", 10)
-        # Linha única para evitar corte: acrescenta "Impresso por" no mesmo baseline
-        line_txt = f"Site: {site}   |   Data: {date}   |   Gerado em: {ts_utc}"
-        if printed_by:
-            line_txt += f"   |   Impresso por: {printed_by}"
-        c.drawString(margin, H - band_h + 12, line_txt)
-        c.setFillColorRGB(0,0,0)
-        c.setStrokeColorRGB(*ACCENT); c.setLineWidth(1)
-        c.line(margin, H - band_h - 6, W - margin, H - band_h - 6)
-        c.setStrokeColorRGB(0,0,0)
-        return H - band_h - 20
-
-    y = start_page()
-
-    # ===== CAPA: Caixa de conformidade OGMP L5 =====
-    _draw_compliance_box(c, x=margin, y=y, w=W - 2*margin, h=110)
-    y -= (110 + 16)
-
-    # ===== 1. Identificação da Instalação =====
-    c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "1) Identificação da Instalação")
-    y -= 16; c.setFont("Helvetica", 10)
-    loc_txt = f"Lat {lat} / Lon {lon}" if (lat is not None and lon is not None) else "—"
-    for line in (
-        f"• Nome: {site}",
-        f"• Tipo: Unidade (site-level)",
-        f"• Localização: {loc_txt}",
-        f"• Período da campanha: {date}",
-        f"• Responsável: MAVIPE Space Systems",
-        f"• Satélite: {satellite or '—'}",
-    ):
-        c.drawString(margin, y, line); y -= 14
-
-    y -= 6; c.setStrokeColorRGB(*ACCENT); c.setLineWidth(0.7)
-    c.line(margin, y, W - margin, y); y -= 14; c.setStrokeColorRGB(0,0,0)
-
-    # ===== 2. Métricas (com unidades) =====
-    c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "2) Métricas")
-    y -= 16; c.setFont("Helvetica", 10)
-
-    def _is_na(v) -> bool:
-        from math import isnan
-        if v is None: return True
-        try:
-            return pd.isna(v)
-        except Exception:
-            try:
-                return isinstance(v, float) and isnan(v)
-            except Exception:
-                return False
-
-    def _fmt_num(v, unit: str) -> str:
-        if _is_na(v): return "—"
-        return f"{v} {unit}"
-
-    def _fmt_pct(v) -> str:
-        if _is_na(v): return "—"
-        s = str(v).strip()
-        if s.endswith("%"): s = s[:-1].strip()
-        return f"{s} %"
-
-    def _fmt_txt(v) -> str:
-        return "—" if _is_na(v) or str(v).strip() == "" else str(v)
-
-    for line in (
-        f"• Taxa Metano (seleção atual): {_fmt_num(taxa, 'kgCH4/hr')}",
-        f"• Incerteza: {_fmt_pct(inc)}",
-        f"• Vento: {_fmt_num(vento, 'm/s')}",
-    ):
-        c.drawString(margin, y, line); y -= 14
-
-    y -= 6; c.setStrokeColorRGB(*ACCENT); c.setLineWidth(0.7)
-    c.line(margin, y, W - margin, y); y -= 14; c.setStrokeColorRGB(0,0,0)
-
-    # ===== 3. Resumo da Campanha =====
-    c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "3) Resumo da Campanha")
-    y -= 16; c.setFont("Helvetica", 10)
-    # estatísticas simples da série (se houver)
-    passes = int(series_table.shape[0]) if (series_table is not None) else 0
-    mean_val = series_table['kg_h'].mean() if (series_table is not None and 'kg_h' in series_table.columns) else None
-    lines = [
-        f"• Nº de passagens/dias com dados: {passes}",
-        f"• Cobertura: Site e entorno imediato (raio ~5 km)",
-        f"• Condições atmosféricas: vento médio reportado por passagem (ver tabela)",
-    ]
-    for ln in lines:
-        c.drawString(margin, y, ln); y -= 14
-    if mean_val is not None:
-        c.drawString(margin, y, f"• Emissão média (kgCH4/h) nas passagens: {mean_val:.0f}"); y -= 14
-
-    y -= 6; c.setStrokeColorRGB(*ACCENT); c.setLineWidth(0.7)
-    c.line(margin, y, W - margin, y); y -= 14; c.setStrokeColorRGB(0,0,0)
-
-    # ===== 4. Resultados por data (tabela) =====
-    if series_table is not None and not series_table.empty:
-        c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "4) Resultados Quantitativos (por data)")
-        y -= 18; c.setFont("Helvetica", 9)
-        # cabeçalho
-        headers = ["Data", "Emissão (kgCH4/h)", "Incerteza (%)", "Vento (m/s)"]
-        col_w = [(W - 2*margin) * w for w in (0.22, 0.26, 0.22, 0.22)]
-        x0 = margin
-        # desenha header
-        c.setFillColorRGB(0.95,0.95,0.95)
-        c.rect(x0, y - 14, sum(col_w), 16, fill=1, stroke=0)
-        c.setFillColorRGB(0,0,0)
-        for i,h in enumerate(headers):
-            c.drawString(x0 + sum(col_w[:i]) + 4, y - 2, h)
-        y -= 20
-        # linhas
-        for _, row in series_table.iterrows():
-            if y < 80:  # quebra de página
-                c.showPage(); y = start_page()
-            vals = [
-                str(row.get('data','')),
-                f"{row.get('kg_h','')}",
-                f"{row.get('incerteza','')}",
-                f"{row.get('vento','')}",
-            ]
-            for i,v in enumerate(vals):
-                c.drawString(x0 + sum(col_w[:i]) + 4, y, str(v))
-            y -= 14
-        y -= 8
-        c.setStrokeColorRGB(*ACCENT); c.setLineWidth(0.7)
-        c.line(margin, y, W - margin, y); y -= 14; c.setStrokeColorRGB(0,0,0)
-
-    # ===== 5. Visualizações =====
-    # Força a Seção 5 a iniciar em nova página (segunda página)
-    c.showPage(); y = start_page()
-    c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "5) Visualizações")
-    y -= 16
-
-    # Figura 1 — Imagem principal (se houver)
-    if img_url:
-        main_img, iw, ih = _image_reader_from_url(img_url)
-        if main_img:
-            max_w, max_h = W - 2*margin, 190
-            s = min(max_w/iw, max_h/ih); w, h = iw*s, ih*s
-            if y - h < margin + 30:
-                c.showPage(); y = start_page()
-            c.drawImage(main_img, margin, y - h, width=w, height=h, mask='auto')
-            c.setFont("Helvetica-Oblique", 9)
-            c.drawString(margin, y - h - 12, "Figura 1 - Concentração/Pluma de Metano (imagem de referência)")
-            y -= h + 26
-
-    # Figura 2 — Gráfico (série temporal)
-    if fig1 is not None:
-        try:
-            png1 = _export_fig_to_png_bytes(fig1)
-            if png1 is None:
-                raise RuntimeError("Exportação PNG indisponível no ambiente")
-            img1 = ImageReader(io.BytesIO(png1))
-            iw, ih = img1.getSize()
-            max_w, max_h = W - 2*margin, 260
-            s = min(max_w/iw, max_h/ih); w, h = iw*s, ih*s
-            if y - h < margin + 30:
-                c.showPage(); y = start_page()
-            c.drawImage(img1, margin, y - h, width=w, height=h, mask='auto')
-            c.setFont("Helvetica-Oblique", 9)
-            c.drawString(margin, y - h - 12, "Figura 2 - Série Histórica de Taxa de Metano (kgCH4/h) com incerteza")
-            y -= h + 26
-        except Exception as e:
-            c.setFont("Helvetica", 9)
-            c.drawString(margin, y, f"[Falha ao exportar gráfico: {e}]"); y -= 14
-
-    # ===== 6. Classificação OGMP Preliminar =====
-    if y < 150:
-        c.showPage(); y = start_page()
-
-    # adiciona espaçamento extra antes do título
-    y -= 20
-    c.setFont("Helvetica-Bold", 12); c.drawString(margin, y, "6) Classificação OGMP Preliminar")
-    y -= 16; c.setFont("Helvetica", 10)
-    txt = (
-        "As medições apresentadas correspondem ao Nível 5 (site-level, top-down) do framework OGMP 2.0. "
-            )
-    c.drawString(margin, y, txt); y -= 28
-
-    
-    # Rodapé
-    c.setFont("Helvetica", 8); c.setFillColorRGB(0.42,0.45,0.50)
-    c.drawRightString(W - margin, 12, f"pág {page_no}")
-    c.setFillColorRGB(0,0,0)
-
-    c.showPage(); c.save(); buf.seek(0)
-    return buf.getvalue()
-
 # ===================== Exportar PDF (UI) =====================
 
 # Monta pequena tabela de resultados por data (usa coluna de vento se existir)
-results_table = None
-if not series_raw_val.empty:
-    # pega até 12 pontos mais recentes
-    s_val = series_raw_val.copy().sort_values("date")
-    s_unc = series_raw_unc.copy().sort_values("date") if not series_raw_unc.empty else None
-    tail_n = min(12, len(s_val))
-    s_val = s_val.tail(tail_n)
-    if s_unc is not None:
-        # join por data, se houver incerteza
-        s_all = pd.merge(s_val, s_unc, on="date", how="left", suffixes=("_val","_unc"))
-    else:
-        s_all = s_val.copy(); s_all["value_unc"] = np.nan
-    # tenta achar vento por data (se existir como série)
-    series_raw_wind = extract_series(dfi, date_cols_sorted, stamps_sorted, row_name="Velocidade do Vento")
-    if not series_raw_wind.empty:
-        s_all = pd.merge(s_all, series_raw_wind.rename(columns={"value":"wind"}), on="date", how="left")
-    else:
-        s_all["wind"] = np.nan
-    # formata
-    results_table = pd.DataFrame({
-        "data": s_all["date"].dt.strftime("%d/%m/%Y"),
-        "kg_h": s_all["value_val"].round(0),
-        "incerteza": s_all["value_unc"].round(0),
-        "vento": s_all["wind"].round(1)
-    })
+results_table = build_results_table(series_raw)
 
-with right:
-    taxa      = get_from_dfi(dfi, selected_col, "Taxa Metano", "Taxa de Metano", "Fluxo Metano", "Fluxo CH4")
-    inc       = get_from_dfi(dfi, selected_col, "Incerteza", "Incerteza (%)", "Erro", "Uncertainty")
-    vento     = get_from_dfi(dfi, selected_col, "Velocidade do Vento", "Vento", "Wind Speed")
-    satellite = get_from_dfi(dfi, selected_col, "Satelite", "Satélite", "Satellite", "Sat")
+taxa      = v_taxa
+inc       = v_inc
+vento     = v_vento
+satellite = cube.value(site_pos, date_pos, *SAT_ALIASES)
 
 img_url = resolve_image_target(rec.get("Imagem"))
 
@@ -872,11 +464,11 @@ st.caption("Relatório OGMP L5: capa com caixa de conformidade, identificação,
 if st.button("Gerar PDF OGMP L5 (dados + gráfico)", type="primary", use_container_width=True):
     pdf_bytes = build_report_pdf(
         site=site, date=selected_label, taxa=taxa, inc=inc, vento=vento,
-        img_url=img_url, fig1=fig_line,
+        img_url=img_url, fig1=fig_line, images=get_image_service(),
         logo_rel_path=LOGO_REL_PATH, satellite=satellite,
         series_table=results_table,
         lat=rec.get("_lat"), lon=rec.get("_long"),
-        printed_by=user_name
+        printed_by=user_name, plot_ctx=plot_ctx, chart_renderer=chart_renderer,
     )
     st.download_button(
         label="⬇️ Baixar PDF (OGMP L5)",
@@ -886,3 +478,46 @@ if st.button("Gerar PDF OGMP L5 (dados + gráfico)", type="primary", use_contain
         use_container_width=True
     )
 
+
+# ===================== Lote: PDFs de todos os sites (ZIP) =====================
+with st.expander("📦 Gerar PDFs de todos os sites (ZIP)"):
+    st.caption("Um relatório por site/data, gerados em paralelo (processos) a partir do cache em disco da planilha e das imagens.")
+    ALL_DATES = "Todas as datas"
+    batch_label = st.selectbox("Data dos relatórios", [ALL_DATES] + list(labels_sorted),
+                               index=date_pos + 1, key="batch_label")
+    if st.button("Gerar lote (ZIP)", use_container_width=True):
+        # os workers carregam os cubos do disco: espera a leitura em 2º plano gravar as abas que faltam
+        if workbook is not None:
+            with st.spinner("Lendo as abas restantes da planilha..."):
+                workbook.wait()
+        site_labels = {name: disk.labels(wb_key, name) for name in site_names}
+        sem_cubo = [name for name, labels in site_labels.items() if labels is None]
+        if sem_cubo:
+            st.warning(f"Aba(s) não lida(s), fora do lote: {', '.join(sem_cubo)}")
+        tasks = plan_batch(wb_key, {n: lb for n, lb in site_labels.items() if lb is not None}, {
+            "freq": freq, "agg": agg, "smooth": smooth, "window": window,
+            "show_unc_bars": show_unc_bars, "show_trend": show_trend, "printed_by": user_name, "chart": chart_renderer,
+        }, label=None if batch_label == ALL_DATES else batch_label)
+
+        if not tasks:
+            st.info("Nenhum site possui essa data.")
+        else:
+            progress = st.progress(0.0, text=f"0/{len(tasks)} relatórios")
+            timings_box = st.empty()
+            timings = []
+            def _on_result(done: int, total: int, res: dict):
+                timings.append(res)
+                progress.progress(done / total, text=f"{done}/{total} relatórios")
+                timings_box.dataframe(pd.DataFrame(timings), hide_index=True, use_container_width=True)
+            zip_path = run_batch(tasks, disk, get_image_service(), new_zip_path(BATCH_DIR), on_result=_on_result)
+            n_err = sum(1 for r in timings if r["erro"])
+            if n_err:
+                st.warning(f"{n_err} relatório(s) falharam (ver coluna 'erro' e o manifesto.csv do ZIP).")
+            with open(zip_path, "rb") as zf:   # do arquivo temporário; o lote não fica num buffer da página
+                st.download_button(
+                    label="⬇️ Baixar ZIP (OGMP L5)",
+                    data=zf,
+                    file_name=f"relatorios_OGMP_L5_{batch_label}.zip".replace(" ", "_"),
+                    mime="application/zip",
+                    use_container_width=True
+                )
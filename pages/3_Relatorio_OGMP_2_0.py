@@ -1,36 +1,15 @@
 from ui_helpers import hide_streamlit_chrome
 hide_streamlit_chrome(hide_header=True, hide_toolbar=True, hide_sidebar_nav=False)
 
-# --- Guarda + Logout (cole no topo de cada página) ---
 import streamlit as st
-import yaml
-from yaml.loader import SafeLoader
-import streamlit_authenticator as stauth
 
-with open("auth_config.yaml") as _f:
-    _cfg = yaml.load(_f, Loader=SafeLoader)
+# --- Guarda + Logout (session_guard: token de sessão, sem reler o auth_config.yaml) ---
+from session_guard import logout, require_login
 
-_auth = stauth.Authenticate(
-    _cfg["credentials"],
-    _cfg["cookie"]["name"],
-    _cfg["cookie"]["key"],
-    _cfg["cookie"]["expiry_days"],
-)
-
-# Se a sessão está autenticada, mostra o botão Sair na sidebar
-if st.session_state.get("authentication_status"):
-    try:
-        # versões novas podem aceitar apenas location=
-        _auth.logout(location="sidebar")
-    except Exception:
-        # versões antigas requerem (label, location)
-        _auth.logout("Sair", "sidebar")
-else:
-    st.warning("Sessão expirada. Faça login novamente.")
-    try:
-        st.switch_page("app.py")
-    except Exception:
-        st.stop()
+require_login()
+with st.sidebar:
+    if st.button("Sair", use_container_width=True):
+        logout()
 # --- fim do bloco de guarda + logout ---
 
 import streamlit as st
@@ -4,27 +4,27 @@
 # "Última atualização" com prioridade local e STATUS com cores (via ícones).
 from __future__ import annotations
 
-import io
-import json
-import time
-import base64
 import os
+import hashlib
+import tempfile
 import datetime as dt
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Dict, Optional, Tuple
 
-import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-import requests
 import streamlit as st
 
+from gh_client import API_URL, shared_client
+from agenda_store import CachedStore, GitHubStore, LocalStore, SnapshotCatalog, StoreError
+from agenda_log import FIELDS, ValidationLog, apply_deltas, delta_bytes, month_rows, normalize, read_delta
+from agenda_queue import PublishQueue
+from agenda_calendar import METRICAS, StatusCube, cubo_status, montar_calendario, montar_visao_geral
+from shared_cache import DEFAULT_MAX_MB, SharedCache
+from session_guard import logout, require_login
+from assets import image_src
+
 # ==== Guard de sessão ====
-_is_auth = bool(st.session_state.get("user")) or bool(st.session_state.get("authentication_status"))
-if not _is_auth:
-    st.warning("Sessão expirada ou não autenticada.")
-    st.page_link("app.py", label="🔐 Voltar à página de login")
-    st.stop()
+require_login()
 
 # ============================================================================
 # CONFIG PÁGINA
@@ -132,18 +132,12 @@ def _rerun():
 # ============================================================================
 # LOGO (opcional)
 # ============================================================================
-def _logo_b64_from(path: str) -> Optional[str]:
-    p = Path(path)
-    if not p.exists(): return None
-    try: return base64.b64encode(p.read_bytes()).decode("utf-8")
-    except Exception: return None
-
-_LOGO_B64 = _logo_b64_from("logomavipe.jpeg")
-if _LOGO_B64:
+_LOGO = image_src("logomavipe.jpeg", max_width=360)   # codificado uma vez por processo (assets)
+if _LOGO:
     st.markdown(
         f"""
 <div style="position:fixed;top:12px;right:20px;z-index:9999;pointer-events:none">
-  <img src="data:image/jpeg;base64,{_LOGO_B64}" style="height:100px;width:auto;opacity:.98"/>
+  <img src="{_LOGO}" style="height:100px;width:auto;opacity:.98"/>
 </div>
 """,
         unsafe_allow_html=True,
@@ -162,121 +156,102 @@ def _gh_token() -> str:   return _conf_get("GITHUB_TOKEN", "github_token")
 def _gh_repo()  -> str:   return _conf_get("REPO_CRONOGRAMA", "github_repo")
 def _gh_branch()-> str:   return _conf_get("GITHUB_BRANCH", "github_branch", default="main")
 def _gh_root()  -> str:   return _conf_get("GH_DATA_ROOT", "gh_data_root", "data_root", default="data/validado")
+def _gh_api()   -> str:   return _conf_get("GITHUB_API_URL", "github_api_url", default=API_URL).rstrip("/")
 
-def _gh_headers() -> Dict[str,str]:
-    h={"Accept":"application/vnd.github+json"}; tok=_gh_token()
-    if tok: h["Authorization"]=f"Bearer {tok}"
-    return h
+@st.cache_resource(show_spinner=False)
+def get_shared_cache() -> SharedCache:
+    """Cache de leituras do GitHub compartilhado por todas as sessões do processo (AGENDA_CACHE_MAX_MB)."""
+    max_mb = float(_conf_get("AGENDA_CACHE_MAX_MB", "agenda_cache_max_mb", default=str(DEFAULT_MAX_MB)))
+    return SharedCache(int(max_mb * 1024 * 1024))
 
 def _ping_github(ttl: int = 120) -> bool:
-    key = "_gh_ping_cache"
-    now = time.time()
-    cache = st.session_state.get(key, {})
-    entry = cache.get("ping")
-    if entry and (now - entry["ts"] < ttl):
-        return bool(entry["ok"])
-    try:
-        url = f"https://api.github.com/repos/{_gh_repo()}"
-        r = requests.get(url, headers=_gh_headers(), timeout=5)
-        ok = (200 <= r.status_code < 300)
-    except Exception:
-        ok = False
-    cache["ping"] = {"ts": now, "ok": ok}
-    st.session_state[key] = cache
-    return ok
-
-def _list_contents(path: str):
-    url = f"https://api.github.com/repos/{_gh_repo()}/contents/{path}?ref={_gh_branch()}"
-    r = requests.get(url, headers=_gh_headers(), timeout=20)
-    if r.status_code == 403 and "rate limit" in r.text.lower():
-        raise RuntimeError("GitHub rate limit exceeded")
-    r.raise_for_status()
-    return r.json()
-
-def _list_all_xlsx(path: str) -> List[str]:
-    files: List[str] = []
-    for it in _list_contents(path):
-        if it["type"] == "file" and it["name"].lower().endswith(".xlsx"):
-            files.append(it["path"])
-        elif it["type"] == "dir":
-            files.extend(_list_all_xlsx(it["path"]))
-    return files
-
-def gh_get_file_sha(path: str) -> Optional[str]:
-    url = f"https://api.github.com/repos/{_gh_repo()}/contents/{path}?ref={_gh_branch()}"
-    r = requests.get(url, headers=_gh_headers(), timeout=20)
-    return r.json().get("sha") if r.status_code == 200 else None
-
-def gh_put_file(path: str, content_bytes: bytes, message: str, sha: Optional[str] = None):
-    url = f"https://api.github.com/repos/{_gh_repo()}/contents/{path}"
-    payload = {"message": message, "content": base64.b64encode(content_bytes).decode("utf-8"),
-               "branch": _gh_branch()}
-    if sha: payload["sha"] = sha
-    r = requests.put(url, headers=_gh_headers(), json=payload, timeout=30)
-    if r.status_code not in (200, 201):
-        raise RuntimeError(f"Falha ao salvar no GitHub ({r.status_code})")
-    return r.json()
-
-def gh_save_snapshot(xls_bytes: bytes, author: Optional[str] = None) -> dict:
-    root = _gh_root().rstrip("/")
-    now  = dt.datetime.now(dt.timezone.utc)
-    yyyy = now.strftime("%Y"); mm = now.strftime("%m"); stamp = now.strftime("%Y%m%d-%H%M%S")
-    excel_rel_path = f"{root}/{yyyy}/{mm}/validado-{stamp}.xlsx"
-    gh_put_file(excel_rel_path, xls_bytes, f"[streamlit] snapshot {stamp} (autor={author or 'anon'})", None)
-    latest = {"saved_at_utc": now.isoformat().replace("+00:00","Z")}
-    latest_path = f"{root}/latest.json"
-    sha_old = gh_get_file_sha(latest_path)
-    gh_put_file(latest_path, json.dumps(latest, ensure_ascii=False, indent=2).encode("utf-8"),
-                "[streamlit] update latest timestamp", sha_old)
-    return latest
+    def _ping() -> bool:
+        try:
+            # GET condicional pelo cliente compartilhado: 304 não gasta rate limit
+            r = shared_client(_gh_token()).get(f"{_gh_api()}/repos/{_gh_repo()}", timeout=5)
+            return 200 <= r.status_code < 300
+        except Exception:
+            return False
+    return bool(get_shared_cache().get(("gh_ping", _gh_repo()), _ping, ttl=ttl))
+
+def _snapshot_store():
+    """GitHub (contents API) ou, com AGENDA_LOCAL_ROOT, um diretório local (desenvolvimento/testes)."""
+    local = _conf_get("AGENDA_LOCAL_ROOT", "agenda_local_root")
+    if local:
+        return LocalStore(Path(local))
+    return GitHubStore(_gh_repo(), _gh_branch(), _gh_token(),
+                       api_url=_gh_api())
+
+@st.cache_resource(show_spinner=False)
+def get_snapshot_catalog(repo: str, branch: str, root: str) -> SnapshotCatalog:
+    """Catálogo (index.json) dos snapshots, 1 por (repo, branch, raiz); leituras via cache compartilhado."""
+    return SnapshotCatalog(CachedStore(_snapshot_store(), get_shared_cache()), root)
+
+def _catalog() -> SnapshotCatalog:
+    return get_snapshot_catalog(_gh_repo(), _gh_branch(), _gh_root())
+
+@st.cache_resource(show_spinner=False)
+def get_validation_log(repo: str, branch: str, root: str) -> ValidationLog:
+    """Estado reconstruído (checkpoint + deltas) memorizado para todas as sessões."""
+    return ValidationLog(get_snapshot_catalog(repo, branch, root))
+
+def _validation_log() -> ValidationLog:
+    return get_validation_log(_gh_repo(), _gh_branch(), _gh_root())
+
+@st.cache_resource(show_spinner=False)
+def get_publish_queue(repo: str, branch: str, root: str) -> PublishQueue:
+    """Fila local durável + worker de publicação, 1 por (repo, branch, raiz) no processo."""
+    qid = hashlib.sha1(f"{repo}|{branch}|{root}".encode("utf-8")).hexdigest()[:12]
+    base = _conf_get("AGENDA_QUEUE_DIR", "agenda_queue_dir") or str(Path(tempfile.gettempdir()) / "agenda_queue")
+    return PublishQueue(Path(base) / qid, publish=get_validation_log(repo, branch, root).publish_queued)
+
+def _queue() -> PublishQueue:
+    return get_publish_queue(_gh_repo(), _gh_branch(), _gh_root())
+
+def gh_save_rows(rows: pd.DataFrame, antes: pd.DataFrame, author: Optional[str] = None) -> Optional[str]:
+    """Grava as linhas alteradas (com os valores anteriores e a versão em que a sessão se baseou) na
+    fila local; a publicação no GitHub é em segundo plano, com merge otimista por linha.
+    Retorna o id do item na fila (None se nada mudou)."""
+    now = dt.datetime.now(dt.timezone.utc)
+    delta = delta_bytes(rows, author, now, antes=antes, base=st.session_state.get("__base_seq"))
+    if not delta.strip():
+        return None
+    item_id = _queue().enqueue({"author": author, "rows": delta.count(b"\n"), "delta": delta.decode("utf-8")})
+    st.session_state.setdefault("__queued_ids", []).append(item_id)
+    return item_id
 
 def load_latest_meta() -> Optional[dict]:
     try:
-        root = _gh_root().rstrip("/")
-        url = f"https://raw.githubusercontent.com/{_gh_repo()}/{_gh_branch()}/{root}/latest.json"
-        r = requests.get(url, timeout=20)
-        return r.json() if r.status_code == 200 else None
+        return _catalog().latest_meta()
     except Exception:
         return None
 
-def _cached_list_all_xlsx(path: str, ttl: int = 300) -> List[str]:
-    key = "_cache_list_all_xlsx"
-    now = time.time()
-    cache = st.session_state.get(key, {})
-    entry = cache.get(path)
-    if entry and (now - entry["ts"] < ttl):
-        return entry["data"]
-    data = _list_all_xlsx(path)
-    cache[path] = {"ts": now, "data": data}
-    st.session_state[key] = cache
-    return data
-
-def load_latest_snapshot_df() -> Optional[pd.DataFrame]:
+def load_latest_state() -> Tuple[Optional[pd.DataFrame], int]:
+    """Estado atual: último checkpoint (via índice, sem varrer data/validado) + replay dos deltas,
+    e a versão (seq) em que ele está."""
     try:
-        all_files = _cached_list_all_xlsx(_gh_root(), ttl=300)
-        if not all_files: return None
-        all_files.sort(reverse=True)
-        latest = all_files[0]
-        raw = f"https://raw.githubusercontent.com/{_gh_repo()}/{_gh_branch()}/{latest}"
-        df = pd.read_excel(raw)
-        keep = ["site_nome","data","status","observacao","validador","data_validacao"]
-        df = df[[c for c in keep if c in df.columns]].copy()
-        df["data"]           = pd.to_datetime(df["data"], errors="coerce").dt.date
-        df["data_validacao"] = pd.to_datetime(df.get("data_validacao", pd.NaT), errors="coerce")
-        df["observacao"]     = df.get("observacao","").astype(str)
-        df["validador"]      = df.get("validador","").astype(str)
-        df["status"]         = df.get("status","Pendente").astype(str)
-        df["yyyymm"]         = pd.to_datetime(df["data"]).dt.strftime("%Y-%m")
-        return df.sort_values(["data","site_nome"]).reset_index(drop=True)
+        df, seq = _validation_log().state()
+    except StoreError as e:   # p.ex. índice corrompido: avisa em vez de mostrar a tabela vazia
+        st.error(f"Falha ao ler os dados publicados: {e}")
+        df, seq = None, None
     except Exception:
-        return None
+        df, seq = None, None
+    # ainda na fila local (não publicados): aplicados por cima para não "sumirem" no reload
+    pending = [read_delta(r["delta"].encode("utf-8")) for r in _queue().pending() if r.get("delta")]
+    if pending:
+        df = apply_deltas(df if df is not None else normalize(pd.DataFrame(columns=["site_nome", "data"])), pending)
+    return df, seq
+
+def _load_state_into_session() -> None:
+    st.session_state.df_validado, st.session_state["__base_seq"] = load_latest_state()
+    st.session_state["__state_gen"] = st.session_state.get("__state_gen", 0) + 1
 
 # ============================================================================
 # AUTO-LOAD ESTADO
 # ============================================================================
 if "df_validado" not in st.session_state:
     with st.spinner("Carregando dados..."):
-        st.session_state.df_validado = load_latest_snapshot_df()
+        _load_state_into_session()
         st.session_state.ultimo_meta = load_latest_meta()
 
 # Inicializa o carimbo local a partir do latest.json (se ainda não houver)
@@ -303,8 +278,7 @@ with st.sidebar:
     user_display = st.session_state.get('name') or st.session_state.get('username') or st.session_state.get('user') or "usuário"
     st.success(f"Logado como: {user_display}")
     if st.button("Sair", use_container_width=True):
-        st.session_state.clear()
-        st.switch_page("app.py")
+        logout()
     st.markdown("---")
 
     st.header("📚 Módulo")
@@ -321,10 +295,10 @@ with st.sidebar:
 
     st.markdown("---")
     st.header("Filtros")
-    sites = sorted(dfv["site_nome"].dropna().unique())
+    sites = list(dfv["site_nome"].cat.categories)
     sel_sites = st.multiselect("Sites", options=sites, default=sites)
 
-    meses = sorted(dfv["yyyymm"].dropna().unique())
+    meses = list(dfv["yyyymm"].cat.categories)
     mes_default = st.session_state.get("mes_ano") or (meses[-1] if meses else None)
     idx = max(0, meses.index(mes_default)) if (mes_default in meses) else len(meses)-1
     mes_ano = st.selectbox("Mês", options=meses, index=idx)
@@ -367,6 +341,43 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+# Status da publicação (fila local → GitHub), atualizado sozinho a cada 3 s quando há st.fragment
+def _publish_status():
+    q = _queue()
+    n = q.pending_count()
+    if n and q.last_error:
+        st.caption(f"⏳ {n} alteração(ões) aguardando publicação — nova tentativa em breve ({q.last_error})")
+    elif n:
+        st.caption(f"⏳ {n} alteração(ões) aguardando publicação no GitHub")
+    elif q.last_published:
+        st.caption(f"☁️ Publicado no GitHub em {_fmt(q.last_published.get('saved_at_utc'))}")
+    # itens que falharam q.max_attempts vezes seguidas: fora da fila (não travam as outras gravações)
+    mortos = q.dead_letters()
+    if mortos:
+        linhas = "; ".join(f"{d.get('author') or 'anon'}, {d.get('rows', '?')} linha(s): {d.get('error')}"
+                           for d in mortos[:5])
+        st.error(f"❌ {len(mortos)} gravação(ões) não publicada(s) após {q.max_attempts} tentativas — {linhas}")
+        if st.button("🔁 Tentar publicar novamente", key="requeue_dead"):
+            q.requeue_dead()
+            _rerun()
+    # edições desta sessão recusadas no merge (outro validador mudou o mesmo campo antes)
+    mine = set(st.session_state.get("__queued_ids", []))
+    conflitos = [c for c in list(_validation_log().conflicts) if c["id"] in mine]
+    if conflitos:
+        linhas = "; ".join(f"{c['site_nome']} {c['data']} ({', '.join(c['campos'])})" for c in conflitos[:5])
+        st.warning(f"⚠️ {len(conflitos)} alteração(ões) não aplicada(s): outro validador alterou o mesmo "
+                   f"campo antes — {linhas}. Recarregue e revise.")
+        if st.button("🔄 Recarregar dados publicados", key="reload_conflicts"):
+            recusados = {c["id"] for c in conflitos}
+            st.session_state["__queued_ids"] = [i for i in st.session_state["__queued_ids"] if i not in recusados]
+            _load_state_into_session()
+            _rerun()
+
+_fragment = getattr(st, "fragment", None)
+if _fragment is not None:
+    _publish_status = _fragment(run_every=3)(_publish_status)
+_publish_status()
+
 # Mensagem pós-salvamento (sem path)
 if st.session_state.get("__last_save_ok"):
     st.success(st.session_state.pop("__last_save_ok"))
@@ -374,8 +385,8 @@ if st.session_state.get("__last_save_ok"):
 # ============================================================================
 # DADOS FILTRADOS
 # ============================================================================
-mask = dfv["site_nome"].isin(sel_sites) & (dfv["yyyymm"] == mes_ano)
-fdf = dfv.loc[mask].copy().sort_values(["data","site_nome"])
+mes_df = month_rows(dfv, mes_ano)   # fatia do mês (df_validado é ordenado por data)
+fdf = mes_df.loc[mes_df["site_nome"].isin(sel_sites)]
 label_mes = mes_label_pt(mes_ano)
 
 # ============================================================================
@@ -394,7 +405,8 @@ VIS_OPTIONS = ["⚫ Pendente", "🟢 Aprovada", "🔴 Rejeitada"]
 
 # View exibida/edição
 view = fdf[["site_nome","data","status","observacao","validador","data_validacao"]].copy()
-view["data"] = pd.to_datetime(view["data"]).dt.strftime("%Y-%m-%d")
+view["site_nome"] = view["site_nome"].astype(str)
+view["data"] = view["data"].dt.strftime("%Y-%m-%d")
 view["observacao"] = view["observacao"].astype("string")
 view["validador"] = view["validador"].astype("string")
 view["data_validacao"] = view["data_validacao"].apply(
@@ -402,8 +414,9 @@ view["data_validacao"] = view["data_validacao"].apply(
 ).astype("string")
 
 # Coluna visual para o Status (com ícones coloridos)
-view["Status"] = view["status"].map(STATUS_TO_VIS).fillna("⚫ Pendente")
+view["Status"] = view["status"].astype(str).map(STATUS_TO_VIS).fillna("⚫ Pendente")
 view = view.drop(columns=["status"])  # escondemos a crua
+view_rows = view.index.to_numpy()     # posição no editor → rótulo da linha em df_validado (site_nome, data)
 view = view.reset_index(drop=True)    # garante RangeIndex simples
 
 colcfg = {
@@ -418,7 +431,7 @@ colcfg = {
 }
 
 editor_key = f"ed_{mes_ano}_{abs(hash(tuple(sel_sites)))%100000}"
-edited = st.data_editor(
+st.data_editor(
     view,
     num_rows="fixed",
     width='stretch',
@@ -431,102 +444,77 @@ edited = st.data_editor(
 st.markdown("</div>", unsafe_allow_html=True)
 
 # ============================================================================
-# DETECTA ALTERAÇÕES (comparando já mapeado para status real)
+# DETECTA ALTERAÇÕES (só as linhas tocadas no editor, já mapeadas para o status real)
 # ============================================================================
-def _normalize_for_compare(df_disp: pd.DataFrame) -> pd.DataFrame:
-    df = df_disp.copy()
-    df["status"] = df["Status"].map(VIS_TO_STATUS).fillna("Pendente")
-    return df[["site_nome","data","status","observacao","validador"]]
-
-def _unsaved_mask(orig_display: pd.DataFrame, ed_display: pd.DataFrame) -> pd.Series:
-    a = _normalize_for_compare(orig_display)
-    b = _normalize_for_compare(ed_display)
-    return (a.values != b.values).any(axis=1)
-
-changed_mask = _unsaved_mask(view, edited)
-unsaved = int(changed_mask.sum())
+EDIT_COLS = {"Status": "status", "observacao": "observacao", "validador": "validador"}
+
+def _edit_value(col: str, v) -> str:
+    if col == "Status":
+        return VIS_TO_STATUS.get(v, "Pendente")
+    return "" if v is None or pd.isna(v) else str(v)
+
+def _pending_edits(editor_state: Optional[dict]) -> Dict[int, Dict[str, str]]:
+    """`edited_rows` do data_editor → {rótulo em df_validado: {campo: novo valor}}, sem as células
+    que voltaram ao valor original. Custo proporcional às células editadas, não à tabela."""
+    out: Dict[int, Dict[str, str]] = {}
+    for pos, cols in ((editor_state or {}).get("edited_rows") or {}).items():
+        pos = int(pos)
+        novo = {EDIT_COLS[c]: _edit_value(c, v) for c, v in cols.items()
+                if c in EDIT_COLS and _edit_value(c, v) != _edit_value(c, view.at[pos, c])}
+        if novo:
+            out[int(view_rows[pos])] = novo
+    return out
+
+edits = _pending_edits(st.session_state.get(editor_key))
+unsaved = len(edits)
 if unsaved > 0:
     st.markdown(f'<div class="unsaved"><strong>{unsaved}</strong> alteração(ões) não salvas.</div>', unsafe_allow_html=True)
 
 # ============================================================================
 # SALVAR (validador = usuário logado quando muda STATUS)
 # ============================================================================
-def _exportar_excel_bytes(df: pd.DataFrame) -> bytes:
-    cols = ["site_nome","data","status","observacao","validador","data_validacao"]
-    out = df[cols].copy()
-    out["data"] = pd.to_datetime(out["data"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
-    dv = pd.to_datetime(out["data_validacao"], errors="coerce")
-    out["data_validacao"] = dv.dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-        out.to_excel(writer, index=False, sheet_name="validacao")
-    buf.seek(0); return buf.read()
-
-def _aplicar_salvamento(edited_display: pd.DataFrame):
-    base = st.session_state.df_validado.copy()
-    e = edited_display.copy()
-
-    # Converte de volta para o status real e data
-    e["status"] = e["Status"].map(VIS_TO_STATUS).fillna("Pendente")
-    e["data"] = pd.to_datetime(e["data"]).dt.date
-
-    keys = ["site_nome","data"]
-
-    merged = base.merge(e[keys + ["status","observacao","validador"]], on=keys, how="left", suffixes=("", "_novo"))
-
-    # Detecta linhas onde o STATUS foi realmente alterado
-    has_new = ~merged["status_novo"].isna()
-    status_changed = has_new & (merged["status_novo"] != merged["status"])
-
-    # Aplica mudanças de campos editados
-    for c in ["status","observacao","validador"]:
-        c_new = f"{c}_novo"
-        if c_new in merged.columns:
-            mask_upd = ~merged[c_new].isna()
-            merged.loc[mask_upd, c] = merged.loc[mask_upd, c_new]
-            merged.drop(columns=[c_new], inplace=True, errors="ignore")
-
-    # Se STATUS mudou, grava o validador com o usuário logado
+def _aplicar_salvamento(edits: Dict[int, Dict[str, str]]):
+    base = st.session_state.df_validado
+    antes = base.loc[list(edits), FIELDS].copy()
     current_user = st.session_state.get('name') or st.session_state.get('username') or st.session_state.get('user') or ""
-    merged.loc[status_changed, "validador"] = current_user
-
-    # Timestamp de validação quando vira Aprovada/Rejeitada
-    ts_now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
-    status_now_is_def = merged["status"].isin(["Aprovada","Rejeitada"])
-    need_stamp = status_changed & status_now_is_def
-    merged.loc[need_stamp, "data_validacao"] = ts_now
-
-    st.session_state.df_validado = merged
+    ts_now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None, microsecond=0)   # precisão do xlsx/delta
+
+    for row, campos in edits.items():
+        for c, v in campos.items():
+            base.at[row, c] = v
+        # Se STATUS mudou, grava o validador com o usuário logado; Aprovada/Rejeitada ganha o carimbo
+        if "status" in campos:
+            base.at[row, "validador"] = current_user
+            if campos["status"] in ("Aprovada", "Rejeitada"):
+                base.at[row, "data_validacao"] = ts_now
+
+    now_utc = dt.datetime.now(dt.timezone.utc).isoformat().replace("+00:00","Z")
+    st.session_state["__last_saved_ts"] = now_utc
     try:
-        xlsb = _exportar_excel_bytes(merged)
-        meta = gh_save_snapshot(xlsb, author=current_user)
-        st.session_state.ultimo_meta = meta
-        st.session_state["__last_saved_ts"] = meta.get("saved_at_utc")
-        stamp = meta.get("saved_at_utc","").replace("T"," ").replace("Z"," UTC")
-        st.session_state["__last_save_ok"] = f"Última atualização em {stamp}"
+        gh_save_rows(base.loc[list(edits)], antes, author=current_user)
+        st.session_state["__last_save_ok"] = "Alterações salvas. Publicação no GitHub em segundo plano."
     except Exception:
-        now_utc = dt.datetime.now(dt.timezone.utc).isoformat().replace("+00:00","Z")
-        st.session_state["__last_saved_ts"] = now_utc
         st.session_state["__last_save_ok"] = "Atualização local concluída. Publicação remota indisponível."
     _rerun()
 
 save_clicked = st.button("💾 Salvar alterações", type="primary", disabled=(unsaved == 0))
 if save_clicked:
-    _aplicar_salvamento(edited)
+    _aplicar_salvamento(edits)
 
 # ============================================================================
 # CARD: AÇÕES EM LOTE + CALENDÁRIO
 # ============================================================================
 st.markdown(f'<div class="card"><h3>⚙️ Ações em lote por dia — {label_mes}</h3>', unsafe_allow_html=True)
 
-dias_disponiveis = sorted(pd.to_datetime(fdf["data"]).dt.date.unique())
+dias_disponiveis = sorted(fdf["data"].dt.date.unique())
 if dias_disponiveis:
     d_sel = st.selectbox("Dia", options=dias_disponiveis, format_func=lambda d: d.strftime("%Y-%m-%d"))
     cA, cB, _ = st.columns([1,1,6])
 
     def _lote(status_final: str, msg_ok: str):
         base = st.session_state.df_validado
-        idx = (pd.to_datetime(base["data"]).dt.date == d_sel) & base["site_nome"].isin(sel_sites) & (base["yyyymm"] == mes_ano)
+        idx = fdf.index[fdf["data"] == pd.Timestamp(d_sel)]   # rótulos em df_validado
+        antes = base.loc[idx, FIELDS].copy()
 
         # aplica status
         base.loc[idx, "status"] = status_final
@@ -535,20 +523,16 @@ if dias_disponiveis:
         base.loc[idx, "validador"] = current_user
         # timestamp para aprov/rej
         if status_final in ("Aprovada", "Rejeitada"):
-            ts_now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+            ts_now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None, microsecond=0)   # precisão do xlsx/delta
             base.loc[idx, "data_validacao"] = ts_now
 
         st.session_state.df_validado = base
+        now_utc = dt.datetime.now(dt.timezone.utc).isoformat().replace("+00:00","Z")
+        st.session_state["__last_saved_ts"] = now_utc
         try:
-            xlsb = _exportar_excel_bytes(base)
-            meta = gh_save_snapshot(xlsb, author=current_user)
-            st.session_state.ultimo_meta = meta
-            st.session_state["__last_saved_ts"] = meta.get("saved_at_utc")
-            stamp = meta.get("saved_at_utc","").replace("T"," ").replace("Z"," UTC")
-            st.session_state["__last_save_ok"] = f"{msg_ok} em {d_sel}. Última atualização em {stamp}"
+            gh_save_rows(base.loc[idx], antes, author=current_user)
+            st.session_state["__last_save_ok"] = f"{msg_ok} em {d_sel}. Publicação no GitHub em segundo plano."
         except Exception:
-            now_utc = dt.datetime.now(dt.timezone.utc).isoformat().replace("+00:00","Z")
-            st.session_state["__last_saved_ts"] = now_utc
             st.session_state["__last_save_ok"] = f"{msg_ok} em {d_sel}. Publicação remota indisponível."
         _rerun()
 
@@ -560,84 +544,36 @@ else:
     st.caption("Sem passagens no mês/site(s) filtrados.")
 
 # ---- Calendário -------------------------------------------------------------
-def montar_calendario(df_mes: pd.DataFrame, mes_ano: str,
-                      only_color_with_events: bool = True,
-                      show_badges: bool = True) -> go.Figure:
-    primeiro = pd.to_datetime(f"{mes_ano}-01")
-    ultimo = (primeiro + pd.offsets.MonthEnd(1))
-    dias = pd.date_range(primeiro, ultimo, freq="D")
-
-    if df_mes.empty:
-        agg = pd.DataFrame(columns=["data","aprovadas","rejeitadas","pendentes","sites"])
-    else:
-        agg = (df_mes.assign(data=pd.to_datetime(df_mes["data"]).dt.date)
-                     .groupby("data")
-                     .agg(aprovadas=("status", lambda s: (s == "Aprovada").sum()),
-                          rejeitadas=("status", lambda s: (s == "Rejeitada").sum()),
-                          pendentes=("status", lambda s: (s == "Pendente").sum()),
-                          sites=("site_nome", lambda s: sorted(set(s))))
-                     .reset_index())
-    info_map = {row["data"]: row for _, row in agg.iterrows()}
-
-    def cor_do_dia(d: pd.Timestamp) -> str:
-        inf = info_map.get(d.date())
-        if inf is None:
-            return "#ECEFF1" if only_color_with_events else "#B0BEC5"
-        if inf["rejeitadas"] > 0: return "#c62828"
-        if inf["pendentes"] > 0 and inf["aprovadas"] == 0: return "#B0BEC5"
-        return "#2e7d32"
-
-    def weekday_dom(d: pd.Timestamp) -> int:
-        return (d.weekday() + 1) % 7  # domingo = 0
-
-    grid = np.full((6, 7), None, dtype=object)
-    week = 0
-    for d in dias:
-        col = weekday_dom(d)
-        if col == 0 and d.day != 1:
-            week += 1
-        grid[week, col] = d
-
-    fig = go.Figure()
-    for r in range(6):
-        for c in range(7):
-            d = grid[r, c]
-            if d is None: 
-                continue
-            fill = cor_do_dia(d)
-            fig.add_shape(type="rect", x0=c, x1=c+1, y0=5-r, y1=6-r,
-                          line=dict(width=1, color="#90A4AE"), fillcolor=fill)
-            fig.add_annotation(x=c+0.05, y=5-r+0.85, text=str(d.day),
-                               showarrow=False, xanchor="left", yanchor="top", font=dict(size=12))
-            inf = info_map.get(d.date())
-            if show_badges and (inf is not None):
-                y0 = 5-r+0.18; badges = []
-                if inf["aprovadas"] > 0: badges.append(("●", "#2e7d32"))
-                if inf["rejeitadas"] > 0: badges.append(("●", "#c62828"))
-                if inf["pendentes"] > 0: badges.append(("●", "#607D8B"))
-                x0 = c+0.08
-                for ch, colr in badges:
-                    fig.add_annotation(x=x0, y=y0, text=f"<span style='color:{colr}'>{ch}</span>",
-                                       showarrow=False, xanchor="left", yanchor="bottom", font=dict(size=12))
-                    x0 += 0.12
-                txt_cnt = f"{inf['aprovadas']}A/{inf['rejeitadas']}R/{inf['pendentes']}P"
-                fig.add_annotation(x=c+0.95, y=5-r+0.18, text=txt_cnt,
-                                   showarrow=False, xanchor="right", yanchor="bottom", font=dict(size=10))
-            if inf is not None:
-                sites_txt = ", ".join(inf["sites"]) if inf["sites"] else "-"
-                hover = (f"{d.strftime('%Y-%m-%d')}<br>"
-                         f"Aprovadas: {inf['aprovadas']} | Rejeitadas: {inf['rejeitadas']} | Pendentes: {inf['pendentes']}<br>"
-                         f"Sites: {sites_txt}")
-                fig.add_trace(go.Scatter(x=[c+0.5], y=[5-r+0.5], mode="markers",
-                                         marker=dict(size=1, color="rgba(0,0,0,0)"),
-                                         hovertemplate=hover, showlegend=False))
-    fig.update_xaxes(visible=False); fig.update_yaxes(visible=False)
-    fig.update_layout(height=460, margin=dict(l=10, r=10, t=10),
-                      paper_bgcolor="white", plot_bgcolor="white")
-    return fig
-
 st.subheader(f"Calendário do mês selecionado — {label_mes}")
 fig = montar_calendario(fdf, mes_ano, only_color_with_events=True, show_badges=True)
 st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
 
 st.markdown("</div>", unsafe_allow_html=True)  # fecha card
+
+# ============================================================================
+# CARD: VISÃO GERAL (todos os meses/anos, por site)
+# ============================================================================
+def _status_cube() -> StatusCube:
+    """Cubo diário do estado da sessão; refeito só quando o estado muda (todo salvamento troca o carimbo,
+    toda recarga o contador)."""
+    key = (st.session_state.get("__state_gen"), st.session_state.get("__last_saved_ts"), len(dfv))
+    memo = st.session_state.get("__status_cube")
+    if memo is None or memo[0] != key:
+        memo = st.session_state["__status_cube"] = (key, cubo_status(dfv))
+    return memo[1]
+
+with st.expander("📊 Visão geral — aprovações, rejeições e pendências por site", expanded=False):
+    cube = _status_cube().subset(sel_sites)
+    anos = cube.anos()
+    cM, cP = st.columns([1, 1])
+    with cM:
+        metrica = st.selectbox("Métrica", options=list(METRICAS), key="vg_metrica")
+    with cP:
+        periodo = st.selectbox("Período", options=["Histórico (mensal)"] + [str(a) for a in reversed(anos)],
+                               key="vg_periodo")
+    if not cube.sites or not anos:
+        st.caption("Sem passagens para os site(s) filtrados.")
+    else:
+        ano = None if periodo.startswith("Histórico") else int(periodo)
+        st.plotly_chart(montar_visao_geral(cube, metrica, ano=ano), use_container_width=True,
+                        config={"displayModeBar": False})
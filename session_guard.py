@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# session_guard.py — guarda de sessão única para app.py e todas as páginas
+# A cada rerun a página só confere o token de sessão assinado emitido no login (HMAC, microssegundos) —
+# sem abrir/parsear o auth_config.yaml, sem streamlit_authenticator, sem bcrypt no caminho de cada interação.
+# A chave vem do secret `auth_secret`, nunca de arquivo versionado no repositório.
+
+import os
+import threading
+from typing import Dict, Optional
+
+import streamlit as st
+
+from auth_service import TokenSigner
+
+LOGIN_PAGE = "app.py"
+
+_lock = threading.Lock()
+_signer: Optional[TokenSigner] = None
+
+
+def _secret(key: str) -> str:
+    try:
+        v = st.secrets.get(key, "")
+    except Exception:
+        v = ""
+    return v or os.getenv(key.upper(), "")
+
+
+def signer() -> TokenSigner:
+    """Assinador dos tokens de sessão, compartilhado pelo processo. Chave: secret `auth_secret` (trocá-lo
+    invalida todas as sessões); sem ele, aleatória por processo (sessões do Streamlit também são por processo)."""
+    global _signer
+    if _signer is None:
+        with _lock:
+            if _signer is None:
+                key = _secret("auth_secret")
+                _signer = TokenSigner(key.encode("utf-8") if key else os.urandom(32))
+    return _signer
+
+
+def current_user() -> Optional[Dict]:
+    """{"user", "exp", "name"} da sessão se o token é válido (e é do usuário da sessão); renova o token
+    passada a metade da vida. None = sessão não autenticada ou expirada."""
+    ss = st.session_state
+    token = signer().refresh(ss.get("auth_token"))
+    info = signer().verify(token) if token else None
+    if info is None or info["user"] != ss.get("user"):
+        return None
+    ss["auth_token"] = token
+    info["name"] = ss.get("name") or info["user"]
+    return info
+
+
+def require_login() -> Dict:
+    """Topo de cada página protegida: sem sessão válida mostra o aviso + link para o login e para."""
+    info = current_user()
+    if info is None:
+        for k in ("auth_token", "authentication_status"):
+            st.session_state.pop(k, None)
+        st.warning("Sessão expirada ou não autenticada.")
+        st.page_link(LOGIN_PAGE, label="🔐 Voltar à página de login")
+        st.stop()
+    return info
+
+
+def logout() -> None:
+    st.session_state.clear()
+    st.switch_page(LOGIN_PAGE)
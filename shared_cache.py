@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# shared_cache.py — cache em memória do processo, compartilhado por todas as sessões do Streamlit
+# TTL por entrada, limite total em bytes (LRU) e "single-flight": N sessões pedindo a mesma chave
+# ao mesmo tempo disparam um único carregamento. Quem escreve invalida (ou regrava) as próprias chaves.
+
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+DEFAULT_MAX_MB = 64
+
+
+def _size_of(value) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    data = getattr(value, "data", None)          # StoredFile
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    usage = getattr(value, "memory_usage", None)   # DataFrame
+    if callable(usage):
+        try:
+            return int(value.memory_usage(deep=True).sum())
+        except Exception:
+            pass
+    return sys.getsizeof(value)
+
+
+class SharedCache:
+    """`get(key, loader, ttl)` devolve o valor em cache ou chama `loader()` (uma vez por chave)."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.max_bytes = int(max_bytes)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()   # key → (valor, expira_em|None, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading: Dict[Hashable, threading.Event] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: Hashable):
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        value, expires, _ = entry
+        if expires is not None and time.monotonic() >= expires:
+            self._drop(key)
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def set(self, key: Hashable, value, ttl: Optional[float] = None) -> None:
+        size = _size_of(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._data[key] = (value, None if ttl is None else time.monotonic() + ttl, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._data:
+                self._drop(next(iter(self._data)))
+
+    def get(self, key: Hashable, loader: Callable[[], object], ttl: Optional[float] = None):
+        while True:
+            with self._lock:
+                found, value = self._lookup(key)
+                if found:
+                    self.hits += 1
+                    return value
+                waiting = self._loading.get(key)
+                if waiting is None:
+                    self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            waiting.wait()   # outra sessão está carregando a mesma chave
+        try:
+            value = loader()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            with self._lock:
+                self._loading.pop(key).set()
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._drop(key)
+
+    def invalidate_where(self, pred: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            keys = [k for k in self._data if pred(k)]
+            for k in keys:
+                self._drop(k)
+        return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
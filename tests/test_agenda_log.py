@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# agenda_log: merge otimista por linha (merge_deltas) e replay checkpoint + deltas (apply_deltas).
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+from agenda_log import (ValidationLog, apply_deltas, delta_bytes, merge_deltas, normalize,
+                        read_delta, snapshot_bytes)
+from agenda_store import LocalStore, SnapshotCatalog
+
+NOW = dt.datetime(2024, 5, 10, 12, 0, 0, tzinfo=dt.timezone.utc)
+
+
+@pytest.fixture
+def state():
+    return normalize(pd.DataFrame({
+        "site_nome": ["S1", "S2", "S3"],
+        "data": ["2024-05-01", "2024-05-01", "2024-05-02"],
+        "status": ["Pendente"] * 3,
+        "observacao": ["", "", ""],
+        "validador": ["", "", ""],
+        "data_validacao": [None] * 3,
+    }))
+
+
+def _edit(df: pd.DataFrame, site: str, base: int, **changes) -> bytes:
+    """Delta de uma sessão que viu `df` (versão `base`) e mudou os campos da linha `site`."""
+    after = df.copy()
+    i = after.index[after["site_nome"] == site][0]
+    for field, value in changes.items():
+        after.at[i, field] = value
+    rows = after.loc[[i]]
+    return delta_bytes(rows, "autor", NOW, antes=df.loc[[i]], base=base)
+
+
+def _row(df: pd.DataFrame, site: str) -> pd.Series:
+    return df[df["site_nome"] == site].iloc[0]
+
+
+def test_disjoint_rows_from_two_writers_both_survive(state):
+    a = _edit(state, "S1", 0, status="Aprovada")
+    b = _edit(state, "S2", 0, status="Rejeitada", observacao="nuvens")
+    rows, conflicts = merge_deltas(state, [("a", "ana", a), ("b", "bia", b)], seq=0)
+    assert conflicts == []
+    merged = apply_deltas(state, [rows])
+    assert _row(merged, "S1")["status"] == "Aprovada"
+    assert _row(merged, "S2")["status"] == "Rejeitada" and _row(merged, "S2")["observacao"] == "nuvens"
+    assert _row(merged, "S3")["status"] == "Pendente"
+
+
+def test_disjoint_fields_on_a_stale_base_merge(state):
+    published = apply_deltas(state, [read_delta(_edit(state, "S1", 0, status="Aprovada"))])
+    late = _edit(state, "S1", 0, observacao="ok")            # baseado na versão 0, estado já está na 1
+    rows, conflicts = merge_deltas(published, [("b", "bia", late)], seq=1)
+    assert conflicts == []
+    row = _row(apply_deltas(published, [rows]), "S1")
+    assert row["status"] == "Aprovada" and row["observacao"] == "ok"
+
+
+def test_same_cell_conflict_is_reported_not_overwritten(state):
+    published = apply_deltas(state, [read_delta(_edit(state, "S1", 0, status="Aprovada"))])
+    late = _edit(state, "S1", 0, status="Rejeitada", observacao="x")
+    rows, conflicts = merge_deltas(published, [("b", "bia", late)], seq=1)
+    assert rows.empty
+    assert len(conflicts) == 1
+    c = conflicts[0]
+    assert (c["id"], c["autor"], c["site_nome"], c["campos"]) == ("b", "bia", "S1", ["status"])
+    assert c["publicado"] == {"status": "Aprovada"} and c["recusado"] == {"status": "Rejeitada"}
+
+
+def test_same_cell_in_one_batch_second_record_checked_against_first(state):
+    a = _edit(state, "S1", 0, status="Aprovada")
+    b = _edit(state, "S1", 0, status="Rejeitada")             # mesmo `antes`: o valor já mudou no lote
+    rows, conflicts = merge_deltas(state, [("a", "ana", a), ("b", "bia", b)], seq=0)
+    assert [c["id"] for c in conflicts] == ["b"]
+    assert _row(apply_deltas(state, [rows]), "S1")["status"] == "Aprovada"
+
+
+def test_replay_after_checkpoint_matches_full_replay(tmp_path, state):
+    cat = SnapshotCatalog(LocalStore(tmp_path))
+    cat.save_snapshot(snapshot_bytes(state), now=NOW)
+    log = ValidationLog(cat, checkpoint_every=3)
+    cur = state
+    frames = []
+    for i, (site, status) in enumerate([("S1", "Aprovada"), ("S2", "Rejeitada"), ("S3", "Aprovada"),
+                                        ("S1", "Rejeitada"), ("S2", "Aprovada")]):
+        data = _edit(cur, site, i, status=status)
+        frames.append(read_delta(data))
+        log.append(data, rows=1)
+        cur = apply_deltas(cur, [frames[-1]])
+    assert cat.latest()["upto"] is not None and len(cat.deltas()) == 2   # compactou no 3º delta
+
+    replayed, seq = log.state()
+    full = apply_deltas(state, frames)
+    cols = ["site_nome", "data", "status", "observacao", "validador"]
+    assert seq == 5
+    pd.testing.assert_frame_equal(replayed[cols].astype(str), full[cols].astype(str))
+    assert len(ValidationLog(cat)._replay()[1]) == 2
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# PublishQueue: itens sobrevivem ao restart (replay) e o item "envenenado" vai para dead/.
+import time
+import threading
+
+from agenda_queue import PublishQueue
+
+
+def _wait(cond, timeout: float = 5.0) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return cond()
+
+
+def test_replay_after_restart(tmp_path):
+    blocked = threading.Event()
+    def _down(recs):
+        blocked.set()
+        raise RuntimeError("offline")
+    q1 = PublishQueue(tmp_path, _down, coalesce_s=0.01, max_backoff_s=60.0, max_attempts=100)
+    ids = [q1.enqueue({"n": i}) for i in range(3)]
+    assert _wait(blocked.is_set)
+    assert [r["id"] for r in q1.pending()] == ids   # nada perdido, na ordem de chegada
+
+    published = []
+    q2 = PublishQueue(tmp_path, lambda recs: published.extend(recs), coalesce_s=0.01)   # "novo processo"
+    assert _wait(lambda: q2.pending_count() == 0)
+    assert [r["n"] for r in published] == [0, 1, 2]
+
+
+def test_poison_item_goes_to_dead_letter(tmp_path):
+    published = []
+    def _publish(recs):
+        if any(r.get("bad") for r in recs):
+            raise ValueError("registro inválido")
+        published.extend(r["n"] for r in recs)
+    q = PublishQueue(tmp_path, _publish, coalesce_s=0.01, max_backoff_s=0.02, max_attempts=3)
+    q.enqueue({"n": 0, "bad": True})
+    q.enqueue({"n": 1})
+    q.enqueue({"n": 2})
+    assert _wait(lambda: q.pending_count() == 0)
+    assert published == [1, 2]
+    dead = q.dead_letters()
+    assert len(dead) == 1 and dead[0]["n"] == 0
+    assert dead[0]["attempts"] == 3 and dead[0]["error"] == "registro inválido"
+
+    assert q.requeue_dead() == 1 and not q.dead_letters()
+    assert _wait(lambda: q.dead_letters() != [])   # continua falhando: volta para dead/
+
+
+def test_unreadable_item_is_dead_lettered(tmp_path):
+    (tmp_path / "pending").mkdir()
+    (tmp_path / "pending" / "0-abc.json").write_text("{truncado", encoding="utf-8")
+    q = PublishQueue(tmp_path, lambda recs: None, coalesce_s=0.01)
+    assert _wait(lambda: q.dead_letters() != [])
+    assert q.dead_letters()[0]["raw"] == "{truncado"
+    assert q.requeue_dead() == 0   # nada a republicar
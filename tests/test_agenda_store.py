@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# SnapshotCatalog sobre LocalStore: índice, deltas após o checkpoint e concorrência otimista.
+import datetime as dt
+
+import pytest
+
+from agenda_store import ConflictError, LocalStore, SnapshotCatalog, StoreError
+
+T0 = dt.datetime(2024, 5, 10, 12, 0, 0, tzinfo=dt.timezone.utc)
+
+
+def _at(minutes: int) -> dt.datetime:
+    return T0 + dt.timedelta(minutes=minutes)
+
+
+@pytest.fixture
+def cat(tmp_path):
+    return SnapshotCatalog(LocalStore(tmp_path), root="data/validado")
+
+
+def test_deltas_after_checkpoint(cat):
+    cat.save_snapshot(b"xlsx-1", author="ana", now=_at(0))
+    cat.append_delta(b"{}\n", author="ana", rows=1, now=_at(1))
+    cat.append_delta(b"{}\n", author="bia", rows=2, now=_at(2))
+    assert cat.seq() == 2
+    paths = [d["path"] for d in cat.deltas()]
+    assert len(paths) == 2 and paths == sorted(paths)
+
+    # checkpoint que incorpora o 1º delta: só o 2º continua no replay (e o seq não muda)
+    cat.save_snapshot(b"xlsx-2", author="ana", now=_at(3), upto=paths[0])
+    assert [d["path"] for d in cat.deltas()] == paths[1:]
+    assert cat.seq() == 2
+    assert cat.latest()["path"].endswith("validado-20240510-120300-000000.xlsx")
+
+
+def test_expect_seq_conflict(cat):
+    cat.save_snapshot(b"xlsx", now=_at(0))
+    cat.append_delta(b"a", now=_at(1), expect_seq=0)
+    with pytest.raises(ConflictError):
+        cat.append_delta(b"b", now=_at(2), expect_seq=0)   # outro writer publicou antes
+    assert cat.seq() == 1 and len(cat.deltas()) == 1
+
+
+def test_read_without_index_writes_nothing(cat, tmp_path):
+    cat.save_snapshot(b"xlsx", now=_at(0))
+    cat.append_delta(b"a", now=_at(1))
+    index = tmp_path / "data/validado/index.json"
+    index.unlink()
+    assert cat.seq() == 1 and len(cat.deltas()) == 1   # varredura em memória
+    assert not index.exists()
+
+
+def test_corrupt_index_fails_read_and_rebuild_keeps_deltas(cat, tmp_path):
+    cat.save_snapshot(b"xlsx", now=_at(0))
+    cat.append_delta(b"a", now=_at(1))
+    cat.append_delta(b"b", now=_at(2))
+    (tmp_path / "data/validado/index.json").write_text("{corrompido", encoding="utf-8")
+    with pytest.raises(StoreError):
+        cat.deltas()
+    idx = cat.rebuild()
+    assert idx["seq"] == 2 and len(idx["deltas"]) == 2
+    assert cat.latest()["path"].endswith(".xlsx")
+
+
+def test_refused_delta_never_reaches_the_tree(tmp_path):
+    """Dois processos com caches independentes: B publica sobre um índice velho e é recusado — o delta
+    dele não fica em changes/ e não volta depois de um rebuild."""
+    import pandas as pd
+    from agenda_log import ValidationLog, delta_bytes, normalize, snapshot_bytes
+    from agenda_store import CachedStore
+    from shared_cache import SharedCache
+
+    base = normalize(pd.DataFrame({"site_nome": ["S1"], "data": ["2024-05-01"], "status": ["Pendente"],
+                                   "observacao": [""], "validador": [""], "data_validacao": [None]}))
+    SnapshotCatalog(LocalStore(tmp_path)).save_snapshot(snapshot_bytes(base), now=_at(0))
+
+    def _catalog():
+        return SnapshotCatalog(CachedStore(LocalStore(tmp_path), SharedCache()))
+
+    def _edit(status):
+        after = base.copy()
+        after["status"] = pd.Categorical([status], categories=base["status"].cat.categories)
+        return delta_bytes(after, "x", _at(1), antes=base, base=0)
+
+    a, b = _catalog(), _catalog()
+    assert a.seq() == 0 and b.seq() == 0                   # os dois guardam o índice em cache
+    a.append_delta(_edit("Aprovada"), now=_at(1), expect_seq=0)
+    with pytest.raises(ConflictError):
+        b.append_delta(_edit("Rejeitada"), now=_at(2), expect_seq=0)
+
+    assert len(list((tmp_path / "data/validado/changes").rglob("*.jsonl"))) == 1
+    fresh = SnapshotCatalog(LocalStore(tmp_path))
+    idx = fresh.rebuild()
+    assert idx["seq"] == 1 and len(idx["deltas"]) == 1
+    state, seq = ValidationLog(fresh).state()
+    assert seq == 1 and list(state["status"]) == ["Aprovada"]
+
+
+def test_missing_reserved_delta_is_skipped_and_not_memoized(cat, tmp_path):
+    """Seq reservado cujo arquivo ainda não existe (gravação em andamento / queda no meio)."""
+    from agenda_log import ValidationLog
+
+    cat.append_delta(b"", now=_at(1))
+    path = cat.deltas()[0]["path"]
+    assert SnapshotCatalog._seq_of(path) == 1
+    (tmp_path / path).unlink()
+    log = ValidationLog(cat)
+    assert log._replay()[3] is False and log._memo_key is None
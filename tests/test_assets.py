@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# assets: o data URI reduzido é a mesma imagem do arquivo pedido (e não outro com o mesmo nome).
+import io
+import base64
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from assets import data_uri, minify_css
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _decode(uri: str) -> Image.Image:
+    return Image.open(io.BytesIO(base64.b64decode(uri.split(",", 1)[1]))).convert("RGB")
+
+
+def _diff(a: Image.Image, path: Path) -> float:
+    ref = Image.open(path).convert("RGB").resize(a.size, Image.LANCZOS)
+    return float(np.abs(np.asarray(a, dtype=float) - np.asarray(ref, dtype=float)).mean())
+
+
+def test_logos_resolve_to_their_own_file():
+    for name, other in [("pages/logomavipe.jpeg", "logomavipe.jpeg"), ("logomavipe.jpeg", "pages/logomavipe.jpeg")]:
+        uri = data_uri(name, 360)
+        assert uri.startswith("data:image/webp;base64,")
+        img = _decode(uri)
+        assert img.width == 360
+        assert _diff(img, ROOT / name) < 3 < _diff(img, ROOT / other)
+
+
+def test_svg_and_css_minified():
+    assert data_uri("br.svg").startswith("data:image/svg+xml;base64,")
+    assert data_uri("nao-existe.png") == ""
+    assert minify_css("a { color : red ; }\n/* x */ b{}") == "a{color : red}b{}"
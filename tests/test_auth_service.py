@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# TokenSigner / Throttle / AuthService (bcrypt com custo mínimo para o teste ser rápido).
+import bcrypt
+
+from auth_service import AuthService, Throttle, TokenSigner
+
+
+def test_token_roundtrip_and_expiry():
+    s = TokenSigner(b"k" * 32, ttl=100)
+    tok = s.issue("ana", now=1000)
+    assert s.verify(tok, now=1050) == {"user": "ana", "exp": 1100}
+    assert s.verify(tok, now=1100) is None                  # expirado
+    assert TokenSigner(b"x" * 32).verify(tok, now=1050) is None   # outra chave
+
+
+def test_token_tampering():
+    s = TokenSigner(b"k" * 32)
+    payload, sig = s.issue("ana").rsplit(".", 1)
+    forged = TokenSigner(b"k" * 32).issue("admin").rsplit(".", 1)[0]
+    assert s.verify(f"{forged}.{sig}") is None
+    assert s.verify(payload) is None and s.verify(None) is None and s.verify("") is None
+
+
+def test_token_refresh_after_half_life():
+    s = TokenSigner(b"k" * 32, ttl=100)
+    tok = s.issue("ana", now=1000)
+    assert s.refresh(tok, now=1040) == tok                  # ainda na 1ª metade
+    new = s.refresh(tok, now=1060)
+    assert new != tok and s.verify(new, now=1150)["user"] == "ana"
+
+
+def test_throttle_window():
+    t = Throttle(max_failures=3, window_s=10)
+    for i in range(3):
+        assert t.retry_after("u", now=100 + i) == 0
+        t.fail("u", now=100 + i)
+    assert t.retry_after("u", now=103) == 7                 # libera quando a 1ª falha sai da janela
+    assert t.retry_after("u", now=110) == 0
+    t.fail("v", now=100); t.clear("v")
+    assert t.retry_after("v", now=100) == 0
+
+
+def test_authenticate_throttles_user_and_keeps_ip_count():
+    svc = AuthService(TokenSigner(b"k" * 32), user_max_failures=2, ip_max_failures=3)
+    good = bcrypt.hashpw(b"certa", bcrypt.gensalt(rounds=4)).decode("utf-8")
+    assert svc.authenticate("ana", "errada", good, ip="1.2.3.4").reason == "invalid"
+    ok = svc.authenticate("ana", "certa", good, ip="1.2.3.4")
+    assert ok.ok and svc.signer.verify(ok.token)["user"] == "ana"
+    # sucesso zera o usuário, não o IP: mais duas falhas (outra conta) bloqueiam o IP
+    svc.authenticate("bia", "x", None, ip="1.2.3.4")
+    svc.authenticate("bia", "x", None, ip="1.2.3.4")
+    res = svc.authenticate("carla", "x", good, ip="1.2.3.4")
+    assert res.reason == "throttled" and res.retry_after > 0
+    assert svc.authenticate("carla", "certa", good, ip="5.6.7.8").ok
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# run_batch: falha parcial (erro no relatório, tarefa que não passa pelo pickle, worker que morre)
+# não derruba o lote; erro fatal apaga o ZIP. As tarefas apontam para cubos ausentes (sem rede, rápido).
+import os
+import csv
+import io
+import zipfile
+
+import pytest
+
+from geo_batch import plan_batch, run_batch
+from geo_diskcache import CubeDiskCache
+from geo_images import ImageService
+
+
+class _KillWorker:
+    """Ao ser desserializado no worker, encerra o processo (simula um crash nativo)."""
+
+    def __reduce__(self):
+        return (os._exit, (3,))
+
+
+class _NoNetwork:
+    def get(self, *a, **k):
+        import requests
+        raise requests.ConnectionError("offline")
+
+
+@pytest.fixture
+def env(tmp_path):
+    disk = CubeDiskCache(tmp_path / "cubes")
+    images = ImageService(tmp_path / "img", session=_NoNetwork())
+    return disk, images, tmp_path / "lote.zip"
+
+
+def _tasks(n: int):
+    return plan_batch("wb", {f"S{i}": ["Jan"] for i in range(n)}, {})
+
+
+def test_partial_failures_keep_the_batch(env):
+    disk, images, zip_path = env
+    tasks = _tasks(5)
+    tasks[1] = dict(tasks[1], opts={"x": _KillWorker()})        # derruba o worker
+    tasks[3] = dict(tasks[3], opts={"f": lambda: None})          # não passa pelo pickle
+    seen = []
+    out = run_batch(tasks, disk, images, zip_path, max_workers=2, on_result=lambda d, t, r: seen.append(r))
+
+    assert out == zip_path and len(seen) == 5
+    errors = {r["site"]: r["erro"] for r in seen}
+    assert "encerrado" in errors["S1"]
+    assert "pickle" in errors["S3"].lower()
+    assert all("cubo do site ausente" in errors[s] for s in ("S0", "S2", "S4"))
+    with zipfile.ZipFile(zip_path) as zf:
+        rows = list(csv.DictReader(io.StringIO(zf.read("manifesto.csv").decode("utf-8"))))
+    assert sorted(r["site"] for r in rows) == ["S0", "S1", "S2", "S3", "S4"]
+    assert all(r["erro"] for r in rows)
+
+
+def test_fatal_error_removes_the_zip(env):
+    disk, images, zip_path = env
+    def _stop(done, total, res):
+        raise KeyboardInterrupt   # ex.: a página foi interrompida no meio do lote
+    with pytest.raises(KeyboardInterrupt):
+        run_batch(_tasks(2), disk, images, zip_path, max_workers=1, on_result=_stop)
+    assert not zip_path.exists()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# CubeDiskCache: round-trip do cubo (arrays e células cruas com o mesmo tipo) e despejo LRU.
+import os
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+import geo_diskcache
+from geo_cube import build_site_cube
+from geo_diskcache import CubeDiskCache
+
+
+def _sheet(seed: int = 0) -> pd.DataFrame:
+    rows = [
+        ["Data", -22.9, -43.2, dt.datetime(2024, 1, 15), pd.Timestamp("2024-02-10"), dt.datetime(2024, 3, 5)],
+        ["Taxa Metano", None, None, 12.5 + seed, 7, None],
+        ["Imagem", None, None, "img/a.png", "img/b.png", ""],
+        ["Hora", None, None, dt.time(10, 30), None, dt.date(2024, 3, 5)],
+    ]
+    return pd.DataFrame(rows, columns=["Parametro", "Lat", "Long", "Data", "c2", "c3"])
+
+
+def _same(a, b) -> bool:
+    return type(a) is type(b) and (a == b or (a is None and b is None))
+
+
+def test_roundtrip_keeps_arrays_and_raw_types(tmp_path):
+    cube = build_site_cube({"S1": _sheet()})
+    disk = CubeDiskCache(tmp_path)
+    disk.save_cube("wb", "S1", cube)
+    back = disk.load_cube("wb", "S1")
+
+    assert back.sites == ["S1"] and back.param_keys == cube.param_keys and back.labels == cube.labels
+    np.testing.assert_array_equal(back.numeric, cube.numeric)
+    np.testing.assert_array_equal(back.stamps, cube.stamps)
+    assert back.lat[0] == cube.lat[0] and back.lon[0] == cube.lon[0]
+    for (_, p) in cube.rows[0]:
+        for d in range(cube.n_dates(0)):
+            assert _same(back.raw[0, p, d], cube.raw[0, p, d]), (p, d, back.raw[0, p, d], cube.raw[0, p, d])
+    assert disk.labels("wb", "S1") == cube.labels[0]
+
+
+def _fill(disk: CubeDiskCache, wb: str, mtime: float, sites=("S1",)) -> None:
+    for site in sites:
+        disk.save_cube(wb, site, build_site_cube({site: _sheet()}))
+    os.utime(disk.root / wb, (mtime, mtime))
+
+
+def test_evicts_least_recently_used_without_walking_every_save(tmp_path, monkeypatch):
+    probe = CubeDiskCache(tmp_path / "probe")
+    _fill(probe, "x", 0)
+    one = probe.stats()["bytes"]                       # tamanho de um workbook de um site
+
+    disk = CubeDiskCache(tmp_path / "c", max_bytes=int(one * 2.5))
+    walks = []
+    real = geo_diskcache._dir_size
+    monkeypatch.setattr(geo_diskcache, "_dir_size", lambda p: walks.append(p) or real(p))
+    _fill(disk, "old", 1000)
+    _fill(disk, "mid", 2000)
+    n = len(walks)
+    _fill(disk, "new", 3000)                           # passa do limite: "old" (menos recente) sai
+    assert sorted(d.name for d in disk.root.iterdir()) == ["mid", "new"]
+    assert len(walks) > n + 1                          # varreu a árvore só aqui
+
+    walks.clear()
+    disk.max_bytes = one * 100
+    _fill(disk, "big", 4000, sites=[f"S{i}" for i in range(5)])
+    assert len(walks) == 5                             # só o tamanho de cada site gravado, nada da árvore
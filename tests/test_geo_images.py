@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# ImageService (GET condicional / 304, rede fora) com uma sessão HTTP falsa; ImagePrefetcher (owners e
+# futures compartilhados).
+import io
+import time
+import threading
+from concurrent.futures import Future
+
+import requests
+from PIL import Image
+
+from geo_images import ImagePrefetcher, ImageService
+
+URL = "https://example.org/pluma.png"
+
+
+def _png() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (40, 30), (200, 10, 10)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code, self.content, self.headers = status_code, content, headers or {}
+
+
+class FakeSession:
+    def __init__(self, body: bytes, etag: str = '"v1"'):
+        self.body, self.etag = body, etag
+        self.calls = []      # cabeçalhos de cada GET
+        self.offline = False
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls.append(dict(headers or {}))
+        if self.offline:
+            raise requests.ConnectionError("sem rede")
+        if (headers or {}).get("If-None-Match") == self.etag:
+            return FakeResponse(304)
+        return FakeResponse(200, self.body, {"ETag": self.etag})
+
+
+def test_conditional_get_and_304(tmp_path):
+    sess = FakeSession(_png())
+    svc = ImageService(tmp_path, max_age=0.05, session=sess)
+    assert svc.fetch(URL) == sess.body and sess.calls == [{}]
+    assert svc.fetch(URL) == sess.body and len(sess.calls) == 1      # fresco: sem rede
+    time.sleep(0.06)
+    assert svc.fetch(URL) == sess.body
+    assert sess.calls[-1] == {"If-None-Match": '"v1"'}
+    assert svc.stats["downloads"] == 1 and svc.stats["revalidated"] == 1 and svc.stats["disk_hits"] == 1
+
+
+def test_changed_image_drops_tiers_and_offline_serves_stale(tmp_path):
+    sess = FakeSession(_png())
+    svc = ImageService(tmp_path, max_age=0.0, session=sess)
+    thumb = svc.tier(URL, "thumb")
+    assert thumb and svc.stats["derived"] == 1
+    sess.body, sess.etag = _png() + b"\0", '"v2"'                      # conteúdo mudou no servidor
+    svc.tier(URL, "thumb")
+    assert svc.stats["derived"] == 2
+    sess.offline = True
+    assert svc.fetch(URL) == sess.body and svc.stats["errors"] == 1
+
+
+class SlowService:
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = []
+
+    def is_tier_warm(self, url, tier):
+        return False
+
+    def tier(self, url, tier):
+        self.started.append(url)
+        self.gate.wait(2)
+
+
+def test_prefetcher_owners_share_and_release():
+    svc = SlowService()
+    p = ImagePrefetcher(svc, max_workers=1)
+    assert p.prefetch("a", "site-1", ["u1", "u2", "u3"]) == 3
+    assert p.prefetch("b", "site-1", ["u2", "u3", "u4"]) == 1      # u2/u3 já em voo: compartilhados
+    p.cancel("a")
+    assert p.pending("a") == 0 and p.pending("b") == 3               # b ainda espera u2/u3
+    p.prefetch("b", "site-2", ["u9"])                                # troca de scope: solta u2..u4
+    svc.gate.set()
+    for _ in range(100):
+        if not p.pending("b"):
+            break
+        time.sleep(0.02)
+    assert svc.started == ["u1", "u9"]                               # u2..u4 cancelados antes de começar
+    assert p._owners == {} and p._inflight == {} and p._refs == {}  # nada acumula
+
+
+class InlineExecutor:
+    """Executor que roda a tarefa na hora: o future volta já concluído (cache quente, falha rápida)."""
+
+    def submit(self, fn, *args):
+        f = Future()
+        try:
+            f.set_result(fn(*args))
+        except Exception as e:
+            f.set_exception(e)
+        return f
+
+
+def test_prefetcher_already_done_futures_leave_no_owner():
+    svc = SlowService()
+    svc.gate.set()
+    p = ImagePrefetcher(svc, max_workers=1)
+    p._pool = InlineExecutor()
+    assert p.prefetch("a", "site-1", ["u1", "u2"]) == 2
+    assert p.pending("a") == 0
+    assert p._owners == {} and p._inflight == {} and p._refs == {}
+
+
+def _rgba_png() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGBA", (2000, 1200), (10, 200, 10, 128)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_pdf_derivatives_are_flat_jpeg(tmp_path):
+    from geo_report import _image_reader_from_url
+
+    sess = FakeSession(_rgba_png())
+    svc = ImageService(tmp_path, session=sess)
+    assert svc.tier(URL, "screen")[8:12] == b"WEBP"                  # UI: alfa preservado
+    flat = svc.tier(URL, "screen", flat=True)
+    assert flat[:3] == b"\xff\xd8\xff"                                 # PDF: JPEG
+    assert Image.open(io.BytesIO(flat)).getpixel((0, 0))[1] > 200       # achatado sobre branco
+    img, w, h = _image_reader_from_url(svc, URL, 190, 140)
+    assert img is not None and max(w, h) == 1280                       # screen, não print
+    assert svc.tier(URL, "print", flat=True) == svc.tier(URL, "print")  # print já é achatado
+
+    derived = svc.stats["derived"]
+    sess.body, sess.etag = _png(), '"v2"'                              # original mudou: variantes caem
+    svc.max_age = 0
+    assert svc.tier(URL, "screen", flat=True) != flat
+    assert svc.stats["derived"] == derived + 1
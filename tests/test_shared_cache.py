@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# SharedCache: single-flight (N threads, um carregamento), TTL e limite em bytes.
+import time
+import threading
+
+import pytest
+
+from shared_cache import SharedCache
+
+
+def test_single_flight():
+    cache = SharedCache()
+    calls, gate = [], threading.Event()
+    def _loader():
+        calls.append(1)
+        gate.wait(2)
+        return b"valor"
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(cache.get("k", _loader))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and out == [b"valor"] * 8
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 7
+
+
+def test_loader_error_releases_waiters():
+    cache = SharedCache()
+    with pytest.raises(RuntimeError):
+        cache.get("k", lambda: (_ for _ in ()).throw(RuntimeError("falhou")))
+    assert cache.get("k", lambda: b"ok") == b"ok"   # a chave não fica presa em "carregando"
+
+
+def test_ttl():
+    cache = SharedCache()
+    cache.set("a", b"velho", ttl=0.05)
+    assert cache.get("a", lambda: b"novo") == b"velho"
+    time.sleep(0.06)
+    assert cache.get("a", lambda: b"novo") == b"novo"
+
+
+def test_lru_by_bytes():
+    cache = SharedCache(max_bytes=10)
+    for k in "abc":
+        cache.set(k, b"12345")                # o 3º estoura 10 bytes: "a" (menos recente) sai
+    assert cache.stats()["entries"] == 2 and cache.stats()["bytes"] == 10
+    assert cache.get("a", lambda: b"recarregado") == b"recarregado"
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# UserDirectory: TTL, reparse só com sha novo, cópia antiga com o backend fora e backoff após falha.
+import json
+import time
+
+import pytest
+
+from agenda_store import LocalStore, StoreError
+from user_directory import UserDirectory
+
+
+class FlakyStore(LocalStore):
+    """LocalStore que conta os GETs e pode "cair"."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.gets = 0
+        self.down = False
+
+    def get(self, path):
+        self.gets += 1
+        if self.down:
+            raise StoreError("backend fora do ar")
+        return super().get(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    (tmp_path / "users.json").write_text(json.dumps({"ana": {"pw": "h1"}}), encoding="utf-8")
+    return FlakyStore(tmp_path)
+
+
+def test_ttl_and_reparse_only_on_new_sha(store):
+    d = UserDirectory(store, "users.json", ttl=0.05)
+    cfg, sha = d.get()
+    cfg["ana"]["pw"] = "alterado"                    # cópia: não contamina o cache
+    assert d.get() == ({"ana": {"pw": "h1"}}, sha)
+    assert store.gets == 1 and d.stats["hits"] == 1
+    time.sleep(0.06)
+    d.get()
+    assert store.gets == 2 and d.stats["reparsed"] == 1   # mesmo sha: não reparseia
+
+
+def test_save_conflict_invalidates(store):
+    d = UserDirectory(store, "users.json")
+    cfg, sha = d.get()
+    assert d.save(dict(cfg, bia={"pw": "h2"}), "add bia", sha)
+    assert "bia" in d.get()[0] and store.gets == 1       # gravação atualiza a cópia sem reler
+    assert not d.save(cfg, "sha velho", sha)
+    assert "bia" in d.get()[0] and store.gets == 2
+
+
+def test_backend_down_serves_stale_with_backoff(store):
+    d = UserDirectory(store, "users.json", ttl=0.05, backoff=0.1)
+    d.get()
+    time.sleep(0.06)
+    store.down = True
+    for _ in range(5):
+        assert d.get()[0] == {"ana": {"pw": "h1"}}
+    assert store.gets == 2 and d.last_error == "backend fora do ar"   # uma tentativa só
+    time.sleep(0.11)
+    d.get()
+    assert store.gets == 3
+
+
+def test_backend_down_without_copy_raises(store):
+    store.down = True
+    with pytest.raises(StoreError):
+        UserDirectory(store, "users.json").get()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# user_directory.py — diretório de usuários (users.json) em memória do processo, para o login
+# O "Entrar" consulta a cópia em memória; passado o TTL ela é revalidada (no GitHub, GET condicional
+# por ETag via gh_client: 304 não baixa nem conta no rate limit, e com o mesmo sha o JSON já parseado
+# é reaproveitado). `save` grava e atualiza a cópia na hora. Backends: os do agenda_store
+# (GitHubStore / LocalStore — este último para rodar e testar offline).
+
+import copy
+import json
+import time
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from agenda_store import ConflictError, StoreError
+
+DEFAULT_TTL_S = 60.0
+ERROR_BACKOFF_S = 10.0   # backend falhou e há cópia: próxima tentativa só depois disto
+
+
+class UserDirectory:
+    """`get()` → (config, sha) de `path` no store; `save(config, mensagem, sha)` → bool."""
+
+    def __init__(self, store, path: str, ttl: float = DEFAULT_TTL_S, backoff: float = ERROR_BACKOFF_S):
+        self.store = store
+        self.path = path
+        self.ttl = ttl
+        self.backoff = backoff
+        self._cfg: Optional[Dict[str, Any]] = None
+        self._sha: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()   # um refresh por vez; quem chega junto usa o resultado
+        self.last_error: Optional[str] = None
+        self.stats = {"hits": 0, "refreshes": 0, "reparsed": 0}   # alterados só com `_lock` travado
+
+    def _fresh(self) -> bool:
+        return self._cfg is not None and time.monotonic() - self._checked_at < self.ttl
+
+    def _refresh(self) -> None:
+        # só roda dentro de get(), com `_lock` travado (inclusive os contadores)
+        self.stats["refreshes"] += 1
+        f = self.store.get(self.path)
+        if f is None:
+            self._cfg, self._sha = {}, None
+        elif f.sha != self._sha or self._cfg is None:
+            self._cfg, self._sha = json.loads(f.data.decode("utf-8")), f.sha
+            self.stats["reparsed"] += 1
+        self._checked_at = time.monotonic()
+
+    def get(self) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Cópia do users.json (quem chama pode alterá-la) e o sha. Com o backend fora do ar, serve a
+        última cópia conhecida (e só tenta de novo após `backoff` s); sem nenhuma, levanta StoreError."""
+        with self._lock:
+            if self._fresh():
+                self.stats["hits"] += 1
+            else:
+                try:
+                    self._refresh()
+                    self.last_error = None
+                except (StoreError, ValueError) as e:
+                    self.last_error = str(e) or e.__class__.__name__
+                    if self._cfg is None:
+                        raise StoreError(self.last_error)
+                    # serve a cópia antiga sem bater de novo no backend a cada login
+                    self._checked_at = time.monotonic() - self.ttl + min(self.backoff, self.ttl)
+            return copy.deepcopy(self._cfg), self._sha
+
+    def save(self, cfg: Dict[str, Any], message: str, sha: Optional[str]) -> bool:
+        """Grava com o sha lido (otimista). Em conflito (outro processo gravou antes) descarta a cópia
+        em memória e retorna False; quem chama relê e tenta de novo."""
+        data = json.dumps(cfg, indent=2).encode("utf-8")
+        with self._lock:
+            try:
+                new_sha = self.store.put(self.path, data, message, sha)
+            except ConflictError:
+                self.invalidate()
+                return False
+            self._cfg, self._sha = copy.deepcopy(cfg), new_sha
+            self._checked_at = time.monotonic()
+        return True
+
+    def invalidate(self) -> None:
+        self._cfg, self._sha, self._checked_at = None, None, 0.0